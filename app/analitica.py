@@ -0,0 +1,276 @@
+import csv
+import gzip
+import io
+import json
+import numpy as np
+from app.logger_config import get_logger
+from app.repositories import PartidaRepository
+from app.registro_partidas import leer_registro
+from app.services import JUGADAS, RESULTADOS
+
+# Obtener el logger
+logger = get_logger(__name__)
+
+# Jugadas por bloque: la memoria del análisis depende de este tamaño, no del de los datos
+TAMANO_BLOQUE = 1_000_000
+
+# Código de cada valor de las exportaciones (ver app.exportacion)
+CODIGOS_VALORES = {
+    **{jugada.value: codigo for codigo, jugada in enumerate(JUGADAS)},
+    **{resultado.value: codigo for codigo, resultado in enumerate(RESULTADOS)},
+}
+
+
+class AnalizadorJugadas:
+
+    def __init__(self):
+        """
+        Acumula en una pasada las estadísticas de una secuencia de jugadas.
+
+        Las jugadas se reciben por bloques, en orden cronológico, y de cada bloque sólo
+        se conserva, por jugador, su última jugada y la racha que tiene abierta; así la
+        memoria depende del tamaño del bloque y del número de jugadores, no del de jugadas.
+
+        Se calculan:
+            - La matriz 3x3 de jugada por resultado.
+            - Las transiciones: qué juega cada jugador después de cada jugada y resultado
+              (matriz 3x3x3 de resultado anterior, jugada anterior y jugada siguiente).
+            - La distribución de la longitud de las rachas de resultados iguales
+              consecutivos de un jugador.
+        """
+        self.jugadas = 0
+        self.matriz = np.zeros(9, dtype=np.int64)
+        self.transiciones = np.zeros(27, dtype=np.int64)
+        self.rachas = [np.zeros(1, dtype=np.int64) for _ in RESULTADOS]  # por resultado, frecuencia de cada longitud
+        # Por jugador, su última jugada y la longitud de su racha abierta
+        self._jugadores = np.empty(0, dtype=np.int64)
+        self._tipos = np.empty(0, dtype=np.int64)
+        self._resultados = np.empty(0, dtype=np.int64)
+        self._longitudes = np.empty(0, dtype=np.int64)
+
+    def procesar(self, jugadores, tipos, resultados):
+        """
+        Añade un bloque de jugadas, posteriores a las de los bloques anteriores.
+
+        Args:
+            jugadores (np.ndarray): (n,) id del jugador de cada jugada.
+            tipos (np.ndarray): (n,) código de cada jugada (ver JUGADAS).
+            resultados (np.ndarray): (n,) código de cada resultado (ver RESULTADOS).
+        """
+        tipos = np.asarray(tipos, dtype=np.int64)
+        resultados = np.asarray(resultados, dtype=np.int64)
+        self.jugadas += len(tipos)
+        self.matriz += np.bincount(tipos * 3 + resultados, minlength=9)
+        if len(tipos) == 0:
+            return
+
+        # La última jugada de cada jugador va delante de las suyas del bloque, con el peso de su racha
+        jugadores = np.concatenate((self._jugadores, np.asarray(jugadores, dtype=np.int64)))
+        tipos = np.concatenate((self._tipos, tipos))
+        resultados = np.concatenate((self._resultados, resultados))
+        pesos = np.concatenate((self._longitudes, np.ones(len(jugadores) - len(self._jugadores), dtype=np.int64)))
+        orden = np.argsort(jugadores, kind="stable")
+        jugadores, tipos, resultados, pesos = jugadores[orden], tipos[orden], resultados[orden], pesos[orden]
+
+        mismo_jugador = jugadores[1:] == jugadores[:-1]
+        anteriores = (resultados[:-1] * 3 + tipos[:-1]) * 3 + tipos[1:]
+        self.transiciones += np.bincount(anteriores[mismo_jugador], minlength=27)
+
+        inicio_racha = np.concatenate(([True], ~mismo_jugador | (resultados[1:] != resultados[:-1])))
+        inicios = np.flatnonzero(inicio_racha)
+        longitudes = np.add.reduceat(pesos, inicios)
+        # La última racha de cada jugador puede continuar en el bloque siguiente
+        ultimas = np.flatnonzero(np.concatenate((~mismo_jugador, [True])))
+        abiertas = np.cumsum(inicio_racha)[ultimas] - 1
+        cerradas = np.ones(len(inicios), dtype=bool)
+        cerradas[abiertas] = False
+        self._sumar_rachas(longitudes[cerradas], resultados[inicios[cerradas]])
+
+        self._jugadores = jugadores[ultimas]
+        self._tipos = tipos[ultimas]
+        self._resultados = resultados[ultimas]
+        self._longitudes = longitudes[abiertas]
+
+    def _sumar_rachas(self, longitudes, resultados):
+        for codigo in range(len(RESULTADOS)):
+            frecuencias = np.bincount(longitudes[resultados == codigo])
+            if len(frecuencias) > len(self.rachas[codigo]):
+                self.rachas[codigo] = np.pad(self.rachas[codigo], (0, len(frecuencias) - len(self.rachas[codigo])))
+            self.rachas[codigo][:len(frecuencias)] += frecuencias
+
+    def resultado(self):
+        """
+        Cierra las rachas abiertas y devuelve las estadísticas acumuladas.
+
+        Returns:
+            dict: Un diccionario con la siguiente estructura:
+                {
+                    "jugadas": int,  # Número de jugadas analizadas.
+                    "matriz": dict[str, dict[str, int]],  # Jugada -> resultado -> jugadas.
+                    "transiciones": dict[str, dict[str, dict[str, int]]],  # Resultado anterior -> jugada anterior -> jugada siguiente -> veces.
+                    "repite_tras": dict[str, float],  # Resultado anterior -> porcentaje de veces que se repite la jugada.
+                    "rachas": dict[str, dict[int, int]],  # Resultado -> longitud de la racha -> rachas.
+                    "racha_maxima": dict[str, int]  # Resultado -> racha más larga.
+                }
+        """
+        self._sumar_rachas(self._longitudes, self._resultados)
+        self._jugadores = self._tipos = self._resultados = self._longitudes = np.empty(0, dtype=np.int64)
+        matriz = self.matriz.reshape(3, 3)
+        transiciones = self.transiciones.reshape(3, 3, 3)
+        repeticiones = np.einsum("rjj->r", transiciones)
+        totales = transiciones.sum(axis=(1, 2))
+        return {
+            "jugadas": self.jugadas,
+            "matriz": {
+                jugada.value: {resultado.value: int(matriz[i, j]) for j, resultado in enumerate(RESULTADOS)}
+                for i, jugada in enumerate(JUGADAS)
+            },
+            "transiciones": {
+                anterior.value: {
+                    jugada.value: {siguiente.value: int(transiciones[r, i, k]) for k, siguiente in enumerate(JUGADAS)}
+                    for i, jugada in enumerate(JUGADAS)
+                }
+                for r, anterior in enumerate(RESULTADOS)
+            },
+            "repite_tras": {
+                anterior.value: float(repeticiones[r] / totales[r] * 100) if totales[r] else 0.0
+                for r, anterior in enumerate(RESULTADOS)
+            },
+            "rachas": {
+                resultado.value: {longitud: int(n) for longitud, n in enumerate(self.rachas[r]) if n}
+                for r, resultado in enumerate(RESULTADOS)
+            },
+            "racha_maxima": {
+                resultado.value: int(np.flatnonzero(self.rachas[r])[-1]) if self.rachas[r].any() else 0
+                for r, resultado in enumerate(RESULTADOS)
+            }
+        }
+
+
+def decodificar(codigos):
+    """
+    Separa los códigos de PartidaRepository.consulta_codigos_jugadas.
+
+    Args:
+        codigos (np.ndarray): (n,) jugador_id * 9 + tipo * 3 + resultado.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Los jugadores, los tipos y los resultados.
+    """
+    jugadores, jugada = np.divmod(codigos, 9)
+    tipos, resultados = np.divmod(jugada, 3)
+    return jugadores, tipos, resultados
+
+
+def bloques_bd(db, tamano_bloque=TAMANO_BLOQUE, desde_id=None, hasta_id=None, jugador_id=None):
+    """
+    Recorre las jugadas guardadas por bloques, en orden de id.
+
+    Args:
+        db (Session): La sesión de la base de datos.
+        tamano_bloque (int): Jugadas por bloque.
+        desde_id (int | None): Id mínimo de jugada (incluido).
+        hasta_id (int | None): Id máximo de jugada (incluido).
+        jugador_id (int | None): Sólo las jugadas de este jugador.
+
+    Yields:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Los jugadores, los tipos y los resultados del bloque.
+    """
+    repo = PartidaRepository(db)
+    consulta = repo.consulta_codigos_jugadas(desde_id, hasta_id, jugador_id)
+    for codigos in repo.iterar_codigos(consulta, tamano_bloque):
+        yield decodificar(codigos)
+
+
+def bloques_registro(ruta, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Recorre por bloques las jugadas de un registro binario (ver app.registro_partidas).
+
+    Args:
+        ruta (str): Ruta del registro.
+        tamano_bloque (int): Jugadas por bloque.
+
+    Yields:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Los jugadores, los tipos y los resultados del bloque.
+    """
+    registros = leer_registro(ruta)
+    for inicio in range(0, len(registros), tamano_bloque):
+        bloque = registros[inicio:inicio + tamano_bloque]
+        yield bloque["jugador"], bloque["tipo"], bloque["resultado"]
+
+
+def _filas_exportacion(fichero, ndjson):
+    if ndjson:
+        for linea in fichero:
+            if linea.strip():
+                jugada = json.loads(linea)
+                yield jugada["jugador_id"], jugada["tipo"], jugada["resultado"]
+        return
+    lector = csv.reader(fichero)
+    columnas = next(lector, [])
+    indices = [columnas.index("jugador_id"), columnas.index("tipo"), columnas.index("resultado")]
+    for fila in lector:
+        yield tuple(fila[i] for i in indices)
+
+
+def bloques_exportacion(ruta, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Recorre por bloques un fichero de /export/jugadas en NDJSON o CSV, opcionalmente en gzip.
+
+    El formato se deduce de la extensión (.ndjson, .csv y, si está comprimido, .gz).
+    Las jugadas sin jugador, tipo o resultado se omiten.
+
+    Args:
+        ruta (str): Ruta del fichero.
+        tamano_bloque (int): Jugadas por bloque.
+
+    Yields:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Los jugadores, los tipos y los resultados del bloque.
+    """
+    abrir = gzip.open if ruta.endswith(".gz") else open
+    ndjson = ruta.removesuffix(".gz").endswith(".ndjson")
+    with abrir(ruta, "rb") as binario, io.TextIOWrapper(binario, encoding="utf-8", newline="") as fichero:
+        jugadores, tipos, resultados = [], [], []
+        for jugador_id, tipo, resultado in _filas_exportacion(fichero, ndjson):
+            if jugador_id in (None, "") or tipo not in CODIGOS_VALORES or resultado not in CODIGOS_VALORES:
+                continue
+            jugadores.append(int(jugador_id))
+            tipos.append(CODIGOS_VALORES[tipo])
+            resultados.append(CODIGOS_VALORES[resultado])
+            if len(jugadores) == tamano_bloque:
+                yield np.array(jugadores), np.array(tipos), np.array(resultados)
+                jugadores, tipos, resultados = [], [], []
+        if jugadores:
+            yield np.array(jugadores), np.array(tipos), np.array(resultados)
+
+
+def bloques_fichero(ruta, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Recorre por bloques un registro binario (.bin) o una exportación de jugadas.
+
+    Args:
+        ruta (str): Ruta del fichero.
+        tamano_bloque (int): Jugadas por bloque.
+
+    Returns:
+        Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]: Los bloques de jugadores, tipos y resultados.
+    """
+    return bloques_registro(ruta, tamano_bloque) if ruta.endswith(".bin") else bloques_exportacion(ruta, tamano_bloque)
+
+
+def analizar(bloques):
+    """
+    Analiza en una pasada una secuencia de bloques de jugadas.
+
+    Args:
+        bloques (Iterable[tuple[np.ndarray, np.ndarray, np.ndarray]]): Los bloques, p. ej. de
+            bloques_bd o bloques_fichero.
+
+    Returns:
+        dict: Las estadísticas (ver AnalizadorJugadas.resultado).
+    """
+    analizador = AnalizadorJugadas()
+    for jugadores, tipos, resultados in bloques:
+        analizador.procesar(jugadores, tipos, resultados)
+    logger.info("Análisis de %s jugadas terminado.", analizador.jugadas)
+    return analizador.resultado()
@@ -0,0 +1,232 @@
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from sqlalchemy.orm import Session
+from app.logger_config import get_logger
+from app.database import engine_sincrono
+
+# Obtener el logger
+logger = get_logger(__name__)
+
+
+class CacheConsultas:
+
+    def __init__(self, max_entradas=256, ttl=5.0, ttl_obsoleto=30.0):
+        """
+        Inicializa una caché en memoria LRU con TTL para consultas de solo lectura.
+
+        Las entradas se invalidan cuando cambia la versión (ver invalidar). Una entrada
+        con el TTL vencido se sigue sirviendo durante ttl_obsoleto segundos mientras se
+        recarga en segundo plano (stale-while-revalidate).
+
+        Args:
+            max_entradas (int): Número máximo de entradas antes de expulsar la menos usada.
+            ttl (float): Segundos que una entrada se considera fresca. 0 desactiva la caché.
+            ttl_obsoleto (float): Segundos adicionales en los que se sirve obsoleta.
+        """
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.ttl_obsoleto = ttl_obsoleto
+        self.version = 0
+        self._entradas = OrderedDict()  # clave -> (valor, version, guardada_en)
+        self._recargando = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache")
+        self.limpiar()
+
+    @property
+    def activa(self):
+        return self.ttl > 0
+
+    def invalidar(self):
+        """Incrementa la versión; las entradas guardadas con versiones anteriores dejan de servirse."""
+        with self._lock:
+            self.version += 1
+
+    def limpiar(self):
+        """Elimina todas las entradas y reinicia las métricas."""
+        with self._lock:
+            self._entradas.clear()
+            self.aciertos = 0
+            self.fallos = 0
+            self.obsoletos = 0
+            self.expulsiones = 0
+
+    def obtener(self, clave, cargar, recargar=None):
+        """
+        Obtiene un valor de la caché o lo carga si no está o ya no es válido.
+
+        Args:
+            clave (Hashable): La clave de la entrada.
+            cargar (callable): Carga el valor en el hilo actual.
+            recargar (callable | None): Carga el valor en segundo plano; si se indica,
+                las entradas vencidas se sirven obsoletas mientras se recargan.
+
+        Returns:
+            Any: El valor de la entrada.
+        """
+        with self._lock:
+            version = self.version
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[1] == version:
+                edad = time.monotonic() - entrada[2]
+                if edad < self.ttl:
+                    self.aciertos += 1
+                    self._entradas.move_to_end(clave)
+                    return entrada[0]
+                if recargar is not None and edad < self.ttl + self.ttl_obsoleto:
+                    self.obsoletos += 1
+                    self._entradas.move_to_end(clave)
+                    if clave not in self._recargando:
+                        self._recargando.add(clave)
+                        self._pool.submit(self._recargar, clave, recargar, version)
+                    return entrada[0]
+            self.fallos += 1
+        valor = cargar()
+        self._guardar(clave, valor, version)
+        return valor
+
+    def metricas(self):
+        """
+        Obtiene las métricas de uso de la caché.
+
+        Returns:
+            dict[str, int|float]: Aciertos, fallos, obsoletos servidos, expulsiones,
+                entradas, versión y tasa de aciertos.
+        """
+        with self._lock:
+            consultas = self.aciertos + self.obsoletos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "obsoletos": self.obsoletos,
+                "expulsiones": self.expulsiones,
+                "entradas": len(self._entradas),
+                "version": self.version,
+                "tasa_aciertos": (self.aciertos + self.obsoletos) / consultas if consultas > 0 else 0
+            }
+
+    def _guardar(self, clave, valor, version):
+        with self._lock:
+            self._entradas[clave] = (valor, version, time.monotonic())
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.expulsiones += 1
+
+    def _recargar(self, clave, recargar, version):
+        try:
+            self._guardar(clave, recargar(), version)
+        except Exception as e:
+            logger.error("Error al recargar la entrada de caché %s: %s", clave, e)
+        finally:
+            with self._lock:
+                self._recargando.discard(clave)
+
+
+class MapaJugadores:
+
+    def __init__(self, max_entradas=10000):
+        """
+        Inicializa un mapa en memoria LRU de nombre de jugador a id, común a todo el proceso.
+
+        Sólo se guardan ids ya confirmados en la base de datos. Como los jugadores no se
+        borran ni se renombran, las entradas no caducan; sólo se expulsan por tamaño.
+
+        Args:
+            max_entradas (int): Número máximo de jugadores antes de expulsar el menos usado.
+        """
+        self.max_entradas = max_entradas
+        self._ids = OrderedDict()  # (base de datos, nombre) -> id
+        self._lock = threading.Lock()
+        self.limpiar()
+
+    def obtener(self, base_de_datos, nombre):
+        """
+        Obtiene el id de un jugador si está en el mapa.
+
+        Args:
+            base_de_datos (str): La URL de la base de datos del jugador.
+            nombre (str): El nombre del jugador.
+
+        Returns:
+            int | None: El id del jugador, o None si no está.
+        """
+        with self._lock:
+            jugador_id = self._ids.get((base_de_datos, nombre))
+            if jugador_id is None:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+            self._ids.move_to_end((base_de_datos, nombre))
+            return jugador_id
+
+    def guardar(self, base_de_datos, nombre, jugador_id):
+        """
+        Guarda el id de un jugador ya confirmado en la base de datos.
+
+        Args:
+            base_de_datos (str): La URL de la base de datos del jugador.
+            nombre (str): El nombre del jugador.
+            jugador_id (int): El id del jugador.
+        """
+        with self._lock:
+            self._ids[(base_de_datos, nombre)] = jugador_id
+            self._ids.move_to_end((base_de_datos, nombre))
+            while len(self._ids) > self.max_entradas:
+                self._ids.popitem(last=False)
+                self.expulsiones += 1
+
+    def limpiar(self):
+        """Elimina todos los jugadores y reinicia las métricas."""
+        with self._lock:
+            self._ids.clear()
+            self.aciertos = 0
+            self.fallos = 0
+            self.expulsiones = 0
+
+
+# Caché global de la aplicación, configurable por variables de entorno
+cache_consultas = CacheConsultas(
+    max_entradas=int(os.getenv("CACHE_MAX_ENTRADAS", "256")),
+    ttl=float(os.getenv("CACHE_TTL", "5")),
+    ttl_obsoleto=float(os.getenv("CACHE_TTL_OBSOLETO", "30"))
+)
+
+# Mapa global de jugadores por nombre
+mapa_jugadores = MapaJugadores(max_entradas=int(os.getenv("CACHE_MAX_JUGADORES", "10000")))
+
+
+def cacheado(metodo):
+    """
+    Decora un método de lectura de un repositorio para servirlo desde cache_consultas.
+
+    La clave incluye la base de datos, el método y sus argumentos, con los valores por
+    defecto aplicados, de modo que obtener_ranking(3), obtener_ranking(3, 0) y
+    obtener_ranking(top=3) comparten entrada. Las recargas en segundo plano usan una
+    sesión propia, ya que la del repositorio pertenece a la petición en curso.
+    """
+    firma = inspect.signature(metodo)
+
+    @wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        if not cache_consultas.activa:
+            return metodo(self, *args, **kwargs)
+        bind = engine_sincrono(self.db.get_bind())
+        argumentos = firma.bind(self, *args, **kwargs)
+        argumentos.apply_defaults()
+
+        def recargar():
+            db = Session(bind=bind)
+            try:
+                return metodo(type(self)(db), *args, **kwargs)
+            finally:
+                db.close()
+
+        clave = (str(bind.url), metodo.__qualname__, tuple(argumentos.arguments.items())[1:])
+        return cache_consultas.obtener(clave, lambda: metodo(self, *args, **kwargs), recargar)
+    return envoltura
@@ -1,8 +1,12 @@
 import os
 from app.logger_config import get_logger
-from sqlalchemy import create_engine, inspect
+from app.metricas import sesiones_abiertas, sesiones_cerradas
+from sqlalchemy import create_engine, event, inspect, text, Integer, String
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 
 # Obtener el logger
 logger = get_logger(__name__)
@@ -11,27 +15,212 @@ logger = get_logger(__name__)
 log_dir = "data"
 if not os.path.exists(log_dir):
     os.makedirs(log_dir)
-SQLALCHEMY_DATABASE_URL = "sqlite:///./data/game.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/game.db")
+ASYNC_SQLALCHEMY_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    make_url(SQLALCHEMY_DATABASE_URL).set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+)
+
+# Pragmas que se aplican a cada conexión SQLite nueva
+PRAGMAS_SQLITE = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),  # lectores y escritor concurrentes
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),  # con WAL, fsync sólo en los checkpoints
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # en KiB si es negativo (64 MiB)
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000")),  # ms esperando el bloqueo de escritura
+}
+
+# Política del pool de conexiones
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+def _aplicar_pragmas(pragmas):
+    def aplicar(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for nombre, valor in pragmas.items():
+                cursor.execute(f"PRAGMA {nombre}={valor}")
+        finally:
+            cursor.close()
+    return aplicar
+
+def crear_engine(url, pragmas=None, asincrono=False):
+    """
+    Crea un engine con la configuración de pool y, en SQLite, los pragmas de rendimiento.
+
+    Las bases de datos SQLite en memoria usan StaticPool (una única conexión compartida);
+    el resto, un QueuePool con el tamaño de DB_POOL_SIZE y DB_POOL_MAX_OVERFLOW.
+
+    Args:
+        url (str): La URL de la base de datos.
+        pragmas (dict | None): Pragmas a aplicar al conectar; por defecto, PRAGMAS_SQLITE.
+        asincrono (bool): Si es True, crea un AsyncEngine.
+
+    Returns:
+        Engine | AsyncEngine: El engine configurado.
+    """
+    url = make_url(url)
+    kwargs = {}
+    if url.get_backend_name() == "sqlite":
+        kwargs["connect_args"] = {"check_same_thread": False}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        kwargs["poolclass"] = StaticPool
+    else:
+        kwargs.update(pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT)
+        if not asincrono:
+            kwargs["poolclass"] = QueuePool
+    nuevo_engine = create_async_engine(url, **kwargs) if asincrono else create_engine(url, **kwargs)
+    if url.get_backend_name() == "sqlite":
+        pragmas = PRAGMAS_SQLITE if pragmas is None else pragmas
+        event.listen(nuevo_engine.sync_engine if asincrono else nuevo_engine, "connect", _aplicar_pragmas(pragmas))
+    return nuevo_engine
 
 Base = declarative_base()
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = crear_engine(SQLALCHEMY_DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = crear_engine(ASYNC_SQLALCHEMY_DATABASE_URL, asincrono=True)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+def engine_sincrono(bind):
+    """
+    Devuelve el engine síncrono equivalente a un bind.
+
+    Las sesiones de AsyncSession.run_sync usan el sync_engine del engine asíncrono,
+    que no se puede usar fuera del bucle de eventos; para la base de datos principal
+    se devuelve el engine síncrono.
+
+    Args:
+        bind (Engine): El engine de una sesión.
+
+    Returns:
+        Engine: Un engine utilizable desde cualquier hilo.
+    """
+    return engine if bind is async_engine.sync_engine else bind
+
+def crear_sesion_local(url):
+    """
+    Crea una fábrica de sesiones para una base de datos distinta de la principal.
+
+    Se utiliza, por ejemplo, para los shards de la simulación multiproceso.
+
+    Args:
+        url (str): La URL de la base de datos.
+
+    Returns:
+        sessionmaker: La fábrica de sesiones ligada a un nuevo engine.
+    """
+    logger.info("Creando engine para %s.", url)
+    return sessionmaker(autocommit=False, autoflush=False, bind=crear_engine(url))
+
+def _anadir_columnas_nuevas(bind):
+    # create_all no modifica las tablas que ya existen: las columnas nuevas se añaden con ALTER TABLE
+    inspector = inspect(bind)
+    tablas = set(inspector.get_table_names())
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in tablas:
+                continue
+            existentes = {columna["name"] for columna in inspector.get_columns(table.name)}
+            for columna in table.columns:
+                if columna.name not in existentes:
+                    logger.info("Añadiendo la columna %s.%s.", table.name, columna.name)
+                    tipo = columna.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {columna.name} {tipo}"))
+
+def _comprobar_tipos(bind):
+    # Una columna guardada como texto no se puede leer como entero ni al revés (ver ESQUEMA_COMPACTO)
+    inspector = inspect(bind)
+    tablas = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tablas:
+            continue
+        guardadas = {columna["name"]: columna["type"]._type_affinity for columna in inspector.get_columns(table.name)}
+        for columna in table.columns:
+            esperada = columna.type._type_affinity
+            if {guardadas.get(columna.name), esperada} == {Integer, String}:
+                raise RuntimeError(
+                    f"La columna {table.name}.{columna.name} no tiene el tipo del esquema configurado; "
+                    "migra la base de datos con: python console_game.py --migrar_esquema compacto|texto"
+                )
+
+def _comprobar_indices_unicos(bind):
+    # Un índice único nuevo no se puede crear sobre filas repetidas; se avisa antes de crearlo
+    inspector = inspect(bind)
+    tablas = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tablas:
+            continue
+        existentes = {indice["name"] for indice in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if not index.unique or index.name in existentes:
+                continue
+            columnas = ", ".join(columna.name for columna in index.columns)
+            with bind.connect() as conn:
+                repetidos = conn.execute(text(
+                    f"SELECT {columnas} FROM {table.name} GROUP BY {columnas} HAVING COUNT(*) > 1 LIMIT 5"
+                )).all()
+            if repetidos:
+                raise RuntimeError(
+                    f"No se puede crear el índice único {index.name}: {table.name} tiene valores repetidos de "
+                    f"({columnas}), por ejemplo {[tuple(fila) for fila in repetidos]}; renombra o fusiona esas "
+                    "filas antes de iniciar la aplicación"
+                )
+
+# Tablas de contadores que mantienen las escrituras y que se pueden recalcular desde partidas y jugadas
+TABLAS_CONTADORES = ("estadisticas_agregadas", "estadisticas_periodo", "estadisticas_jugador")
+
+def _reconstruir_contadores_si_faltan(bind, tablas_previas):
+    # Una base de datos anterior a las tablas de contadores las recibe vacías: se recalculan
+    # desde las partidas, ya que los endpoints de estadísticas sólo leen los contadores
+    with bind.connect() as conn:
+        if conn.execute(text("SELECT 1 FROM partidas LIMIT 1")).first() is None:
+            return
+        vacia = conn.execute(text("SELECT 1 FROM estadisticas_agregadas LIMIT 1")).first() is None
+    if vacia or not set(TABLAS_CONTADORES) <= tablas_previas:
+        logger.info("Las tablas de contadores están vacías o son nuevas; reconstruyéndolas.")
+        # Import local: app.repositories importa este módulo
+        from app.repositories import PartidaRepository
+        with Session(bind=bind) as db:
+            PartidaRepository(db).reconstruir_contadores()
+
 # Función para inicializar la base de datos (crea las tablas si no existen)
-def init_db():
+def init_db(bind=None):
     """
     Inicializa la base de datos creando las tablas si no existen.
     
     La función utiliza la variable de entorno SQLALCHEMY_DATABASE_URL para
     determinar la base de datos a utilizar. La base de datos debe existir previamente.
+    En las tablas que ya existían se añaden las columnas e índices nuevos del modelo y se
+    comprueba que las columnas guardadas tienen el tipo del esquema (texto o compacto).
+    Si hay partidas y las tablas de contadores se acaban de crear o están vacías, se
+    reconstruyen (ver PartidaRepository.reconstruir_contadores).
+
+    Args:
+        bind (Engine | None): El engine a inicializar; por defecto, el principal.
+
+    Raises:
+        RuntimeError: Si la base de datos no es compatible con el modelo, por ejemplo si
+            hay nombres de jugador repetidos para el índice único de nombre.
     """
     logger.info("Inicializando la base de datos.")
     try:
-        Base.metadata.create_all(bind=engine)
+        tablas_previas = set(inspect(bind or engine).get_table_names())
+        _comprobar_tipos(bind or engine)
+        _anadir_columnas_nuevas(bind or engine)
+        _comprobar_indices_unicos(bind or engine)
+        Base.metadata.create_all(bind=bind or engine)
+        # create_all no añade índices nuevos a tablas que ya existían
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=bind or engine, checkfirst=True)
+        _reconstruir_contadores_si_faltan(bind or engine, tablas_previas)
         logger.info("Base de datos inicializada correctamente.")
     except Exception as e:
-        logger.error(f"Error al inicializar la base de datos: {e}")
+        logger.error("Error al inicializar la base de datos: %s", e)
+        raise e
 
 def get_db():
     """
@@ -44,12 +233,35 @@ def get_db():
     Returns:
         Session: La sesión de la base de datos.
     """
-    logger.info("Abriendo una nueva sesión de la base de datos.")
+    logger.debug("Abriendo una nueva sesión de la base de datos.")
     db = SessionLocal()
+    sesiones_abiertas.inc("sincrona")
     try:
         yield db
     except Exception as e:
-        logger.error(f"Error durante la sesión de base de datos: {e}")
+        logger.error("Error durante la sesión de base de datos: %s", e)
     finally:
-        logger.info("Cerrando la sesión de la base de datos.")
+        logger.debug("Cerrando la sesión de la base de datos.")
         db.close()
+        sesiones_cerradas.inc("sincrona")
+
+async def get_async_db():
+    """
+    Obtiene una sesión asíncrona de la base de datos.
+
+    La sesión se cierra automáticamente al terminar la petición.
+
+    Returns:
+        AsyncSession: La sesión asíncrona de la base de datos.
+    """
+    logger.debug("Abriendo una nueva sesión asíncrona de la base de datos.")
+    async with AsyncSessionLocal() as db:
+        sesiones_abiertas.inc("asincrona")
+        try:
+            yield db
+        except Exception as e:
+            logger.error("Error durante la sesión asíncrona de base de datos: %s", e)
+            raise e
+        finally:
+            logger.debug("Cerrando la sesión asíncrona de la base de datos.")
+            sesiones_cerradas.inc("asincrona")
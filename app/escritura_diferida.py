@@ -0,0 +1,260 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from app.logger_config import get_logger
+from app.database import SessionLocal
+from app.repositories import PartidaRepository, JugadorRepository
+from app.services import JuegoService
+
+# Obtener el logger
+logger = get_logger(__name__)
+
+# Durabilidad al terminar una partida: esperar a su commit o devolver el control en cuanto se encola
+DURABILIDAD_PARTIDA = 'partida'
+DURABILIDAD_DIFERIDA = 'diferida'
+
+
+class ColaLlenaError(Exception):
+    """La cola de escritura sigue llena tras el tiempo de espera."""
+
+
+class EscritorDiferido:
+
+    def __init__(self, sesion_local, tamano_lote=500, intervalo=0.0, max_pendientes=10000,
+                 durabilidad=DURABILIDAD_PARTIDA, timeout_encolar=30.0):
+        """
+        Inicializa un escritor en segundo plano de partidas terminadas (write-behind).
+
+        Las partidas se encolan en una cola acotada y un hilo las guarda en lotes con
+        JuegoService.registrar_partidas_simuladas, en una única transacción por lote. Cada
+        lote reúne las partidas que ya están en la cola, hasta tamano_lote, así que con
+        carga los lotes crecen solos mientras se escribe el anterior; con `intervalo` > 0
+        el escritor espera además hasta ese tiempo a que lleguen más. Si la cola está
+        llena, encolar se bloquea hasta que haya hueco (contrapresión).
+
+        Con durabilidad 'partida', quien termina una partida espera a que su lote se
+        confirme (varios jugadores comparten el mismo commit); con 'diferida' sólo espera
+        a encolarla, y las partidas encoladas se pierden si el proceso muere sin llamar a
+        detener.
+
+        Args:
+            sesion_local (sessionmaker): Fábrica de las sesiones del hilo escritor.
+            tamano_lote (int): Número máximo de partidas por lote.
+            intervalo (float): Segundos que el escritor espera a completar un lote.
+            max_pendientes (int): Tamaño máximo de la cola.
+            durabilidad (str): 'partida' o 'diferida'.
+            timeout_encolar (float | None): Segundos máximos de espera con la cola llena.
+        """
+        if durabilidad not in (DURABILIDAD_PARTIDA, DURABILIDAD_DIFERIDA):
+            raise ValueError(f"Durabilidad no válida: {durabilidad}")
+        self.sesion_local = sesion_local
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.durabilidad = durabilidad
+        self.timeout_encolar = timeout_encolar
+        self._cola = queue.Queue(maxsize=max_pendientes)
+        self._hilo = None
+        self._lock = threading.Lock()
+        self._lock_metricas = threading.Lock()
+        self.encoladas = 0
+        self.escritas = 0
+        self.lotes = 0
+        self.errores = 0
+
+    @property
+    def activo(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def iniciar(self):
+        """Arranca el hilo escritor si no está en marcha."""
+        with self._lock:
+            if not self.activo:
+                self._hilo = threading.Thread(target=self._escribir, name="escritor-diferido", daemon=True)
+                self._hilo.start()
+                logger.info("Escritor diferido iniciado (lotes de %s, durabilidad %s).", self.tamano_lote, self.durabilidad)
+
+    def encolar(self, partida, bloquear=True):
+        """
+        Encola una partida terminada para guardarla.
+
+        Args:
+            partida (dict): La partida, con la estructura de PartidaRepository.guardar_lote.
+            bloquear (bool): Si es False y la cola está llena, lanza queue.Full en vez de esperar.
+
+        Returns:
+            Future: Se completa con el id de la partida al confirmarse su lote.
+
+        Raises:
+            ColaLlenaError: Si la cola sigue llena tras timeout_encolar segundos.
+        """
+        futuro = Future()
+        try:
+            self._cola.put((partida, futuro), block=bloquear, timeout=self.timeout_encolar if bloquear else None)
+        except queue.Full:
+            if not bloquear:
+                raise
+            logger.error("La cola de escritura sigue llena tras %s s.", self.timeout_encolar)
+            raise ColaLlenaError("La cola de escritura está llena.")
+        with self._lock_metricas:
+            self.encoladas += 1
+        return futuro
+
+    def escribir(self, partida):
+        """
+        Encola una partida y, con durabilidad 'partida', espera a que se confirme.
+
+        Args:
+            partida (dict): La partida, con la estructura de PartidaRepository.guardar_lote.
+
+        Returns:
+            int | None: El id de la partida, o None si no se ha esperado a guardarla.
+        """
+        futuro = self.encolar(partida)
+        return futuro.result() if self.durabilidad == DURABILIDAD_PARTIDA else None
+
+    async def escribir_async(self, partida):
+        """
+        Versión de escribir para el bucle de eventos: sólo ocupa un hilo si la cola está llena.
+
+        Args:
+            partida (dict): La partida, con la estructura de PartidaRepository.guardar_lote.
+
+        Returns:
+            int | None: El id de la partida, o None si no se ha esperado a guardarla.
+        """
+        try:
+            futuro = self.encolar(partida, bloquear=False)
+        except queue.Full:
+            futuro = await asyncio.to_thread(self.encolar, partida)
+        if self.durabilidad != DURABILIDAD_PARTIDA:
+            return None
+        return await asyncio.wrap_future(futuro)
+
+    def vaciar(self, timeout=None):
+        """
+        Espera a que se guarden todas las partidas encoladas hasta ahora.
+
+        Args:
+            timeout (float | None): Segundos máximos de espera.
+        """
+        if not self.activo:
+            return
+        barrera = Future()
+        self._cola.put((None, barrera))
+        barrera.result(timeout)
+
+    def detener(self, timeout=None):
+        """
+        Guarda las partidas pendientes y detiene el hilo escritor.
+
+        Args:
+            timeout (float | None): Segundos máximos de espera.
+        """
+        with self._lock:
+            if not self.activo:
+                return
+            self._cola.put((None, None))
+            self._hilo.join(timeout)
+            self._hilo = None
+        logger.info("Escritor diferido detenido: %s partidas en %s lotes.", self.escritas, self.lotes)
+
+    def metricas(self):
+        """
+        Obtiene las métricas del escritor.
+
+        Returns:
+            dict[str, int]: Partidas encoladas, pendientes y escritas, lotes y errores.
+        """
+        return {
+            "encoladas": self.encoladas,
+            "pendientes": self._cola.qsize(),
+            "escritas": self.escritas,
+            "lotes": self.lotes,
+            "errores": self.errores,
+        }
+
+    def _escribir(self):
+        detener = False
+        while not detener:
+            lote = []
+            barrera = None
+            partida, futuro = self._cola.get()
+            limite = time.monotonic() + self.intervalo
+            # Se acumulan partidas hasta completar el lote, vaciar la cola (o vencer el intervalo) o llegar una marca
+            while True:
+                if partida is None:
+                    # Marca de vaciar (con futuro) o de detener (sin él): se escribe lo acumulado
+                    barrera = futuro
+                    detener = futuro is None
+                    break
+                lote.append((partida, futuro))
+                if len(lote) >= self.tamano_lote:
+                    break
+                restante = limite - time.monotonic()
+                try:
+                    partida, futuro = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+                except queue.Empty:
+                    break
+            if lote:
+                self._guardar_lote(lote)
+            if barrera is not None:
+                barrera.set_result(None)
+
+    def _guardar_lote(self, lote):
+        # Las partidas se guardan aunque quien las encoló haya dejado de esperar (p. ej. se
+        # canceló su petición); sus futuros cancelados simplemente no reciben el resultado
+        db = self.sesion_local()
+        try:
+            juego_service = JuegoService(PartidaRepository(db), JugadorRepository(db))
+            ids = juego_service.registrar_partidas_simuladas([partida for partida, _ in lote])
+            self.escritas += len(lote)
+            self.lotes += 1
+            for (_, futuro), partida_id in zip(lote, ids):
+                _resolver(futuro, resultado=partida_id)
+        except Exception as e:
+            db.rollback()
+            self.errores += 1
+            logger.error("Error al guardar un lote diferido de %s partidas: %s", len(lote), e)
+            for _, futuro in lote:
+                _resolver(futuro, error=e)
+        finally:
+            db.close()
+
+
+def _resolver(futuro, resultado=None, error=None):
+    # Un futuro ya cancelado no admite resultado: no debe detener el hilo escritor
+    if futuro.done():
+        return
+    try:
+        if error is not None:
+            futuro.set_exception(error)
+        else:
+            futuro.set_result(resultado)
+    except InvalidStateError:
+        pass
+
+
+def crear_escritor_diferido(sesion_local):
+    """
+    Crea un escritor diferido con la configuración de las variables de entorno.
+
+    Args:
+        sesion_local (sessionmaker): Fábrica de las sesiones del hilo escritor.
+
+    Returns:
+        EscritorDiferido: El escritor, sin iniciar.
+    """
+    return EscritorDiferido(
+        sesion_local,
+        tamano_lote=int(os.getenv("ESCRITURA_DIFERIDA_LOTE", "500")),
+        intervalo=float(os.getenv("ESCRITURA_DIFERIDA_INTERVALO", "0")),
+        max_pendientes=int(os.getenv("ESCRITURA_DIFERIDA_MAX_PENDIENTES", "10000")),
+        durabilidad=os.getenv("ESCRITURA_DIFERIDA_DURABILIDAD", DURABILIDAD_PARTIDA)
+    )
+
+
+# Escritor global de la API; sólo se inicia si ESCRITURA_DIFERIDA=1
+escritor_diferido = crear_escritor_diferido(SessionLocal)
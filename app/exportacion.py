@@ -0,0 +1,119 @@
+import csv
+import io
+import json
+import zlib
+from enum import Enum
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.logger_config import get_logger
+
+# Obtener el logger
+logger = get_logger(__name__)
+
+# Filas que se leen del cursor y se codifican juntas
+TAMANO_LOTE = 10000
+
+TIPOS_MIME = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+class FormatoExportacion(str, Enum):
+    NDJSON = 'ndjson'
+    CSV = 'csv'
+
+
+def _valor(valor):
+    return valor.value if isinstance(valor, Enum) else valor
+
+
+def codificar_lote(filas, formato, cabecera=False):
+    """
+    Codifica un lote de filas como NDJSON o CSV.
+
+    Args:
+        filas (list[Row]): Las filas del lote.
+        formato (FormatoExportacion): El formato de salida.
+        cabecera (bool): En CSV, si se escribe la fila de cabecera.
+
+    Returns:
+        bytes: Las filas codificadas en UTF-8.
+    """
+    if formato == FormatoExportacion.NDJSON:
+        return "".join(
+            json.dumps({columna: _valor(valor) for columna, valor in fila._mapping.items()}, ensure_ascii=False) + "\n"
+            for fila in filas
+        ).encode("utf-8")
+    salida = io.StringIO()
+    escritor = csv.writer(salida, lineterminator="\n")
+    if cabecera and filas:
+        escritor.writerow(filas[0]._fields)
+    escritor.writerows([_valor(valor) for valor in fila] for fila in filas)
+    return salida.getvalue().encode("utf-8")
+
+
+async def iterar_exportacion(db: AsyncSession, consulta, formato, tamano_lote=TAMANO_LOTE):
+    """
+    Recorre una consulta con un cursor de servidor y produce los lotes codificados.
+
+    Args:
+        db (AsyncSession): La sesión asíncrona de la base de datos.
+        consulta (Select): La consulta a exportar.
+        formato (FormatoExportacion): El formato de salida.
+        tamano_lote (int): Filas por lote (yield_per).
+
+    Yields:
+        bytes: Cada lote codificado.
+    """
+    resultado = await db.stream(consulta.execution_options(yield_per=tamano_lote))
+    try:
+        primero = True
+        async for filas in resultado.partitions():
+            yield codificar_lote(filas, formato, cabecera=primero)
+            primero = False
+    finally:
+        await resultado.close()
+
+
+async def comprimir_gzip(fragmentos):
+    """
+    Comprime al vuelo una secuencia de fragmentos en formato gzip.
+
+    Args:
+        fragmentos (AsyncIterator[bytes]): Los fragmentos sin comprimir.
+
+    Yields:
+        bytes: Los fragmentos comprimidos.
+    """
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: cabecera gzip
+    async for fragmento in fragmentos:
+        comprimido = compresor.compress(fragmento)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+def respuesta_exportacion(db: AsyncSession, consulta, nombre, formato, gzip=False):
+    """
+    Crea la respuesta en streaming de una exportación.
+
+    Args:
+        db (AsyncSession): La sesión asíncrona de la base de datos.
+        consulta (Select): La consulta a exportar.
+        nombre (str): Nombre base del fichero descargado.
+        formato (FormatoExportacion): El formato de salida.
+        gzip (bool): Si es True, el contenido se comprime en gzip.
+
+    Returns:
+        StreamingResponse: La respuesta, que se genera a medida que se envía.
+    """
+    logger.info("Exportando %s en formato %s (gzip: %s).", nombre, formato.value, gzip)
+    contenido = iterar_exportacion(db, consulta, formato)
+    fichero = f"{nombre}.{formato.value}"
+    tipo_mime = TIPOS_MIME[formato.value]
+    if gzip:
+        contenido = comprimir_gzip(contenido)
+        fichero += ".gz"
+        tipo_mime = "application/gzip"
+    return StreamingResponse(contenido, media_type=tipo_mime, headers={"Content-Disposition": f'attachment; filename="{fichero}"'})
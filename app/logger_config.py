@@ -1,21 +1,83 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import random
 
 # Asegurarse de que la carpeta 'logs' exista
 log_dir = "logs"
 if not os.path.exists(log_dir):
     os.makedirs(log_dir)
 
+# Nivel de los logs y fracción de jugadas que se registran (1 = todas, 0 = ninguna)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_MUESTREO_JUGADAS = float(os.getenv("LOG_MUESTREO_JUGADAS", "1"))
+
+# Las escrituras a disco se hacen en el hilo del QueueListener; quien registra
+# un mensaje sólo lo encola
+_cola = queue.SimpleQueue()
+_file_handler = logging.FileHandler(os.path.join(log_dir, "app.log"))  # Guardar logs en logs/app.log
+_file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+_queue_handler = logging.handlers.QueueHandler(_cola)
+_queue_handler.setFormatter(logging.Formatter('%(message)s'))  # El formato final lo aplica _file_handler
+_listener = logging.handlers.QueueListener(_cola, _file_handler, respect_handler_level=True)
+
 # Configuración global de logging
 logging.basicConfig(
-    level=logging.INFO,  # Nivel de los logs
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',  # Formato de los logs
+    level=LOG_LEVEL,  # Nivel de los logs
     handlers=[
-        logging.FileHandler(os.path.join(log_dir, "app.log")),  # Guardar logs en logs/app.log
+        _queue_handler,  # Encola los logs hacia logs/app.log
         #logging.StreamHandler()  # Mostrar los logs en la consola
     ]
 )
+_listener.start()
+atexit.register(_listener.stop)
+
+
+def _reiniciar_listener_en_hijo():
+    # Tras un fork el hilo del listener no existe en el proceso hijo: se crea uno nuevo
+    global _cola, _listener
+    _cola = queue.SimpleQueue()
+    _queue_handler.queue = _cola
+    _listener = logging.handlers.QueueListener(_cola, _file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+os.register_at_fork(after_in_child=_reiniciar_listener_en_hijo)
+
+
+class FiltroMuestreo(logging.Filter):
+
+    def __init__(self, fraccion):
+        """
+        Filtro que deja pasar sólo una fracción aleatoria de los registros.
+
+        Args:
+            fraccion (float): Probabilidad de que un registro se escriba (entre 0 y 1).
+        """
+        super().__init__()
+        self.fraccion = fraccion
+
+    def filter(self, record):
+        return self.fraccion >= 1 or random.random() < self.fraccion
+
 
 # Función para obtener el logger en cualquier parte del proyecto
 def get_logger(name: str):
     return logging.getLogger(name)
+
+
+# Función para obtener el logger de los mensajes por jugada, con muestreo opcional
+def get_logger_jugadas(name: str):
+    logger = logging.getLogger(f"{name}.jugadas")
+    if LOG_MUESTREO_JUGADAS < 1 and not logger.filters:
+        logger.addFilter(FiltroMuestreo(LOG_MUESTREO_JUGADAS))
+    return logger
+
+
+def vaciar_logs():
+    """Espera a que se escriban en disco todos los mensajes encolados."""
+    _listener.stop()
+    _listener.start()
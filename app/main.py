@@ -1,16 +1,47 @@
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
 from app.logger_config import get_logger
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, HTTPException, Query, WebSocket, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.repositories import PartidaRepository, JugadorRepository
-from app.database import get_db
+from app.repositories import PartidaRepository, JugadorRepository, PartidaRepositoryAsync, JugadorRepositoryAsync
+from app.services import JuegoService, ESTRATEGIAS
+from app.schemas import LotePartidas, GranularidadEnum
+from app.exportacion import FormatoExportacion, respuesta_exportacion
+from app.analitica import analizar, bloques_bd
+from app.database import get_db, get_async_db, SessionLocal
+from app.cache import cache_consultas
+from app.tiempo_real import atender_jugador, NOMBRE_MAQUINA
+from app.escritura_diferida import escritor_diferido
+from app.metricas import metricas, MiddlewareMetricas
 
 # Obtener el logger
 logger = get_logger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # La clasificación en memoria se carga al arrancar; si falla, /ranking consulta la base de datos
+    try:
+        with SessionLocal() as db:
+            JugadorRepository(db).reconstruir_ranking()
+    except Exception as e:
+        logger.error("No se ha podido cargar la clasificación en memoria: %s", e)
+    # Con escritura diferida, las partidas en tiempo real se guardan en lotes desde un hilo
+    if os.getenv("ESCRITURA_DIFERIDA", "0") == "1":
+        escritor_diferido.iniciar()
+    yield
+    # Se guardan las partidas pendientes antes de terminar
+    escritor_diferido.detener()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MiddlewareMetricas)
 
 @app.get("/get_global_info")
-def get_global_info(db: Session = Depends(get_db)):
+async def get_global_info(db: AsyncSession = Depends(get_async_db)):
     """
     Obtiene información global de las partidas.
 
@@ -24,17 +55,17 @@ def get_global_info(db: Session = Depends(get_db)):
             }
     """
     logger.info("GET /get_global_info - Solicitud de información global de las partidas.")
-    partida_repo = PartidaRepository(db)
+    partida_repo = PartidaRepositoryAsync(db)
     try:
-        info = partida_repo.obtener_info_global()
-        logger.info(f"Información global obtenida: {info}")
+        info = await partida_repo.obtener_info_global()
+        logger.info("Información global obtenida: %s", info)
         return info
     except Exception as e:
-        logger.error(f"Error al obtener información global: {e}")
+        logger.error("Error al obtener información global: %s", e)
         raise e
 
 @app.get("/mano_fuerte")
-def mano_fuerte(db: Session = Depends(get_db)):
+async def mano_fuerte(db: AsyncSession = Depends(get_async_db)):
     """
     Obtiene la mano que más veces ha ganado y su porcentaje de victoria.
 
@@ -46,17 +77,17 @@ def mano_fuerte(db: Session = Depends(get_db)):
             }
     """
     logger.info("GET /mano_fuerte - Solicitud de la mano más fuerte.")
-    partida_repo = PartidaRepository(db)
+    partida_repo = PartidaRepositoryAsync(db)
     try:
-        mano, porcentaje = partida_repo.obtener_mano_fuerte()
-        logger.info(f"Mano fuerte: {mano}, Porcentaje de victorias: {porcentaje}")
+        mano, porcentaje = await partida_repo.obtener_mano_fuerte()
+        logger.info("Mano fuerte: %s, Porcentaje de victorias: %s", mano, porcentaje)
         return {"mano_fuerte": mano, "porcentaje_victorias": porcentaje}
     except Exception as e:
-        logger.error(f"Error al obtener mano fuerte: {e}")
+        logger.error("Error al obtener mano fuerte: %s", e)
         raise e
 
 @app.get("/mano_debil")
-def mano_debil(db: Session = Depends(get_db)):
+async def mano_debil(db: AsyncSession = Depends(get_async_db)):
     """
     Obtiene la mano que más veces ha perdido y su porcentaje de derrota.
 
@@ -68,50 +99,306 @@ def mano_debil(db: Session = Depends(get_db)):
             }
     """
     logger.info("GET /mano_debil - Solicitud de la mano más débil.")
-    partida_repo = PartidaRepository(db)
+    partida_repo = PartidaRepositoryAsync(db)
     try:
-        mano, porcentaje = partida_repo.obtener_mano_debil()
-        logger.info(f"Mano débil: {mano}, Porcentaje de derrotas: {porcentaje}")
+        mano, porcentaje = await partida_repo.obtener_mano_debil()
+        logger.info("Mano débil: %s, Porcentaje de derrotas: %s", mano, porcentaje)
         return {"mano_debil": mano, "porcentaje_derrotas": porcentaje}
     except Exception as e:
-        logger.error(f"Error al obtener mano débil: {e}")
+        logger.error("Error al obtener mano débil: %s", e)
         raise e
 
 @app.get("/ranking")
-def ranking(db: Session = Depends(get_db)):
+async def ranking(
+    top: int = Query(3, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Obtiene el ranking de los 3 jugadores con más puntos.
+    Obtiene un tramo del ranking de jugadores, por defecto los 3 con más puntos.
+
+    Args:
+        top (int): Número de jugadores a devolver (de 1 a 1000).
+        offset (int): Número de jugadores que se saltan desde el primero.
 
     Returns:
-        list[Jugador]: Una lista con los 3 jugadores con más puntos.
+        list[Jugador]: Los jugadores del tramo, de más a menos puntos.
     """
-    logger.info("GET /ranking - Solicitud del ranking de jugadores.")
-    jugador_repo = JugadorRepository(db)
+    logger.info("GET /ranking - Solicitud del ranking de jugadores (top %s, offset %s).", top, offset)
+    jugador_repo = JugadorRepositoryAsync(db)
     try:
-        ranking = jugador_repo.obtener_ranking()
-        logger.info(f"Ranking obtenido: {ranking}")
+        ranking = await jugador_repo.obtener_ranking(top, offset)
+        logger.info("Ranking obtenido: %s", ranking)
         return ranking
     except Exception as e:
-        logger.error(f"Error al obtener ranking de jugadores: {e}")
+        logger.error("Error al obtener ranking de jugadores: %s", e)
+        raise e
+
+@app.get("/ranking/{jugador_id}")
+async def posicion_ranking(jugador_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Obtiene la posición de un jugador en el ranking.
+
+    Returns:
+        dict[str, int|str]: El jugador (id, nombre, tipo y puntos) y su posición; los
+            jugadores empatados a puntos comparten posición.
+    """
+    logger.info("GET /ranking/%s - Solicitud de la posición del jugador.", jugador_id)
+    jugador_repo = JugadorRepositoryAsync(db)
+    try:
+        posicion = await jugador_repo.obtener_posicion(jugador_id)
+    except Exception as e:
+        logger.error("Error al obtener la posición del jugador %s: %s", jugador_id, e)
         raise e
+    if posicion is None:
+        raise HTTPException(status_code=404, detail="Jugador no encontrado")
+    logger.info("Posición obtenida: %s", posicion)
+    return posicion
 
 @app.get("/estadisticas")
-def estadisticas(db: Session = Depends(get_db)):
+async def estadisticas(
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    granularidad: Optional[GranularidadEnum] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Obtiene estadísticas de partidas.
 
+    Sin parámetros, las estadísticas son de todo el histórico. Con desde, hasta o
+    granularidad, son de las partidas terminadas en ese intervalo (sin zona horaria,
+    las fechas se consideran UTC) y se desglosan por periodos (por defecto, por hora).
+
+    Args:
+        desde (datetime | None): Inicio del intervalo.
+        hasta (datetime | None): Fin del intervalo (excluido).
+        granularidad (GranularidadEnum | None): 'minuto', 'hora' o 'dia'.
+
     Returns:
         dict[str, int]: Un diccionario con las estadísticas de partidas:
             - total_partidas: Número total de partidas.
             - partidas_ganadas: Número de partidas ganadas.
             - partidas_abandonadas: Número de partidas abandonadas.
+            - granularidad y periodos: Sólo en las estadísticas de un intervalo.
     """
     logger.info("GET /estadisticas - Solicitud de estadísticas de partidas.")
-    partida_repo = PartidaRepository(db)
+    partida_repo = PartidaRepositoryAsync(db)
     try:
-        estadisticas = partida_repo.obtener_estadisticas_partidas()
-        logger.info(f"Estadísticas obtenidas: {estadisticas}")
+        if desde is None and hasta is None and granularidad is None:
+            estadisticas = await partida_repo.obtener_estadisticas_partidas()
+        else:
+            estadisticas = await partida_repo.obtener_estadisticas_periodo(desde, hasta, granularidad or GranularidadEnum.HORA)
+        logger.info("Estadísticas obtenidas: %s", estadisticas)
         return estadisticas
     except Exception as e:
-        logger.error(f"Error al obtener estadísticas de partidas: {e}")
+        logger.error("Error al obtener estadísticas de partidas: %s", e)
+        raise e
+
+@app.get("/cache/metricas")
+async def metricas_cache():
+    """
+    Obtiene las métricas de la caché de consultas.
+
+    Returns:
+        dict[str, int|float]: Aciertos, fallos, obsoletos servidos, expulsiones,
+            entradas, versión y tasa de aciertos.
+    """
+    logger.info("GET /cache/metricas - Solicitud de métricas de la caché.")
+    return cache_consultas.metricas()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Expone las métricas de la aplicación en el formato de texto de Prometheus.
+
+    Incluye la latencia de las peticiones por ruta, la duración de los métodos de los
+    repositorios y de los commits, las sesiones de la base de datos abiertas y cerradas
+    y las jugadas y partidas registradas (ver app.metricas).
+
+    Returns:
+        PlainTextResponse: Las métricas en el formato de exposición 0.0.4.
+    """
+    logger.debug("GET /metrics - Solicitud de métricas.")
+    return PlainTextResponse(metricas.exponer(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/export/jugadas")
+async def exportar_jugadas(
+    formato: FormatoExportacion = FormatoExportacion.NDJSON,
+    desde_id: Optional[int] = None,
+    hasta_id: Optional[int] = None,
+    jugador_id: Optional[int] = None,
+    gzip: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Exporta el histórico de jugadas en streaming, sin cargarlo en memoria.
+
+    Args:
+        formato (FormatoExportacion): 'ndjson' (una jugada JSON por línea) o 'csv'.
+        desde_id (int | None): Id mínimo de jugada (incluido).
+        hasta_id (int | None): Id máximo de jugada (incluido).
+        jugador_id (int | None): Sólo las jugadas de este jugador.
+        gzip (bool): Si es True, la respuesta se comprime en gzip.
+
+    Returns:
+        StreamingResponse: Las jugadas con id, partida_id, jugador_id, tipo y resultado.
+    """
+    logger.info("GET /export/jugadas - Exportación de jugadas.")
+    consulta = PartidaRepository.consulta_jugadas(desde_id, hasta_id, jugador_id)
+    return respuesta_exportacion(db, consulta, "jugadas", formato, gzip)
+
+@app.get("/export/partidas")
+async def exportar_partidas(
+    formato: FormatoExportacion = FormatoExportacion.NDJSON,
+    desde_id: Optional[int] = None,
+    hasta_id: Optional[int] = None,
+    jugador_id: Optional[int] = None,
+    gzip: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Exporta el histórico de partidas en streaming, sin cargarlo en memoria.
+
+    Args:
+        formato (FormatoExportacion): 'ndjson' (una partida JSON por línea) o 'csv'.
+        desde_id (int | None): Id mínimo de partida (incluido).
+        hasta_id (int | None): Id máximo de partida (incluido).
+        jugador_id (int | None): Sólo las partidas ganadas por este jugador.
+        gzip (bool): Si es True, la respuesta se comprime en gzip.
+
+    Returns:
+        StreamingResponse: Las partidas con id, estado y ganador_id.
+    """
+    logger.info("GET /export/partidas - Exportación de partidas.")
+    consulta = PartidaRepository.consulta_partidas(desde_id, hasta_id, jugador_id)
+    return respuesta_exportacion(db, consulta, "partidas", formato, gzip)
+
+@app.get("/analitica/jugadas")
+async def analitica_jugadas(
+    desde_id: Optional[int] = None,
+    hasta_id: Optional[int] = None,
+    jugador_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Analiza el histórico de jugadas en una pasada por bloques (ver app.analitica).
+
+    Recorre todas las jugadas del filtro, así que su coste crece con el histórico;
+    la memoria no. El análisis usa una sesión síncrona en un hilo del pool, de
+    modo que no bloquea el bucle de eventos mientras dura.
+
+    Args:
+        desde_id (int | None): Id mínimo de jugada (incluido).
+        hasta_id (int | None): Id máximo de jugada (incluido).
+        jugador_id (int | None): Sólo las jugadas de este jugador.
+
+    Returns:
+        dict: La matriz de jugada por resultado, las transiciones, el porcentaje de
+            veces que se repite la jugada tras cada resultado y la distribución de las
+            rachas (ver AnalizadorJugadas.resultado).
+    """
+    logger.info("GET /analitica/jugadas - Análisis de jugadas.")
+    try:
+        return await run_in_threadpool(lambda: analizar(bloques_bd(db, desde_id=desde_id, hasta_id=hasta_id, jugador_id=jugador_id)))
+    except Exception as e:
+        logger.error("Error al analizar las jugadas: %s", e)
+        raise e
+
+@app.get("/jugadores/{jugador_id}/estadisticas")
+async def estadisticas_jugador(jugador_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Obtiene las estadísticas de un jugador: partidas, winrate, distribución de manos
+    y sus manos más fuerte y más débil.
+
+    Returns:
+        dict: Las estadísticas del jugador (ver JugadorRepository.obtener_estadisticas).
+    """
+    logger.info("GET /jugadores/%s/estadisticas - Solicitud de estadísticas del jugador.", jugador_id)
+    jugador_repo = JugadorRepositoryAsync(db)
+    try:
+        estadisticas = await jugador_repo.obtener_estadisticas(jugador_id)
+    except Exception as e:
+        logger.error("Error al obtener las estadísticas del jugador %s: %s", jugador_id, e)
         raise e
+    if estadisticas is None:
+        raise HTTPException(status_code=404, detail="Jugador no encontrado")
+    logger.info("Estadísticas del jugador obtenidas: %s", estadisticas)
+    return estadisticas
+
+@app.post("/partidas/bulk")
+async def registrar_partidas_bulk(lote: LotePartidas, db: AsyncSession = Depends(get_async_db)):
+    """
+    Registra un lote de partidas completas jugadas fuera de la aplicación.
+
+    Todas las partidas se guardan en una única transacción: si alguna no es válida,
+    no se guarda ninguna.
+
+    Returns:
+        dict[str, int|list[int]]: Un diccionario con la siguiente estructura:
+            {
+                "partidas_registradas": int,  # Número de partidas guardadas.
+                "ids": list[int]  # Ids de las partidas, en el orden recibido.
+            }
+    """
+    logger.info("POST /partidas/bulk - Registro de %s partidas.", len(lote.partidas))
+
+    def registrar(session):
+        juego_service = JuegoService(PartidaRepository(session), JugadorRepository(session))
+        return juego_service.registrar_partidas_lote(lote.partidas)
+
+    try:
+        ids = await db.run_sync(registrar)
+        logger.info("Partidas registradas: %s", len(ids))
+        return {"partidas_registradas": len(ids), "ids": ids}
+    except ValueError as e:
+        logger.error("Lote de partidas no válido: %s", e)
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error("Error al registrar el lote de partidas: %s", e)
+        raise e
+
+@app.websocket("/ws/partida")
+async def ws_partida(
+    websocket: WebSocket,
+    nombre: str = Query(min_length=1),
+    estrategia: str = Query('aleatoria'),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Juega partidas en tiempo real contra la máquina por WebSocket.
+
+    El estado de cada partida se guarda en memoria y la partida sólo se persiste al
+    terminar (ver app.tiempo_real.atender_jugador): en su propia transacción o, si el
+    escritor diferido está activo, en un lote junto con las de otros jugadores.
+
+    Args:
+        nombre (str): El nombre del jugador.
+        estrategia (str): La estrategia de la máquina ('aleatoria', 'frecuencias', 'markov' o 'mixta').
+    """
+    if estrategia not in ESTRATEGIAS:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Estrategia no válida")
+        return
+    await websocket.accept()
+    logger.info("WS /ws/partida - Jugador %s conectado (estrategia %s).", nombre, estrategia)
+
+    def registrar(session, partida):
+        juego_service = JuegoService(PartidaRepository(session), JugadorRepository(session))
+        return juego_service.registrar_partidas_lote([partida])[0]
+
+    ids_jugadores = []
+
+    def obtener_ids(session):
+        jugador_repo = JugadorRepository(session)
+        ids = [jugador_repo.obtener_id(nombre, "humano"), jugador_repo.obtener_id(NOMBRE_MAQUINA, "maquina")]
+        # El escritor diferido guarda las partidas en otra sesión, que tiene que ver a los jugadores nuevos
+        session.commit()
+        return ids
+
+    async def guardar(partida):
+        if not escritor_diferido.activo:
+            return await db.run_sync(registrar, partida.a_partida_lote())
+        if not ids_jugadores:
+            ids_jugadores.extend(await db.run_sync(obtener_ids))
+        return await escritor_diferido.escribir_async(partida.a_partida(*ids_jugadores))
+
+    await atender_jugador(websocket, nombre, estrategia, guardar)
@@ -0,0 +1,266 @@
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from app.logger_config import get_logger
+
+# Obtener el logger
+logger = get_logger(__name__)
+
+# Con METRICAS=0 no se mide nada y /metrics sólo devuelve las métricas vacías
+METRICAS_ACTIVAS = os.getenv("METRICAS", "1") == "1"
+
+# Límites superiores (en segundos) de los buckets de los histogramas de latencia
+BUCKETS_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(nombres, valores):
+    if not nombres:
+        return ""
+    return "{" + ",".join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)) + "}"
+
+
+def _numero(valor):
+    return "+Inf" if valor == float("inf") else repr(float(valor))
+
+
+class Contador:
+
+    tipo = "counter"
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        """
+        Contador de Prometheus, con una serie por combinación de valores de sus etiquetas.
+
+        Args:
+            nombre (str): El nombre de la métrica.
+            ayuda (str): La descripción de la métrica.
+            etiquetas (tuple[str, ...]): Los nombres de las etiquetas.
+        """
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *etiquetas, valor=1):
+        """
+        Incrementa el contador.
+
+        Args:
+            *etiquetas: Los valores de las etiquetas, en el orden de su declaración.
+            valor (float): El incremento.
+        """
+        if not METRICAS_ACTIVAS:
+            return
+        with self._lock:
+            self._series[etiquetas] = self._series.get(etiquetas, 0) + valor
+
+    def exponer(self):
+        with self._lock:
+            series = sorted(self._series.items())
+        return [f"{self.nombre}{_etiquetas(self.etiquetas, valores)} {_numero(valor)}" for valores, valor in series]
+
+
+class Histograma:
+
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        """
+        Histograma de Prometheus, con una serie por combinación de valores de sus etiquetas.
+
+        Cada observación sólo incrementa su bucket; los acumulados que pide el formato
+        de Prometheus se calculan al exponer.
+
+        Args:
+            nombre (str): El nombre de la métrica.
+            ayuda (str): La descripción de la métrica.
+            etiquetas (tuple[str, ...]): Los nombres de las etiquetas.
+            buckets (tuple[float, ...]): Los límites superiores de los buckets, en orden.
+        """
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(buckets)
+        self._series = {}  # valores de las etiquetas -> [cuentas por bucket (+Inf al final), suma]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *etiquetas):
+        """
+        Registra una observación.
+
+        Args:
+            valor (float): El valor observado.
+            *etiquetas: Los valores de las etiquetas, en el orden de su declaración.
+        """
+        if not METRICAS_ACTIVAS:
+            return
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    @contextmanager
+    def medir(self, *etiquetas):
+        """
+        Mide la duración de un bloque with y la registra en segundos.
+
+        Args:
+            *etiquetas: Los valores de las etiquetas, en el orden de su declaración.
+        """
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, *etiquetas)
+
+    def exponer(self):
+        with self._lock:
+            series = sorted((valores, list(cuentas), suma) for valores, (cuentas, suma) in self._series.items())
+        lineas = []
+        for valores, cuentas, suma in series:
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets + (float("inf"),), cuentas):
+                acumulado += cuenta
+                etiquetas = _etiquetas(self.etiquetas + ("le",), valores + (_numero(limite),))
+                lineas.append(f"{self.nombre}_bucket{etiquetas} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, valores)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, valores)} {acumulado}")
+        return lineas
+
+
+class RegistroMetricas:
+
+    def __init__(self):
+        """Registro de las métricas del proceso, que se exponen juntas en /metrics."""
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica):
+        with self._lock:
+            if metrica.nombre in self._metricas:
+                raise ValueError(f"La métrica {metrica.nombre} ya está registrada.")
+            self._metricas[metrica.nombre] = metrica
+        return metrica
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        """Crea y registra un Contador (ver Contador)."""
+        return self._registrar(Contador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        """Crea y registra un Histograma (ver Histograma)."""
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def exponer(self):
+        """
+        Genera el texto de todas las métricas en el formato de exposición de Prometheus (0.0.4).
+
+        Returns:
+            str: Las métricas, una muestra por línea.
+        """
+        with self._lock:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for metrica in metricas:
+            lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+            lineas.extend(metrica.exponer())
+        return "\n".join(lineas) + "\n"
+
+
+# Registro global y métricas de la aplicación
+metricas = RegistroMetricas()
+peticiones_http = metricas.histograma(
+    "ppt_peticiones_http_segundos", "Latencia de las peticiones HTTP por ruta.", ("metodo", "ruta", "estado")
+)
+metodos_repositorio = metricas.histograma(
+    "ppt_repositorio_segundos", "Duración de los métodos de los repositorios.", ("repositorio", "metodo")
+)
+commits = metricas.histograma("ppt_commit_segundos", "Duración de los commits de la base de datos.", ("operacion",))
+sesiones_abiertas = metricas.contador("ppt_sesiones_abiertas_total", "Sesiones de la base de datos abiertas.", ("tipo",))
+sesiones_cerradas = metricas.contador("ppt_sesiones_cerradas_total", "Sesiones de la base de datos cerradas.", ("tipo",))
+jugadas_registradas = metricas.contador("ppt_jugadas_total", "Jugadas registradas por JuegoService.", ("origen",))
+partidas_terminadas = metricas.contador(
+    "ppt_partidas_total", "Partidas terminadas registradas por JuegoService.", ("origen", "estado")
+)
+
+
+def instrumentar_repositorio(clase):
+    """
+    Mide la duración de cada método público de un repositorio en ppt_repositorio_segundos.
+
+    Los métodos se envuelven una sola vez al importar el módulo; con METRICAS=0 la
+    clase no se modifica. Los generadores (p. ej. iterar) no se miden, ya que la
+    llamada sólo crea el generador.
+
+    Args:
+        clase (type): La clase del repositorio.
+
+    Returns:
+        type: La misma clase.
+    """
+    if not METRICAS_ACTIVAS:
+        return clase
+    for nombre, atributo in list(vars(clase).items()):
+        if nombre.startswith("_") or not inspect.isfunction(atributo) or inspect.isgeneratorfunction(inspect.unwrap(atributo)):
+            continue
+        setattr(clase, nombre, _medido(atributo, clase.__name__, nombre))
+    return clase
+
+
+def _medido(metodo, repositorio, nombre):
+    @wraps(metodo)
+    def medido(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return metodo(*args, **kwargs)
+        finally:
+            metodos_repositorio.observar(time.perf_counter() - inicio, repositorio, nombre)
+    return medido
+
+
+class MiddlewareMetricas:
+
+    def __init__(self, app):
+        """
+        Middleware ASGI que mide la latencia de cada petición HTTP hasta enviar el último byte.
+
+        La ruta es la plantilla de la ruta de FastAPI (p. ej. /ranking/{jugador_id}), de
+        modo que hay una serie por endpoint y no por URL; las peticiones que no
+        corresponden a ninguna ruta se agrupan en "sin_ruta".
+
+        Args:
+            app (ASGIApp): La aplicación a medir.
+        """
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICAS_ACTIVAS:
+            await self.app(scope, receive, send)
+            return
+        inicio = time.perf_counter()
+        estado = [500]
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado[0] = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            ruta = scope.get("route")
+            peticiones_http.observar(
+                time.perf_counter() - inicio, scope["method"], getattr(ruta, "path", "sin_ruta"), str(estado[0])
+            )
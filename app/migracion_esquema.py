@@ -0,0 +1,109 @@
+from sqlalchemy import MetaData, SmallInteger, Enum as SqlEnum, Integer, inspect, text
+from sqlalchemy.schema import CreateTable
+from app.logger_config import get_logger
+from app.database import Base
+from app.models import CODIGOS_ENUM, Partida, Jugada
+from app.schemas import EstadoPartidaEnum, JugadaEnum, ResultadoJugadaEnum
+
+# Obtener el logger
+logger = get_logger(__name__)
+
+# Columnas que cambian de tipo entre el esquema de texto y el compacto
+COLUMNAS_ENUM = {
+    Partida.__tablename__: {"estado": EstadoPartidaEnum},
+    Jugada.__tablename__: {"tipo": JugadaEnum, "resultado": ResultadoJugadaEnum},
+}
+
+ESQUEMA_TEXTO = 'texto'
+ESQUEMA_COMPACTO = 'compacto'
+
+
+def esquema_actual(bind):
+    """
+    Detecta cómo están guardadas las columnas de enums de la base de datos.
+
+    Args:
+        bind (Engine): El engine de la base de datos.
+
+    Returns:
+        dict[str, str | None]: Por tabla, 'texto', 'compacto' o None si la tabla no existe.
+    """
+    inspector = inspect(bind)
+    tablas = set(inspector.get_table_names())
+    esquemas = {}
+    for tabla, columnas in COLUMNAS_ENUM.items():
+        if tabla not in tablas:
+            esquemas[tabla] = None
+            continue
+        tipos = {columna["name"]: columna["type"] for columna in inspector.get_columns(tabla)}
+        columna = next(iter(columnas))
+        esquemas[tabla] = ESQUEMA_COMPACTO if tipos[columna]._type_affinity is Integer else ESQUEMA_TEXTO
+    return esquemas
+
+
+def _conversion(columna, enum_cls, compacto):
+    miembros = CODIGOS_ENUM[enum_cls]
+    if compacto:
+        casos = " ".join(f"WHEN '{miembro.name}' THEN {codigo}" for codigo, miembro in enumerate(miembros))
+    else:
+        casos = " ".join(f"WHEN {codigo} THEN '{miembro.name}'" for codigo, miembro in enumerate(miembros))
+    return f"CASE {columna} {casos} END"
+
+
+def migrar_esquema(bind, compacto=True, vacuum=True):
+    """
+    Convierte las columnas de enums de las partidas y las jugadas al esquema compacto
+    (enteros pequeños) o de vuelta al de texto.
+
+    Cada tabla se reconstruye en una única transacción, como recomienda SQLite para
+    cambiar el tipo de una columna: se crea la tabla nueva, se copian las filas
+    traduciendo los valores, se borra la antigua, se renombra la nueva y se recrean los
+    índices. Las tablas que ya tienen el esquema pedido no se tocan. Después hay que
+    arrancar la aplicación con ESQUEMA_COMPACTO acorde al esquema elegido.
+
+    Args:
+        bind (Engine): El engine de la base de datos.
+        compacto (bool): True para el esquema compacto y False para el de texto.
+        vacuum (bool): Si es True, se ejecuta VACUUM al terminar para liberar el espacio.
+
+    Returns:
+        list[str]: Las tablas convertidas.
+    """
+    destino = ESQUEMA_COMPACTO if compacto else ESQUEMA_TEXTO
+    esquemas = esquema_actual(bind)
+    convertidas = []
+    for tabla, columnas in COLUMNAS_ENUM.items():
+        if esquemas[tabla] in (None, destino):
+            continue
+        logger.info("Migrando la tabla %s al esquema %s.", tabla, destino)
+        original = Base.metadata.tables[tabla]
+        # La copia necesita las tablas a las que apuntan sus claves ajenas en su MetaData
+        metadata = MetaData()
+        for otra in Base.metadata.sorted_tables:
+            otra.to_metadata(metadata)
+        nueva = original.to_metadata(metadata, name=f"_{tabla}_migracion")
+        for columna, enum_cls in columnas.items():
+            nueva.c[columna].type = SmallInteger() if compacto else SqlEnum(enum_cls)
+        # Sólo se copian las columnas que ya tiene la tabla: en una base de datos anterior
+        # a alguna columna del modelo, la columna nueva queda vacía (como con init_db)
+        existentes = {columna["name"] for columna in inspect(bind).get_columns(tabla)}
+        nombres = [columna.name for columna in original.columns if columna.name in existentes]
+        seleccion = [
+            _conversion(nombre, columnas[nombre], compacto) if nombre in columnas else nombre
+            for nombre in nombres
+        ]
+        with bind.begin() as conn:
+            conn.execute(CreateTable(nueva))
+            conn.execute(text(
+                f"INSERT INTO {nueva.name} ({', '.join(nombres)}) SELECT {', '.join(seleccion)} FROM {tabla}"
+            ))
+            conn.execute(text(f"DROP TABLE {tabla}"))
+            conn.execute(text(f"ALTER TABLE {nueva.name} RENAME TO {tabla}"))
+            for index in original.indexes:
+                index.create(bind=conn)
+        convertidas.append(tabla)
+    if convertidas and vacuum:
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+    logger.info("Migración al esquema %s terminada: %s.", destino, convertidas)
+    return convertidas
@@ -1,9 +1,87 @@
+import os
 from app.schemas import JugadaEnum, ResultadoJugadaEnum, EstadoPartidaEnum, TipoJugadorEnum
-from sqlalchemy import Column, Integer, String, Enum as SqlEnum, ForeignKey
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, Enum as SqlEnum, ForeignKey, Index, case, type_coerce
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 
 from app.database import Base
 
+# Con ESQUEMA_COMPACTO=1 las jugadas y los estados se guardan como enteros pequeños en lugar de texto
+ESQUEMA_COMPACTO = os.getenv("ESQUEMA_COMPACTO", "0") == "1"
+
+# Código de cada valor en el esquema compacto; no deben cambiar, ya que están guardados en la base de datos
+CODIGOS_ENUM = {
+    JugadaEnum: [JugadaEnum.PIEDRA, JugadaEnum.PAPEL, JugadaEnum.TIJERA],
+    ResultadoJugadaEnum: [ResultadoJugadaEnum.EMPATE, ResultadoJugadaEnum.GANADA, ResultadoJugadaEnum.PERDIDA],
+    EstadoPartidaEnum: [EstadoPartidaEnum.EN_CURSO, EstadoPartidaEnum.FINALIZADA, EstadoPartidaEnum.ABANDONADA],
+}
+
+def ahora_utc():
+    """Fecha y hora actual en UTC, sin zona horaria (así se guardan las fechas)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def a_utc(momento):
+    """Convierte una fecha a UTC sin zona horaria; las fechas sin zona se consideran ya en UTC."""
+    return momento.astimezone(timezone.utc).replace(tzinfo=None) if momento.tzinfo else momento
+
+class EnumCompacto(TypeDecorator):
+    """
+    Enum guardado como un SMALLINT con su código en CODIGOS_ENUM.
+
+    Se escribe y se lee igual que SqlEnum (miembros del enum o sus valores), por lo que
+    las consultas y las respuestas de la API no cambian; en SQLite los códigos 0 y 1
+    no ocupan espacio en la fila y el 2 ocupa un byte.
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_cls):
+        super().__init__()
+        self.enum_cls = enum_cls
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else CODIGOS_ENUM[self.enum_cls].index(self.enum_cls(value))
+
+    def process_literal_param(self, value, dialect):
+        return str(self.process_bind_param(value, dialect))
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else CODIGOS_ENUM[self.enum_cls][value]
+
+def tipo_enum(enum_cls):
+    """Tipo de columna de un enum según el esquema configurado (ESQUEMA_COMPACTO)."""
+    return EnumCompacto(enum_cls) if ESQUEMA_COMPACTO else SqlEnum(enum_cls)
+
+def valor_sql(miembro, compacto=None):
+    """
+    Literal SQL con el que se guarda un valor de un enum, para las consultas en SQL directo.
+
+    Args:
+        miembro (Enum): El valor del enum.
+        compacto (bool | None): El esquema; por defecto, el configurado.
+
+    Returns:
+        str: El código (esquema compacto) o el nombre entre comillas (SqlEnum).
+    """
+    compacto = ESQUEMA_COMPACTO if compacto is None else compacto
+    return str(CODIGOS_ENUM[type(miembro)].index(miembro)) if compacto else f"'{miembro.name}'"
+
+def codigo_enum(columna, enum_cls):
+    """
+    Expresión SQL con el código en CODIGOS_ENUM de una columna de un enum, en cualquier esquema.
+
+    Args:
+        columna (Column): La columna del enum.
+        enum_cls (type[Enum]): El enum de la columna.
+
+    Returns:
+        ColumnElement: La expresión entera.
+    """
+    if ESQUEMA_COMPACTO:
+        return type_coerce(columna, Integer)
+    return case({miembro.name: codigo for codigo, miembro in enumerate(CODIGOS_ENUM[enum_cls])}, value=type_coerce(columna, String))
+
 class Jugador(Base):
     __tablename__ = 'jugadores'
 
@@ -12,13 +90,27 @@ class Jugador(Base):
     tipo = Column(SqlEnum(TipoJugadorEnum)) # 'humano' o 'maquina'
     puntos = Column(Integer, default=0)
 
+    __table_args__ = (
+        Index('ux_jugadores_nombre', 'nombre', unique=True),  # get_or_create
+        Index('ix_jugadores_puntos', puntos.desc()),  # ranking
+    )
+
 class Partida(Base):
     __tablename__ = 'partidas'
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    estado = Column(SqlEnum(EstadoPartidaEnum), default=EstadoPartidaEnum.EN_CURSO)  # 'en curso', 'finalizada', 'abandonada'
+    estado = Column(tipo_enum(EstadoPartidaEnum), default=EstadoPartidaEnum.EN_CURSO)  # 'en curso', 'finalizada', 'abandonada'
     ganador_id = Column(Integer, ForeignKey('jugadores.id'))
     ganador = relationship("Jugador", foreign_keys=[ganador_id])
+    jugador1_id = Column(Integer, ForeignKey('jugadores.id'))
+    jugador2_id = Column(Integer, ForeignKey('jugadores.id'))
+    creada_en = Column(DateTime, default=ahora_utc)
+    finalizada_en = Column(DateTime)  # al finalizarla o abandonarla
+
+    __table_args__ = (
+        Index('ix_partidas_estado_ganador', 'estado', 'ganador_id'),  # conteos desde partidas (reconstruir_contadores)
+        Index('ix_partidas_ganador', 'ganador_id'),
+    )
 
 class Jugada(Base):
     __tablename__ = 'jugadas'
@@ -26,5 +118,32 @@ class Jugada(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     partida_id = Column(Integer, ForeignKey('partidas.id'))
     jugador_id = Column(Integer, ForeignKey('jugadores.id'))
-    tipo = Column(SqlEnum(JugadaEnum)) # 'piedra', 'papel', 'tijera'
-    resultado = Column(SqlEnum(ResultadoJugadaEnum))  # 'ganada', 'perdida', 'empate'
+    tipo = Column(tipo_enum(JugadaEnum)) # 'piedra', 'papel', 'tijera'
+    resultado = Column(tipo_enum(ResultadoJugadaEnum))  # 'ganada', 'perdida', 'empate'
+
+    __table_args__ = (
+        Index('ix_jugadas_resultado_tipo', 'resultado', 'tipo'),  # mano fuerte y débil
+        Index('ix_jugadas_jugador', 'jugador_id'),  # (jugador_id, id): exportación por jugador en orden de id
+        Index('ix_jugadas_partida', 'partida_id'),
+    )
+
+class EstadisticaAgregada(Base):
+    __tablename__ = 'estadisticas_agregadas'
+
+    clave = Column(String, primary_key=True)  # p. ej. 'estado:finalizada' o 'jugada:piedra:ganada'
+    valor = Column(Integer, nullable=False, default=0)
+
+class EstadisticaPeriodo(Base):
+    __tablename__ = 'estadisticas_periodo'
+
+    granularidad = Column(String, primary_key=True)  # 'minuto', 'hora' o 'dia'
+    inicio = Column(Integer, primary_key=True)  # inicio del periodo, en segundos desde epoch (UTC)
+    clave = Column(String, primary_key=True)  # las mismas claves que estadisticas_agregadas
+    valor = Column(Integer, nullable=False, default=0)
+
+class EstadisticaJugador(Base):
+    __tablename__ = 'estadisticas_jugador'
+
+    jugador_id = Column(Integer, ForeignKey('jugadores.id'), primary_key=True)
+    clave = Column(String, primary_key=True)  # las mismas claves que estadisticas_agregadas
+    valor = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,165 @@
+import threading
+import time
+import numpy as np
+from sortedcontainers import SortedList
+from app.logger_config import get_logger
+
+# Obtener el logger
+logger = get_logger(__name__)
+
+# Los ids de jugador caben en los 32 bits bajos de la clave
+BITS_ID = 32
+MASCARA_ID = (1 << BITS_ID) - 1
+
+
+def _clave(jugador_id, puntos):
+    # Orden ascendente de clave = puntos descendentes y, a igualdad de puntos, id ascendente
+    return -(puntos << BITS_ID) + jugador_id
+
+
+class Clasificacion:
+
+    def __init__(self):
+        """
+        Inicializa una clasificación de jugadores en memoria, ordenada por puntos.
+
+        Cada jugador se guarda como un único entero (puntos e id) en una SortedList, de
+        modo que insertar, borrar y calcular la posición de un jugador son O(log n); los
+        puntos actuales de cada jugador se guardan en un array de NumPy indexado por id.
+        La clasificación pertenece a una única base de datos (la de reconstruir) y hasta
+        entonces no está activa.
+
+        Sólo refleja las escrituras de este proceso. Para detectar las de otros procesos
+        guarda la versión de la base de datos con la que se cargó (el mayor id de jugador
+        y el contador de partidas ganadas) y la avanza con cada suma; si la versión de la
+        base de datos no coincide, hay que reconstruirla (ver comprobar).
+        """
+        self._lock = threading.Lock()
+        self.limpiar()
+
+    def activa(self, base_de_datos):
+        """
+        Indica si la clasificación está cargada para una base de datos.
+
+        Args:
+            base_de_datos (str): La URL de la base de datos.
+
+        Returns:
+            bool: True si la clasificación refleja esa base de datos.
+        """
+        return self.base_de_datos == base_de_datos
+
+    def limpiar(self):
+        """Vacía la clasificación y la desactiva."""
+        with self._lock:
+            self.base_de_datos = None
+            self.version = None
+            self.comprobada_en = 0.0
+            self._claves = SortedList()
+            self._puntos = np.full(0, -1, dtype=np.int64)  # -1: jugador ausente
+
+    def reconstruir(self, base_de_datos, ids, puntos, version=None):
+        """
+        Carga la clasificación completa de una base de datos y la activa.
+
+        Args:
+            base_de_datos (str): La URL de la base de datos.
+            ids (np.ndarray): Los ids de todos los jugadores.
+            puntos (np.ndarray): Los puntos de cada jugador, en el mismo orden.
+            version (tuple[int, int] | None): El mayor id de jugador y las partidas ganadas
+                de la base de datos al leer los puntos; sin versión no se comprueba.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        puntos = np.asarray(puntos, dtype=np.int64)
+        tabla = np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype=np.int64)
+        tabla[ids] = puntos
+        claves = SortedList()
+        claves.update(np.sort(-(puntos << BITS_ID) + ids).tolist())
+        with self._lock:
+            self.base_de_datos = base_de_datos
+            self.version = version
+            self.comprobada_en = time.monotonic()
+            self._claves = claves
+            self._puntos = tabla
+        logger.info("Clasificación reconstruida con %s jugadores.", len(ids))
+
+    def sumar(self, puntos_por_jugador):
+        """
+        Suma puntos a varios jugadores; los que no estén se añaden con esos puntos.
+
+        Args:
+            puntos_por_jugador (dict[int, int]): Los puntos a sumar por id de jugador.
+        """
+        with self._lock:
+            maximo = max(puntos_por_jugador, default=-1)
+            if maximo >= len(self._puntos):
+                ampliada = np.full(max(maximo + 1, 2 * len(self._puntos)), -1, dtype=np.int64)
+                ampliada[:len(self._puntos)] = self._puntos
+                self._puntos = ampliada
+            for jugador_id, suma in puntos_por_jugador.items():
+                actuales = int(self._puntos[jugador_id])
+                if actuales >= 0:
+                    if suma == 0:
+                        continue
+                    self._claves.remove(_clave(jugador_id, actuales))
+                else:
+                    actuales = 0
+                self._puntos[jugador_id] = actuales + suma
+                self._claves.add(_clave(jugador_id, actuales + suma))
+            if self.version is not None:
+                # Cada punto es una partida ganada
+                jugador_maximo, ganadas = self.version
+                self.version = (max(jugador_maximo, maximo), ganadas + sum(puntos_por_jugador.values()))
+
+    def comprobar(self, version):
+        """
+        Compara la versión de la base de datos con la que refleja la clasificación.
+
+        Args:
+            version (tuple[int, int]): El mayor id de jugador y las partidas ganadas actuales.
+
+        Returns:
+            bool: False si la base de datos tiene escrituras de otro proceso y hay que
+                reconstruir la clasificación.
+        """
+        with self._lock:
+            self.comprobada_en = time.monotonic()
+            return self.version is None or self.version == tuple(version)
+
+    def pagina(self, top, offset=0):
+        """
+        Obtiene un tramo de la clasificación.
+
+        Args:
+            top (int): Número de jugadores.
+            offset (int): Número de jugadores que se saltan desde el primero.
+
+        Returns:
+            list[tuple[int, int]]: Pares (id, puntos) en orden de clasificación.
+        """
+        with self._lock:
+            claves = self._claves[offset:offset + top]
+        return [(clave & MASCARA_ID, -(clave >> BITS_ID)) for clave in claves]
+
+    def posicion(self, jugador_id):
+        """
+        Obtiene la posición de un jugador: 1 más el número de jugadores con más puntos.
+
+        Args:
+            jugador_id (int): El id del jugador.
+
+        Returns:
+            tuple[int, int] | None: La posición y los puntos del jugador, o None si no está.
+        """
+        with self._lock:
+            if not 0 <= jugador_id < len(self._puntos) or self._puntos[jugador_id] < 0:
+                return None
+            puntos = int(self._puntos[jugador_id])
+            return self._claves.bisect_left(_clave(0, puntos)) + 1, puntos
+
+    def __len__(self):
+        return len(self._claves)
+
+
+# Clasificación global del proceso; la API la reconstruye al arrancar
+clasificacion = Clasificacion()
@@ -0,0 +1,346 @@
+import json
+import os
+import numpy as np
+from app.logger_config import get_logger
+from app.repositories import PartidaRepository, JugadorRepository, clave_jugada, mano_por_resultado
+from app.schemas import EstadoPartidaEnum, ResultadoJugadaEnum
+from app.services import JuegoService, JUGADAS, RESULTADOS
+
+# Obtener el logger
+logger = get_logger(__name__)
+
+# Cada jugada es un registro de ancho fijo; tipo y resultado usan los códigos de JUGADAS y RESULTADOS
+DTYPE_REGISTRO = np.dtype([
+    ("partida", "<u8"),  # número de la partida dentro del registro, creciente
+    ("jugador", "<u4"),  # id del jugador que hace la jugada (ver leer_jugadores)
+    ("rival", "<u4"),  # id de su rival
+    ("tipo", "u1"),
+    ("resultado", "u1"),
+])
+
+# Cabecera del fichero, seguida de los registros sin relleno
+DTYPE_CABECERA = np.dtype([("magia", "S8"), ("version", "<u2"), ("tam_registro", "<u2"), ("reservado", "<u4")])
+MAGIA = b"PPTREG01"
+VERSION = 1
+
+# Códigos de los resultados ganada y perdida
+GANADA = RESULTADOS.index(ResultadoJugadaEnum.GANADA)
+PERDIDA = RESULTADOS.index(ResultadoJugadaEnum.PERDIDA)
+
+
+def ruta_jugadores(ruta):
+    """Ruta del fichero JSON con los nombres y tipos de los jugadores de un registro."""
+    return f"{ruta}.jugadores.json"
+
+
+def _comprobar_cabecera(ruta, datos):
+    if len(datos) < DTYPE_CABECERA.itemsize:
+        raise ValueError(f"{ruta} no es un registro de partidas: falta la cabecera.")
+    cabecera = np.frombuffer(datos[:DTYPE_CABECERA.itemsize], dtype=DTYPE_CABECERA)[0]
+    if cabecera["magia"] != MAGIA:
+        raise ValueError(f"{ruta} no es un registro de partidas.")
+    if cabecera["version"] != VERSION or cabecera["tam_registro"] != DTYPE_REGISTRO.itemsize:
+        raise ValueError(
+            f"Versión del registro {ruta} no soportada: {cabecera['version']} "
+            f"(registros de {cabecera['tam_registro']} bytes)."
+        )
+
+
+class EscritorRegistro:
+
+    def __init__(self, ruta):
+        """
+        Abre un registro binario de jugadas para añadir partidas al final.
+
+        El registro es un fichero de sólo añadir con una cabecera de 16 bytes y un
+        registro de ancho fijo (DTYPE_REGISTRO) por jugada. Los nombres de los jugadores
+        se guardan aparte, en ruta_jugadores(ruta). Si el fichero ya existe, las partidas
+        nuevas se numeran a continuación de la última; un registro incompleto al final
+        (por ejemplo, tras un corte) se descarta.
+
+        Args:
+            ruta (str): Ruta del fichero del registro.
+
+        Raises:
+            ValueError: Si el fichero existe y no es un registro de partidas compatible.
+        """
+        self.ruta = ruta
+        self.jugadores = leer_jugadores(ruta)
+        self.siguiente_partida = 1
+        self._fichero = open(ruta, "ab+")
+        self._fichero.seek(0)
+        cabecera = self._fichero.read(DTYPE_CABECERA.itemsize)
+        if not cabecera:
+            registro = np.zeros(1, dtype=DTYPE_CABECERA)
+            registro[0] = (MAGIA, VERSION, DTYPE_REGISTRO.itemsize, 0)
+            self._fichero.write(registro.tobytes())
+        else:
+            try:
+                _comprobar_cabecera(ruta, cabecera)
+            except ValueError:
+                self._fichero.close()
+                raise
+            datos = os.path.getsize(ruta) - DTYPE_CABECERA.itemsize
+            sobrantes = datos % DTYPE_REGISTRO.itemsize
+            if sobrantes:
+                logger.warning("Descartando %s bytes de un registro incompleto al final de %s.", sobrantes, ruta)
+                self._fichero.truncate(os.path.getsize(ruta) - sobrantes)
+            if datos >= DTYPE_REGISTRO.itemsize:
+                self._fichero.seek(-DTYPE_REGISTRO.itemsize, os.SEEK_END)
+                ultimo = np.frombuffer(self._fichero.read(DTYPE_REGISTRO.itemsize), dtype=DTYPE_REGISTRO)[0]
+                self.siguiente_partida = int(ultimo["partida"]) + 1
+        logger.info("Registro %s abierto; siguiente partida: %s.", ruta, self.siguiente_partida)
+
+    def registrar_jugador(self, jugador_id, nombre, tipo="maquina"):
+        """
+        Asocia un id de jugador del registro con su nombre y tipo.
+
+        Args:
+            jugador_id (int): El id del jugador en el registro.
+            nombre (str): El nombre del jugador.
+            tipo (str): 'humano' o 'maquina'.
+        """
+        self.jugadores[int(jugador_id)] = {"nombre": nombre, "tipo": tipo}
+
+    def escribir(self, registros):
+        """
+        Añade jugadas al final del registro.
+
+        Args:
+            registros (np.ndarray): Jugadas con DTYPE_REGISTRO, agrupadas por partida en orden creciente.
+        """
+        if registros.dtype != DTYPE_REGISTRO:
+            raise ValueError(f"Los registros deben tener el dtype {DTYPE_REGISTRO}.")
+        if len(registros):
+            self._fichero.write(registros.tobytes())
+            self.siguiente_partida = int(registros["partida"][-1]) + 1
+
+    def escribir_bloque(self, bloque, jugador1_id, jugador2_id):
+        """
+        Añade al registro un bloque de SimuladorVectorizado.simular_bloque.
+
+        Como en SimuladorVectorizado.a_partidas, se registran las jugadas del jugador 1.
+
+        Args:
+            bloque (dict[str, np.ndarray]): El bloque simulado.
+            jugador1_id (int): El id del jugador 1 en el registro.
+            jugador2_id (int): El id del jugador 2 en el registro.
+
+        Returns:
+            int: El número de partidas añadidas.
+        """
+        n_partidas, jugadas_por_partida = bloque["jugadas_jugador1"].shape
+        registros = np.empty(n_partidas * jugadas_por_partida, dtype=DTYPE_REGISTRO)
+        partidas = np.arange(self.siguiente_partida, self.siguiente_partida + n_partidas, dtype=np.uint64)
+        registros["partida"] = np.repeat(partidas, jugadas_por_partida)
+        registros["jugador"] = jugador1_id
+        registros["rival"] = jugador2_id
+        registros["tipo"] = bloque["jugadas_jugador1"].ravel()
+        registros["resultado"] = bloque["resultados"].ravel()
+        self.escribir(registros)
+        return n_partidas
+
+    def cerrar(self):
+        """Vuelca el registro a disco, guarda los jugadores y cierra el fichero."""
+        if self._fichero.closed:
+            return
+        self._fichero.flush()
+        os.fsync(self._fichero.fileno())
+        self._fichero.close()
+        with open(ruta_jugadores(self.ruta), "w", encoding="utf-8") as fichero:
+            json.dump({str(jugador_id): jugador for jugador_id, jugador in self.jugadores.items()}, fichero, ensure_ascii=False)
+        logger.info("Registro %s cerrado.", self.ruta)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+
+def leer_jugadores(ruta):
+    """
+    Lee los jugadores de un registro.
+
+    Args:
+        ruta (str): Ruta del fichero del registro.
+
+    Returns:
+        dict[int, dict[str, str]]: Por id del registro, un diccionario con "nombre" y "tipo".
+    """
+    if not os.path.exists(ruta_jugadores(ruta)):
+        return {}
+    with open(ruta_jugadores(ruta), encoding="utf-8") as fichero:
+        return {int(jugador_id): jugador for jugador_id, jugador in json.load(fichero).items()}
+
+
+def leer_registro(ruta):
+    """
+    Proyecta en memoria (mmap) las jugadas de un registro, sin copiarlas.
+
+    Args:
+        ruta (str): Ruta del fichero del registro.
+
+    Returns:
+        np.ndarray: Las jugadas, de sólo lectura, con DTYPE_REGISTRO.
+
+    Raises:
+        ValueError: Si el fichero no es un registro de partidas compatible.
+    """
+    with open(ruta, "rb") as fichero:
+        _comprobar_cabecera(ruta, fichero.read(DTYPE_CABECERA.itemsize))
+    n_registros = (os.path.getsize(ruta) - DTYPE_CABECERA.itemsize) // DTYPE_REGISTRO.itemsize
+    if n_registros == 0:
+        return np.empty(0, dtype=DTYPE_REGISTRO)
+    return np.memmap(ruta, dtype=DTYPE_REGISTRO, mode="r", offset=DTYPE_CABECERA.itemsize, shape=(n_registros,))
+
+
+def iterar_bloques(registros, tamano_bloque=1_000_000):
+    """
+    Recorre las jugadas por bloques de unas tamano_bloque jugadas sin partir ninguna partida.
+
+    Args:
+        registros (np.ndarray): Las jugadas, p. ej. de leer_registro.
+        tamano_bloque (int): Número aproximado de jugadas por bloque.
+
+    Yields:
+        np.ndarray: Vistas de las jugadas de partidas completas.
+    """
+    partidas = registros["partida"]
+    inicio = 0
+    while inicio < len(registros):
+        fin = min(inicio + tamano_bloque, len(registros))
+        if fin < len(registros):
+            # El bloque termina donde empieza la partida de la jugada fin
+            corte = inicio + int(np.searchsorted(partidas[inicio:fin], partidas[fin]))
+            if corte > inicio:
+                fin = corte
+            else:
+                # La partida ocupa todo el bloque: se amplía hasta su última jugada
+                while fin < len(registros) and partidas[fin] == partidas[inicio]:
+                    fin += 1
+        yield registros[inicio:fin]
+        inicio = fin
+
+
+def _resolver_partidas(bloque):
+    # Primera jugada de cada partida y ganador al mejor de las jugadas registradas (el empate lo gana el rival)
+    inicios = np.flatnonzero(np.concatenate(([True], bloque["partida"][1:] != bloque["partida"][:-1])))
+    resultados = bloque["resultado"]
+    marcador = np.add.reduceat((resultados == GANADA).astype(np.int16) - (resultados == PERDIDA), inicios)
+    ganadores = np.where(marcador > 0, bloque["jugador"][inicios], bloque["rival"][inicios])
+    return inicios, ganadores
+
+
+def estadisticas_registro(registros, tamano_bloque=1_000_000):
+    """
+    Calcula las estadísticas de PartidaRepository directamente sobre un registro.
+
+    Se recorre por bloques (ver iterar_bloques), así que la memoria no depende del
+    tamaño del registro. Todas las partidas del registro están finalizadas.
+
+    Args:
+        registros (np.ndarray): Las jugadas, p. ej. de leer_registro.
+        tamano_bloque (int): Número aproximado de jugadas por bloque.
+
+    Returns:
+        dict: Un diccionario con la siguiente estructura:
+            {
+                "total_partidas": int,  # Número total de partidas.
+                "partidas_ganadas": int,  # Partidas con ganador.
+                "partidas_abandonadas": int,  # Partidas abandonadas (siempre 0).
+                "jugadas_por_resultado": np.ndarray,  # (3, 3): jugada x resultado.
+                "mano_fuerte": tuple[JugadaEnum, float],  # Como obtener_mano_fuerte.
+                "mano_debil": tuple[JugadaEnum, float],  # Como obtener_mano_debil.
+                "puntos": dict[int, int]  # Partidas ganadas por cada jugador del registro.
+            }
+    """
+    logger.info("Calculando estadísticas de un registro de %s jugadas.", len(registros))
+    total_partidas = 0
+    jugadas_por_resultado = np.zeros(9, dtype=np.int64)
+    puntos = {}
+    for bloque in iterar_bloques(registros, tamano_bloque):
+        codigos = bloque["tipo"].astype(np.intp) * 3 + bloque["resultado"]
+        jugadas_por_resultado += np.bincount(codigos, minlength=9)
+        inicios, ganadores = _resolver_partidas(bloque)
+        total_partidas += len(inicios)
+        for jugador_id, n in zip(*np.unique(ganadores, return_counts=True)):
+            puntos[int(jugador_id)] = puntos.get(int(jugador_id), 0) + int(n)
+    jugadas_por_resultado = jugadas_por_resultado.reshape(3, 3)
+    contadores = {
+        clave_jugada(tipo, resultado): int(jugadas_por_resultado[i, j])
+        for i, tipo in enumerate(JUGADAS)
+        for j, resultado in enumerate(RESULTADOS)
+    }
+    manos = {}
+    for nombre, resultado in (("mano_fuerte", ResultadoJugadaEnum.GANADA), ("mano_debil", ResultadoJugadaEnum.PERDIDA)):
+        (mano, n), total = mano_por_resultado(contadores, resultado)
+        manos[nombre] = (mano, (n / total) * 100 if total > 0 else 0)
+    return {
+        "total_partidas": total_partidas,
+        "partidas_ganadas": total_partidas,
+        "partidas_abandonadas": 0,
+        "jugadas_por_resultado": jugadas_por_resultado,
+        **manos,
+        "puntos": puntos
+    }
+
+
+def importar_registro(db, ruta, batch_size=10000):
+    """
+    Importa las partidas de un registro en la base de datos.
+
+    Los jugadores se emparejan por nombre (creándolos si no existen); los que no
+    figuran en ruta_jugadores(ruta) se llaman "Jugador <id>". Las partidas se guardan
+    en lotes con JuegoService.registrar_partidas_simuladas, de modo que se actualizan
+    también los contadores, los puntos y la clasificación.
+
+    Args:
+        db (Session): La sesión de la base de datos.
+        ruta (str): Ruta del fichero del registro.
+        batch_size (int): Número aproximado de partidas por lote (un commit por lote).
+
+    Returns:
+        int: El número de partidas importadas.
+    """
+    logger.info("Importando el registro %s.", ruta)
+    registros = leer_registro(ruta)
+    jugadores = leer_jugadores(ruta)
+    jugador_repo = JugadorRepository(db)
+    juego_service = JuegoService(PartidaRepository(db), jugador_repo)
+    ids = {}
+
+    def id_jugador(jugador_id):
+        if jugador_id not in ids:
+            jugador = jugadores.get(jugador_id, {"nombre": f"Jugador {jugador_id}", "tipo": "maquina"})
+            ids[jugador_id] = jugador_repo.get_or_create(jugador["nombre"], tipo=jugador["tipo"]).id
+        return ids[jugador_id]
+
+    importadas = 0
+    jugadas_por_lote = batch_size * 3
+    for bloque in iterar_bloques(registros, jugadas_por_lote):
+        inicios, ganadores = _resolver_partidas(bloque)
+        fines = np.append(inicios[1:], len(bloque)).tolist()
+        jugadores_bloque = [id_jugador(j) for j in bloque["jugador"][inicios].tolist()]
+        rivales_bloque = [id_jugador(j) for j in bloque["rival"][inicios].tolist()]
+        tipos = [JUGADAS[codigo] for codigo in bloque["tipo"].tolist()]
+        resultados = [RESULTADOS[codigo] for codigo in bloque["resultado"].tolist()]
+        partidas = [
+            {
+                "estado": EstadoPartidaEnum.FINALIZADA,
+                "ganador_id": id_jugador(ganador),
+                "jugador1_id": jugador_id,
+                "jugador2_id": rival_id,
+                "jugadas": [
+                    {"jugador_id": jugador_id, "tipo": tipos[k], "resultado": resultados[k]}
+                    for k in range(inicio, fin)
+                ]
+            }
+            for inicio, fin, jugador_id, rival_id, ganador in zip(
+                inicios.tolist(), fines, jugadores_bloque, rivales_bloque, ganadores.tolist()
+            )
+        ]
+        juego_service.registrar_partidas_simuladas(partidas)
+        importadas += len(partidas)
+    logger.info("Registro %s importado: %s partidas.", ruta, importadas)
+    return importadas
@@ -1,12 +1,64 @@
+import calendar
+import time
+from collections import Counter
+from datetime import datetime, timezone
+import numpy as np
 from app.logger_config import get_logger
+from app.cache import cache_consultas, cacheado, mapa_jugadores
+from app.ranking import clasificacion
+from app.database import engine_sincrono
+from app.metricas import commits, instrumentar_repositorio
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.models import Partida, Jugador, Jugada
-from app.schemas import ResultadoJugadaEnum, EstadoPartidaEnum
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import event, func, insert, update, delete, select, bindparam, case, cast, Integer
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.models import Partida, Jugador, Jugada, EstadisticaAgregada, EstadisticaPeriodo, EstadisticaJugador, ahora_utc, a_utc, codigo_enum
+from app.schemas import JugadaEnum, ResultadoJugadaEnum, EstadoPartidaEnum, GranularidadEnum
 
 # Obtener el logger
 logger = get_logger(__name__)
 
+# Claves de la tabla estadisticas_agregadas
+CLAVE_PARTIDAS_GANADAS = "partidas:ganadas"
+
+def clave_estado(estado):
+    """Clave del contador de partidas en un estado."""
+    return f"estado:{EstadoPartidaEnum(estado).value}"
+
+def clave_jugada(tipo, resultado):
+    """Clave del contador de jugadas de un tipo con un resultado."""
+    return f"jugada:{JugadaEnum(tipo).value}:{ResultadoJugadaEnum(resultado).value}"
+
+# Contadores que también se acumulan por periodo en estadisticas_periodo: los de partidas terminadas
+CLAVES_PERIODO = (clave_estado(EstadoPartidaEnum.FINALIZADA), clave_estado(EstadoPartidaEnum.ABANDONADA), CLAVE_PARTIDAS_GANADAS)
+
+# Duración en segundos de cada granularidad de estadisticas_periodo
+SEGUNDOS_POR_GRANULARIDAD = {
+    GranularidadEnum.MINUTO: 60,
+    GranularidadEnum.HORA: 3600,
+    GranularidadEnum.DIA: 86400,
+}
+
+def segundos_epoch(momento):
+    """Segundos desde epoch de una fecha; las fechas sin zona horaria se consideran UTC."""
+    return calendar.timegm(momento.utctimetuple())
+
+def mano_por_resultado(contadores, resultado):
+    """Obtiene la mano con más jugadas de un resultado y el total de jugadas con ese resultado."""
+    conteos = [(tipo, contadores.get(clave_jugada(tipo, resultado), 0)) for tipo in JugadaEnum]
+    total = sum(n for _, n in conteos)
+    return max(conteos, key=lambda conteo: conteo[1]), total
+
+def _conteos_periodo(contadores):
+    finalizadas = contadores[clave_estado(EstadoPartidaEnum.FINALIZADA)]
+    abandonadas = contadores[clave_estado(EstadoPartidaEnum.ABANDONADA)]
+    return {
+        "total_partidas": finalizadas + abandonadas,
+        "partidas_ganadas": contadores[CLAVE_PARTIDAS_GANADAS],
+        "partidas_abandonadas": abandonadas
+    }
+
+@instrumentar_repositorio
 class PartidaRepository:
 
     def __init__(self, db: Session):
@@ -15,8 +67,9 @@ class PartidaRepository:
         db: Session - La sesión de la base de datos.
         """
         self.db = db
-        logger.info("PartidaRepository inicializado.")
+        logger.debug("PartidaRepository inicializado.")
 
+    @cacheado
     def obtener_info_global(self):
         """Obtiene información global de las partidas.
 
@@ -31,9 +84,10 @@ class PartidaRepository:
         """
         logger.info("Consultando información global de las partidas.")
         try:
-            total_victorias = self.db.query(func.count(Partida.id)).filter(Partida.ganador_id.isnot(None)).scalar()
-            total_derrotas = self.db.query(func.count(Partida.id)).filter(Partida.estado == EstadoPartidaEnum.ABANDONADA).scalar()
-            total_partidas = self.db.query(func.count(Partida.id)).scalar()
+            conteos = self.obtener_conteos_agregados()
+            total_victorias = conteos["partidas_ganadas"]
+            total_derrotas = conteos["partidas_abandonadas"]
+            total_partidas = conteos["total_partidas"]
             winrate = (total_victorias / total_partidas) * 100 if total_partidas > 0 else 0
             info = {
                 "total_victorias": total_victorias,
@@ -41,12 +95,237 @@ class PartidaRepository:
                 "total_partidas": total_partidas,
                 "winrate": winrate
             }
-            logger.info(f"Información global obtenida: {info}")
+            logger.info("Información global obtenida: %s", info)
             return info
         except Exception as e:
-            logger.error(f"Error al obtener información global: {e}")
+            logger.error("Error al obtener información global: %s", e)
             raise e
 
+    def obtener_conteos_partidas(self):
+        """Cuenta las partidas totales, ganadas y abandonadas en una sola pasada.
+
+        Recorre el índice ix_partidas_estado_ganador, así que su coste crece con el
+        número de partidas: los endpoints leen los contadores (obtener_conteos_agregados)
+        y esta consulta es la referencia a partir de las partidas, con la que
+        reconstruir_contadores recalcula las partidas ganadas y con la que se comprueba
+        que los contadores cuadran.
+
+        Returns:
+            dict[str, int]: Un diccionario con la siguiente estructura:
+                {
+                    "total_partidas": int,  # Número total de partidas.
+                    "partidas_ganadas": int,  # Partidas con ganador.
+                    "partidas_abandonadas": int  # Partidas abandonadas.
+                }
+        """
+        logger.info("Consultando conteos de partidas.")
+        try:
+            total_partidas, ganadas, abandonadas = self.db.query(
+                func.count(Partida.id),
+                func.coalesce(func.sum(case((Partida.ganador_id.isnot(None), 1), else_=0)), 0),
+                func.coalesce(func.sum(case((Partida.estado == EstadoPartidaEnum.ABANDONADA, 1), else_=0)), 0)
+            ).one()
+            conteos = {
+                "total_partidas": total_partidas,
+                "partidas_ganadas": ganadas,
+                "partidas_abandonadas": abandonadas
+            }
+            logger.info("Conteos de partidas obtenidos: %s", conteos)
+            return conteos
+        except Exception as e:
+            logger.error("Error al obtener conteos de partidas: %s", e)
+            raise e
+
+    def obtener_conteos_agregados(self):
+        """Obtiene los conteos de partidas desde la tabla de contadores, sin recorrer partidas.
+
+        Returns:
+            dict[str, int]: Un diccionario con la misma estructura que obtener_conteos_partidas.
+        """
+        claves_estado = [clave_estado(estado) for estado in EstadoPartidaEnum]
+        contadores = self.obtener_contadores(claves_estado + [CLAVE_PARTIDAS_GANADAS])
+        return {
+            "total_partidas": sum(contadores[clave] for clave in claves_estado),
+            "partidas_ganadas": contadores[CLAVE_PARTIDAS_GANADAS],
+            "partidas_abandonadas": contadores[clave_estado(EstadoPartidaEnum.ABANDONADA)]
+        }
+
+    def _obtener_mano_por_resultado(self, resultado):
+        """Obtiene la mano con más jugadas de un resultado y el total de jugadas con ese resultado."""
+        return mano_por_resultado(self.obtener_contadores([clave_jugada(tipo, resultado) for tipo in JugadaEnum]), resultado)
+
+    def obtener_contadores(self, claves):
+        """
+        Obtiene el valor de varios contadores de la tabla estadisticas_agregadas.
+
+        Args:
+            claves (list[str]): Las claves de los contadores.
+
+        Returns:
+            dict[str, int]: El valor de cada contador (0 si no existe).
+        """
+        filas = self.db.query(EstadisticaAgregada.clave, EstadisticaAgregada.valor).filter(EstadisticaAgregada.clave.in_(claves)).all()
+        contadores = dict.fromkeys(claves, 0)
+        contadores.update(filas)
+        return contadores
+
+    def incrementar_contadores(self, incrementos, momento=None):
+        """
+        Incrementa contadores de estadisticas_agregadas sin hacer commit.
+
+        Los cambios se confirman junto con la siguiente escritura (save o guardar_lote),
+        de modo que los contadores se actualizan en la misma transacción.
+
+        Args:
+            incrementos (dict[str, int]): El incremento (puede ser negativo) de cada clave.
+            momento (datetime | None): Si se indica, los contadores de CLAVES_PERIODO se
+                suman también a los periodos de ese momento (ver incrementar_periodos).
+        """
+        incrementos = {clave: n for clave, n in incrementos.items() if n}
+        if not incrementos:
+            return
+        tabla = EstadisticaAgregada.__table__
+        stmt = sqlite_insert(tabla)
+        stmt = stmt.on_conflict_do_update(index_elements=[tabla.c.clave], set_={"valor": tabla.c.valor + stmt.excluded.valor})
+        self.db.execute(stmt, [{"clave": clave, "valor": n} for clave, n in incrementos.items()])
+        if momento is not None:
+            self.incrementar_periodos({momento: incrementos})
+
+    def incrementar_periodos(self, incrementos_por_momento):
+        """
+        Incrementa los contadores de estadisticas_periodo sin hacer commit.
+
+        Cada incremento se suma a los periodos de minuto, hora y día que contienen su
+        momento; sólo se acumulan las claves de CLAVES_PERIODO.
+
+        Args:
+            incrementos_por_momento (dict[datetime, dict[str, int]]): Los incrementos de cada momento.
+        """
+        filas = Counter()
+        for momento, incrementos in incrementos_por_momento.items():
+            segundos = segundos_epoch(momento)
+            for granularidad, duracion in SEGUNDOS_POR_GRANULARIDAD.items():
+                for clave in CLAVES_PERIODO:
+                    filas[(granularidad.value, segundos - segundos % duracion, clave)] += incrementos.get(clave, 0)
+        filas = {fila: n for fila, n in filas.items() if n}
+        if not filas:
+            return
+        tabla = EstadisticaPeriodo.__table__
+        stmt = sqlite_insert(tabla)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[tabla.c.granularidad, tabla.c.inicio, tabla.c.clave],
+            set_={"valor": tabla.c.valor + stmt.excluded.valor}
+        )
+        self.db.execute(stmt, [
+            {"granularidad": granularidad, "inicio": inicio, "clave": clave, "valor": n}
+            for (granularidad, inicio, clave), n in filas.items()
+        ])
+
+    def incrementar_contadores_jugador(self, incrementos_por_jugador):
+        """
+        Incrementa contadores de estadisticas_jugador sin hacer commit.
+
+        Como en incrementar_contadores, los cambios se confirman con la siguiente escritura.
+
+        Args:
+            incrementos_por_jugador (dict[int, dict[str, int]]): Los incrementos de cada
+                jugador, con las mismas claves que estadisticas_agregadas.
+        """
+        filas = [
+            {"jugador_id": jugador_id, "clave": clave, "valor": n}
+            for jugador_id, incrementos in incrementos_por_jugador.items() if jugador_id is not None
+            for clave, n in incrementos.items() if n
+        ]
+        if not filas:
+            return
+        tabla = EstadisticaJugador.__table__
+        stmt = sqlite_insert(tabla)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[tabla.c.jugador_id, tabla.c.clave],
+            set_={"valor": tabla.c.valor + stmt.excluded.valor}
+        )
+        self.db.execute(stmt, filas)
+
+    @cacheado
+    def obtener_estadisticas_periodo(self, desde=None, hasta=None, granularidad=GranularidadEnum.HORA):
+        """
+        Obtiene las estadísticas de las partidas terminadas en un intervalo, por periodos.
+
+        Se calculan a partir de estadisticas_periodo, sin recorrer partidas. Cada partida
+        cuenta en el periodo en que se finalizó o abandonó.
+
+        Args:
+            desde (datetime | None): Inicio del intervalo; se redondea al inicio de su periodo.
+            hasta (datetime | None): Fin del intervalo (excluido).
+            granularidad (GranularidadEnum): La duración de los periodos.
+
+        Returns:
+            dict: Un diccionario con la siguiente estructura:
+                {
+                    "granularidad": str,
+                    "total_partidas": int,  # Partidas terminadas en el intervalo.
+                    "partidas_ganadas": int,
+                    "partidas_abandonadas": int,
+                    "periodos": list[dict]  # Lo mismo por periodo, con su "inicio" (datetime UTC).
+                }
+        """
+        granularidad = GranularidadEnum(granularidad)
+        logger.info("Consultando estadísticas por %s entre %s y %s.", granularidad.value, desde, hasta)
+        try:
+            tabla = EstadisticaPeriodo.__table__
+            consulta = select(tabla.c.inicio, tabla.c.clave, tabla.c.valor).where(tabla.c.granularidad == granularidad.value)
+            if desde is not None:
+                segundos = segundos_epoch(desde)
+                consulta = consulta.where(tabla.c.inicio >= segundos - segundos % SEGUNDOS_POR_GRANULARIDAD[granularidad])
+            if hasta is not None:
+                consulta = consulta.where(tabla.c.inicio < segundos_epoch(hasta))
+            periodos = {}
+            for inicio, clave, valor in self.db.execute(consulta.order_by(tabla.c.inicio)):
+                periodos.setdefault(inicio, Counter())[clave] += valor
+            series = [
+                {"inicio": datetime.fromtimestamp(inicio, timezone.utc), **_conteos_periodo(contadores)}
+                for inicio, contadores in periodos.items()
+            ]
+            estadisticas = {
+                "granularidad": granularidad.value,
+                **_conteos_periodo(sum(periodos.values(), Counter())),
+                "periodos": series
+            }
+            logger.info("Estadísticas por periodo obtenidas: %s periodos.", len(series))
+            return estadisticas
+        except Exception as e:
+            logger.error("Error al obtener estadísticas por periodo: %s", e)
+            raise e
+
+    def reconstruir_contadores(self):
+        """
+        Recalcula las tablas estadisticas_agregadas, estadisticas_periodo y
+        estadisticas_jugador a partir de partidas y jugadas.
+
+        Returns:
+            dict[str, int]: Los contadores reconstruidos.
+        """
+        logger.info("Reconstruyendo los contadores de estadísticas.")
+        try:
+            contadores = {clave_estado(estado): n for estado, n in self.db.query(Partida.estado, func.count(Partida.id)).group_by(Partida.estado).all() if estado is not None}
+            contadores[CLAVE_PARTIDAS_GANADAS] = self.obtener_conteos_partidas()["partidas_ganadas"]
+            for resultado, tipo, n in self.db.query(Jugada.resultado, Jugada.tipo, func.count(Jugada.id)).group_by(Jugada.resultado, Jugada.tipo).all():
+                if tipo is not None and resultado is not None:
+                    contadores[clave_jugada(tipo, resultado)] = n
+            self.db.execute(delete(EstadisticaAgregada))
+            self.incrementar_contadores(contadores)
+            self._reconstruir_periodos()
+            self._reconstruir_contadores_jugador()
+            self.db.commit()
+            cache_consultas.invalidar()
+            logger.info("Contadores reconstruidos: %s", contadores)
+            return contadores
+        except Exception as e:
+            logger.error("Error al reconstruir los contadores: %s", e)
+            self.db.rollback()
+            raise e
+
+    @cacheado
     def obtener_mano_fuerte(self):
         """Obtiene la mano que más veces ha ganado y su porcentaje de victoria.
 
@@ -56,15 +335,15 @@ class PartidaRepository:
         """
         logger.info("Consultando la mano más fuerte.")
         try:
-            mano_victoriosa = self.db.query(Jugada.tipo, func.count(Jugada.tipo)).filter(Jugada.resultado == ResultadoJugadaEnum.GANADA).group_by(Jugada.tipo).order_by(func.count(Jugada.tipo).desc()).first()
-            total_victorias = self.db.query(func.count(Jugada.id)).filter(Jugada.resultado == ResultadoJugadaEnum.GANADA).scalar()
+            mano_victoriosa, total_victorias = self._obtener_mano_por_resultado(ResultadoJugadaEnum.GANADA)
             porcentaje = (mano_victoriosa[1] / total_victorias) * 100 if total_victorias > 0 else 0
-            logger.info(f"Mano fuerte obtenida: {mano_victoriosa[0]}, Porcentaje: {porcentaje}")
+            logger.info("Mano fuerte obtenida: %s, Porcentaje: %s", mano_victoriosa[0], porcentaje)
             return mano_victoriosa[0], porcentaje
         except Exception as e:
-            logger.error(f"Error al obtener la mano fuerte: {e}")
+            logger.error("Error al obtener la mano fuerte: %s", e)
             raise e
 
+    @cacheado
     def obtener_mano_debil(self):
         """Obtiene la mano que más veces ha perdido y su porcentaje de derrota.
 
@@ -74,15 +353,52 @@ class PartidaRepository:
         """
         logger.info("Consultando la mano más débil.")
         try:
-            mano_derrota = self.db.query(Jugada.tipo, func.count(Jugada.tipo)).filter(Jugada.resultado == ResultadoJugadaEnum.PERDIDA).group_by(Jugada.tipo).order_by(func.count(Jugada.tipo).desc()).first()
-            total_derrotas = self.db.query(func.count(Jugada.id)).filter(Jugada.resultado == ResultadoJugadaEnum.PERDIDA).scalar()
+            mano_derrota, total_derrotas = self._obtener_mano_por_resultado(ResultadoJugadaEnum.PERDIDA)
             porcentaje = (mano_derrota[1] / total_derrotas) * 100 if total_derrotas > 0 else 0
-            logger.info(f"Mano débil obtenida: {mano_derrota[0]}, Porcentaje: {porcentaje}")
+            logger.info("Mano débil obtenida: %s, Porcentaje: %s", mano_derrota[0], porcentaje)
             return mano_derrota[0], porcentaje
         except Exception as e:
-            logger.error(f"Error al obtener la mano débil: {e}")
+            logger.error("Error al obtener la mano débil: %s", e)
             raise e
 
+    def _reconstruir_periodos(self):
+        # Se agrupa por minuto en SQL; las horas y los días se acumulan en incrementar_periodos
+        minuto = cast(func.strftime('%s', Partida.finalizada_en), Integer) // 60 * 60
+        incrementos = {}
+        for inicio, estado, n, ganadas in self.db.execute(
+            select(minuto, Partida.estado, func.count(Partida.id), func.count(Partida.ganador_id))
+            .where(Partida.finalizada_en.is_not(None))
+            .group_by(minuto, Partida.estado)
+        ):
+            contadores = incrementos.setdefault(datetime.fromtimestamp(inicio, timezone.utc), Counter())
+            contadores[clave_estado(estado)] += n
+            contadores[CLAVE_PARTIDAS_GANADAS] += ganadas
+        self.db.execute(delete(EstadisticaPeriodo))
+        self.incrementar_periodos(incrementos)
+
+    def _reconstruir_contadores_jugador(self):
+        incrementos = {}
+        for columna in (Partida.jugador1_id, Partida.jugador2_id):
+            for jugador_id, estado, n in self.db.execute(
+                select(columna, Partida.estado, func.count(Partida.id)).where(columna.is_not(None)).group_by(columna, Partida.estado)
+            ):
+                if estado is not None:
+                    contadores = incrementos.setdefault(jugador_id, Counter())
+                    contadores[clave_estado(estado)] += n
+        for jugador_id, n in self.db.execute(
+            select(Partida.ganador_id, func.count(Partida.id)).where(Partida.ganador_id.is_not(None)).group_by(Partida.ganador_id)
+        ):
+            incrementos.setdefault(jugador_id, Counter())[CLAVE_PARTIDAS_GANADAS] += n
+        for jugador_id, tipo, resultado, n in self.db.execute(
+            select(Jugada.jugador_id, Jugada.tipo, Jugada.resultado, func.count(Jugada.id))
+            .where(Jugada.jugador_id.is_not(None)).group_by(Jugada.jugador_id, Jugada.tipo, Jugada.resultado)
+        ):
+            if tipo is not None and resultado is not None:
+                incrementos.setdefault(jugador_id, Counter())[clave_jugada(tipo, resultado)] += n
+        self.db.execute(delete(EstadisticaJugador))
+        self.incrementar_contadores_jugador(incrementos)
+
+    @cacheado
     def obtener_estadisticas_partidas(self):
         """Obtiene estadísticas de partidas.
 
@@ -94,18 +410,11 @@ class PartidaRepository:
         """
         logger.info("Consultando estadísticas de partidas.")
         try:
-            total_partidas = self.db.query(func.count(Partida.id)).scalar()
-            ganadas = self.db.query(func.count(Partida.id)).filter(Partida.ganador_id.isnot(None)).scalar()
-            abandonadas = self.db.query(func.count(Partida.id)).filter(Partida.estado == EstadoPartidaEnum.ABANDONADA).scalar()
-            estadisticas = {
-                "total_partidas": total_partidas,
-                "partidas_ganadas": ganadas,
-                "partidas_abandonadas": abandonadas
-            }
-            logger.info(f"Estadísticas obtenidas: {estadisticas}")
+            estadisticas = self.obtener_conteos_agregados()
+            logger.info("Estadísticas obtenidas: %s", estadisticas)
             return estadisticas
         except Exception as e:
-            logger.error(f"Error al obtener estadísticas de partidas: {e}")
+            logger.error("Error al obtener estadísticas de partidas: %s", e)
             raise e
     
     def save(self, partida):
@@ -118,19 +427,241 @@ class PartidaRepository:
         Returns:
             Partida: La partida guardada con su id.
         """
-        logger.info(f"Guardando la partida: {partida}")
+        logger.info("Guardando la partida: %s", partida)
         try:
             self.db.add(partida)
-            self.db.commit()
+            with commits.medir("save"):
+                self.db.commit()
             self.db.refresh(partida)
-            logger.info(f"Partida guardada con éxito: {partida}")
+            logger.info("Partida guardada con éxito: %s", partida)
             return partida
         except Exception as e:
-            logger.error(f"Error al guardar la partida: {e}")
+            logger.error("Error al guardar la partida: %s", e)
+            self.db.rollback()
+            raise e
+
+    def guardar_lote(self, partidas):
+        """
+        Guarda un lote de partidas completas con inserciones masivas y un único commit.
+
+        Las partidas y sus jugadas se insertan con executemany y los puntos de los
+        ganadores se actualizan con un único UPDATE agregado por jugador.
+
+        Args:
+            partidas (list[dict]): Las partidas a guardar, con la estructura:
+                {
+                    "estado": EstadoPartidaEnum,  # Estado final de la partida.
+                    "ganador_id": int | None,  # Id del ganador, si lo hay.
+                    "jugadas": list[dict],  # Jugadas con jugador_id, tipo y resultado.
+                    "jugador1_id": int, "jugador2_id": int,  # Opcionales; los dos jugadores.
+                    "finalizada_en": datetime,  # Opcional; por defecto, el momento actual.
+                    "creada_en": datetime  # Opcional; por defecto, finalizada_en.
+                }
+
+        Returns:
+            list[int]: Los ids de las partidas guardadas, en el mismo orden.
+        """
+        logger.info("Guardando lote de %s partidas.", len(partidas))
+        if not partidas:
+            return []
+        try:
+            ahora = ahora_utc()
+            momentos = [
+                a_utc(p.get("finalizada_en") or ahora) if p["estado"] != EstadoPartidaEnum.EN_CURSO else None
+                for p in partidas
+            ]
+            ids = self.db.scalars(
+                insert(Partida).returning(Partida.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "estado": p["estado"], "ganador_id": p["ganador_id"],
+                        "jugador1_id": p.get("jugador1_id"), "jugador2_id": p.get("jugador2_id"),
+                        "creada_en": a_utc(p["creada_en"]) if p.get("creada_en") else momento or ahora,
+                        "finalizada_en": momento
+                    }
+                    for p, momento in zip(partidas, momentos)
+                ]
+            ).all()
+            jugadas = [
+                {"partida_id": partida_id, **jugada}
+                for partida_id, partida in zip(ids, partidas)
+                for jugada in partida["jugadas"]
+            ]
+            if jugadas:
+                self.db.execute(insert(Jugada), jugadas)
+            puntos = {}
+            contadores = {}
+            por_momento = {}
+            por_jugador = {}
+            for partida, momento in zip(partidas, momentos):
+                clave = clave_estado(partida["estado"])
+                contadores[clave] = contadores.get(clave, 0) + 1
+                if momento is not None:
+                    por_momento.setdefault(momento, Counter())[clave] += 1
+                for jugador_id in (partida.get("jugador1_id"), partida.get("jugador2_id")):
+                    por_jugador.setdefault(jugador_id, Counter())[clave] += 1
+                if partida["ganador_id"] is not None:
+                    puntos[partida["ganador_id"]] = puntos.get(partida["ganador_id"], 0) + 1
+                    if momento is not None:
+                        por_momento[momento][CLAVE_PARTIDAS_GANADAS] += 1
+            contadores[CLAVE_PARTIDAS_GANADAS] = sum(puntos.values())
+            for jugador_id, n in puntos.items():
+                por_jugador.setdefault(jugador_id, Counter())[CLAVE_PARTIDAS_GANADAS] += n
+            for jugada in jugadas:
+                clave = clave_jugada(jugada["tipo"], jugada["resultado"])
+                contadores[clave] = contadores.get(clave, 0) + 1
+                por_jugador.setdefault(jugada["jugador_id"], Counter())[clave] += 1
+            self.incrementar_contadores(contadores)
+            self.incrementar_periodos(por_momento)
+            self.incrementar_contadores_jugador(por_jugador)
+            if puntos:
+                tabla = Jugador.__table__
+                self.db.execute(
+                    update(tabla).where(tabla.c.id == bindparam("b_id")).values(puntos=tabla.c.puntos + bindparam("b_puntos")),
+                    [{"b_id": jugador_id, "b_puntos": n} for jugador_id, n in puntos.items()]
+                )
+            with commits.medir("guardar_lote"):
+                self.db.commit()
+            logger.info("Lote de %s partidas guardado con éxito.", len(ids))
+            return ids
+        except Exception as e:
+            logger.error("Error al guardar el lote de partidas: %s", e)
             self.db.rollback()
             raise e
 
 
+    @staticmethod
+    def consulta_jugadas(desde_id=None, hasta_id=None, jugador_id=None):
+        """
+        Construye la consulta de exportación de jugadas, en orden de id.
+
+        Args:
+            desde_id (int | None): Id mínimo (incluido).
+            hasta_id (int | None): Id máximo (incluido).
+            jugador_id (int | None): Sólo las jugadas de este jugador.
+
+        Returns:
+            Select: La consulta, con las columnas id, partida_id, jugador_id, tipo y resultado.
+        """
+        consulta = select(Jugada.id, Jugada.partida_id, Jugada.jugador_id, Jugada.tipo, Jugada.resultado).order_by(Jugada.id)
+        if desde_id is not None:
+            consulta = consulta.where(Jugada.id >= desde_id)
+        if hasta_id is not None:
+            consulta = consulta.where(Jugada.id <= hasta_id)
+        if jugador_id is not None:
+            consulta = consulta.where(Jugada.jugador_id == jugador_id)
+        return consulta
+
+    @staticmethod
+    def consulta_partidas(desde_id=None, hasta_id=None, jugador_id=None):
+        """
+        Construye la consulta de exportación de partidas, en orden de id.
+
+        Args:
+            desde_id (int | None): Id mínimo (incluido).
+            hasta_id (int | None): Id máximo (incluido).
+            jugador_id (int | None): Sólo las partidas ganadas por este jugador.
+
+        Returns:
+            Select: La consulta, con las columnas id, estado y ganador_id.
+        """
+        consulta = select(Partida.id, Partida.estado, Partida.ganador_id).order_by(Partida.id)
+        if desde_id is not None:
+            consulta = consulta.where(Partida.id >= desde_id)
+        if hasta_id is not None:
+            consulta = consulta.where(Partida.id <= hasta_id)
+        if jugador_id is not None:
+            consulta = consulta.where(Partida.ganador_id == jugador_id)
+        return consulta
+
+    @staticmethod
+    def consulta_codigos_jugadas(desde_id=None, hasta_id=None, jugador_id=None):
+        """
+        Construye la consulta de las jugadas codificadas en un entero, en orden de id.
+
+        Cada fila es jugador_id * 9 + tipo * 3 + resultado, con los códigos de
+        CODIGOS_ENUM; se omiten las jugadas sin jugador, tipo o resultado.
+
+        Args:
+            desde_id (int | None): Id mínimo (incluido).
+            hasta_id (int | None): Id máximo (incluido).
+            jugador_id (int | None): Sólo las jugadas de este jugador.
+
+        Returns:
+            Select: La consulta, con la columna codigo.
+        """
+        codigo = Jugada.jugador_id * 9 + codigo_enum(Jugada.tipo, JugadaEnum) * 3 + codigo_enum(Jugada.resultado, ResultadoJugadaEnum)
+        consulta = select(codigo.label("codigo")).where(
+            Jugada.jugador_id.is_not(None), Jugada.tipo.is_not(None), Jugada.resultado.is_not(None)
+        ).order_by(Jugada.id)
+        if desde_id is not None:
+            consulta = consulta.where(Jugada.id >= desde_id)
+        if hasta_id is not None:
+            consulta = consulta.where(Jugada.id <= hasta_id)
+        if jugador_id is not None:
+            consulta = consulta.where(Jugada.jugador_id == jugador_id)
+        return consulta
+
+    def iterar_codigos(self, consulta, tamano_lote=1_000_000):
+        """
+        Recorre por lotes una consulta de una única columna entera como arrays de NumPy.
+
+        Con un driver síncrono se lee directamente del cursor de sqlite3, que avanza
+        sobre el resultado a medida que se piden filas: construir un Row por fila es
+        unas tres veces más lento en los recorridos de millones de filas. Con un driver
+        asíncrono (aiosqlite), cuyo cursor carga el resultado entero, se usa un cursor
+        de servidor (stream_results), de modo que la memoria no depende del resultado.
+
+        Args:
+            consulta (Select): La consulta, p. ej. de consulta_codigos_jugadas.
+            tamano_lote (int): Filas por lote.
+
+        Yields:
+            np.ndarray: Cada lote, (n,) int64.
+        """
+        logger.info("Recorriendo códigos por lotes de %s filas.", tamano_lote)
+        conexion = self.db.connection()
+        if conexion.dialect.is_async:
+            resultado = conexion.execute(consulta, execution_options={"stream_results": True, "yield_per": tamano_lote})
+            try:
+                for lote in resultado.scalars().partitions():
+                    yield np.fromiter(lote, dtype=np.int64, count=len(lote))
+            finally:
+                resultado.close()
+            return
+        compilada = consulta.compile(dialect=conexion.dialect)
+        parametros = compilada.construct_params()
+        cursor = conexion.connection.driver_connection.cursor()
+        try:
+            cursor.execute(str(compilada), [parametros[nombre] for nombre in compilada.positiontup])
+            while True:
+                filas = cursor.fetchmany(tamano_lote)
+                if not filas:
+                    break
+                yield np.fromiter((valor for (valor,) in filas), dtype=np.int64, count=len(filas))
+        finally:
+            cursor.close()
+
+    def iterar(self, consulta, tamano_lote=10000):
+        """
+        Recorre el resultado de una consulta por lotes, sin cargarlo entero en memoria.
+
+        Args:
+            consulta (Select): La consulta, p. ej. de consulta_jugadas o consulta_partidas.
+            tamano_lote (int): Filas que se leen del cursor en cada lote (yield_per).
+
+        Yields:
+            list[Row]: Cada lote de filas.
+        """
+        logger.info("Recorriendo consulta por lotes de %s filas.", tamano_lote)
+        resultado = self.db.execute(consulta.execution_options(yield_per=tamano_lote))
+        try:
+            yield from resultado.partitions()
+        finally:
+            resultado.close()
+
+
+@instrumentar_repositorio
 class JugadorRepository:
 
     def __init__(self, db: Session):
@@ -141,27 +672,271 @@ class JugadorRepository:
             db (Session): La sesión de la base de datos.
         """
         self.db = db
-        logger.info("JugadorRepository inicializado.")
+        logger.debug("JugadorRepository inicializado.")
 
-    def obtener_ranking(self):
+    @cacheado
+    def obtener_ranking(self, top=3, offset=0):
         """
-        Obtiene el ranking de los 3 jugadores con más puntos.
+        Obtiene un tramo del ranking de jugadores ordenado por puntos.
+
+        Si la clasificación en memoria está activa para esta base de datos, el tramo se
+        toma de ella y sólo se consultan los nombres de esos jugadores; si no, se
+        recorre el índice de puntos. La clasificación se recarga si otro proceso ha
+        escrito en la base de datos (ver _clasificacion_activa).
+
+        Args:
+            top (int): Número de jugadores a devolver.
+            offset (int): Número de jugadores que se saltan desde el primero.
 
         Returns:
-            list[Jugador]: Una lista con los 3 jugadores con más puntos.
+            list[dict]: Los jugadores del tramo (id, nombre, tipo y puntos), de más a menos puntos.
         """
-        logger.info("Consultando el ranking de jugadores.")
+        logger.info("Consultando el ranking de jugadores (top %s, offset %s).", top, offset)
         try:
-            ranking = self.db.query(Jugador).order_by(Jugador.puntos.desc()).limit(3).all()
-            logger.info(f"Ranking obtenido: {ranking}")
+            if self._clasificacion_activa():
+                pagina = clasificacion.pagina(top, offset)
+                jugadores = {
+                    fila.id: fila
+                    for fila in self.db.execute(
+                        select(Jugador.id, Jugador.nombre, Jugador.tipo).where(Jugador.id.in_([jugador_id for jugador_id, _ in pagina]))
+                    )
+                }
+                ranking = [
+                    {"id": jugador_id, "nombre": jugadores[jugador_id].nombre, "tipo": jugadores[jugador_id].tipo, "puntos": puntos}
+                    for jugador_id, puntos in pagina
+                ]
+            else:
+                ranking = [
+                    {"id": jugador.id, "nombre": jugador.nombre, "tipo": jugador.tipo, "puntos": jugador.puntos}
+                    for jugador in self.db.query(Jugador).order_by(Jugador.puntos.desc(), Jugador.id).offset(offset).limit(top).all()
+                ]
+            logger.info("Ranking obtenido: %s", ranking)
             return ranking
         except Exception as e:
-            logger.error(f"Error al obtener el ranking de jugadores: {e}")
+            logger.error("Error al obtener el ranking de jugadores: %s", e)
             raise e
 
+    def obtener_posicion(self, jugador_id):
+        """
+        Obtiene la posición de un jugador en el ranking.
+
+        La posición es 1 más el número de jugadores con más puntos, por lo que los
+        jugadores empatados comparten posición.
+
+        Args:
+            jugador_id (int): El id del jugador.
+
+        Returns:
+            dict | None: El jugador (id, nombre, tipo y puntos) con su posición, o None si no existe.
+        """
+        logger.info("Consultando la posición del jugador %s.", jugador_id)
+        try:
+            jugador = self.db.get(Jugador, jugador_id)
+            if jugador is None:
+                return None
+            en_memoria = clasificacion.posicion(jugador_id) if self._clasificacion_activa() else None
+            if en_memoria is not None:
+                posicion, puntos = en_memoria
+            else:
+                puntos = jugador.puntos or 0
+                posicion = self.db.query(func.count(Jugador.id)).filter(Jugador.puntos > puntos).scalar() + 1
+            return {"id": jugador.id, "nombre": jugador.nombre, "tipo": jugador.tipo, "puntos": puntos, "posicion": posicion}
+        except Exception as e:
+            logger.error("Error al obtener la posición del jugador %s: %s", jugador_id, e)
+            raise e
+
+    def obtener_estadisticas(self, jugador_id):
+        """
+        Obtiene las estadísticas de un jugador a partir de estadisticas_jugador.
+
+        Sólo se leen los contadores del jugador (una búsqueda por clave primaria), por lo
+        que el coste no depende del número de partidas jugadas.
+
+        Args:
+            jugador_id (int): El id del jugador.
+
+        Returns:
+            dict | None: Un diccionario con la siguiente estructura, o None si no existe:
+                {
+                    "id": int, "nombre": str,
+                    "total_partidas": int,  # Partidas en las que ha participado.
+                    "total_victorias": int,  # Partidas ganadas.
+                    "total_derrotas": int,  # Partidas finalizadas sin ganarlas.
+                    "partidas_abandonadas": int,
+                    "winrate": float,  # Porcentaje de partidas ganadas.
+                    "distribucion_manos": dict[str, int],  # Jugadas de cada mano.
+                    "mano_fuerte": dict | None,  # La mano que más ha ganado y su porcentaje de victorias.
+                    "mano_debil": dict | None  # La mano que más ha perdido y su porcentaje de derrotas.
+                }
+        """
+        logger.info("Consultando estadísticas del jugador %s.", jugador_id)
+        try:
+            jugador = self.db.get(Jugador, jugador_id)
+            if jugador is None:
+                return None
+            contadores = dict(self.db.execute(
+                select(EstadisticaJugador.clave, EstadisticaJugador.valor).where(EstadisticaJugador.jugador_id == jugador_id)
+            ).all())
+            total_partidas = sum(contadores.get(clave_estado(estado), 0) for estado in EstadoPartidaEnum)
+            victorias = contadores.get(CLAVE_PARTIDAS_GANADAS, 0)
+            (mano_fuerte, ganadas), total_ganadas = mano_por_resultado(contadores, ResultadoJugadaEnum.GANADA)
+            (mano_debil, perdidas), total_perdidas = mano_por_resultado(contadores, ResultadoJugadaEnum.PERDIDA)
+            estadisticas = {
+                "id": jugador.id,
+                "nombre": jugador.nombre,
+                "total_partidas": total_partidas,
+                "total_victorias": victorias,
+                "total_derrotas": max(contadores.get(clave_estado(EstadoPartidaEnum.FINALIZADA), 0) - victorias, 0),
+                "partidas_abandonadas": contadores.get(clave_estado(EstadoPartidaEnum.ABANDONADA), 0),
+                "winrate": (victorias / total_partidas) * 100 if total_partidas > 0 else 0,
+                "distribucion_manos": {
+                    tipo.value: sum(contadores.get(clave_jugada(tipo, resultado), 0) for resultado in ResultadoJugadaEnum)
+                    for tipo in JugadaEnum
+                },
+                "mano_fuerte": {"mano": mano_fuerte.value, "porcentaje_victorias": ganadas / total_ganadas * 100} if total_ganadas else None,
+                "mano_debil": {"mano": mano_debil.value, "porcentaje_derrotas": perdidas / total_perdidas * 100} if total_perdidas else None
+            }
+            logger.info("Estadísticas del jugador obtenidas: %s", estadisticas)
+            return estadisticas
+        except Exception as e:
+            logger.error("Error al obtener las estadísticas del jugador %s: %s", jugador_id, e)
+            raise e
+
+    def reconstruir_ranking(self):
+        """
+        Carga la clasificación en memoria con los puntos de todos los jugadores de esta base de datos.
+
+        Returns:
+            int: El número de jugadores cargados.
+        """
+        logger.info("Reconstruyendo la clasificación de jugadores.")
+        try:
+            # La versión se lee en la misma transacción que los puntos
+            version = self._version_ranking()
+            ids, puntos = [], []
+            resultado = self.db.execute(
+                select(Jugador.id, func.coalesce(Jugador.puntos, 0)).execution_options(yield_per=100000)
+            )
+            for filas in resultado.partitions():
+                columnas = np.array(filas, dtype=np.int64).reshape(-1, 2)
+                ids.append(columnas[:, 0])
+                puntos.append(columnas[:, 1])
+            ids = np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64)
+            clasificacion.reconstruir(self._base_de_datos(), ids, np.concatenate(puntos) if puntos else ids, version)
+            return len(ids)
+        except Exception as e:
+            logger.error("Error al reconstruir la clasificación de jugadores: %s", e)
+            raise e
+
+    def _version_ranking(self):
+        # El mayor id de jugador y el contador de partidas ganadas: cambian con cada jugador
+        # nuevo y cada punto, y se leen por clave primaria
+        return tuple(self.db.execute(select(
+            select(func.coalesce(func.max(Jugador.id), 0)).scalar_subquery(),
+            select(func.coalesce(func.max(EstadisticaAgregada.valor), 0))
+            .where(EstadisticaAgregada.clave == CLAVE_PARTIDAS_GANADAS).scalar_subquery()
+        )).one())
+
+    def _clasificacion_activa(self):
+        """
+        Indica si la clasificación en memoria está activa para esta base de datos.
+
+        Como mucho una vez por TTL de la caché de consultas, compara la versión de la base
+        de datos con la de la clasificación y, si otro proceso ha escrito (p. ej. el juego
+        de consola), la reconstruye antes de usarla.
+
+        Returns:
+            bool: True si se puede usar la clasificación en memoria.
+        """
+        if not clasificacion.activa(self._base_de_datos()):
+            return False
+        if time.monotonic() - clasificacion.comprobada_en >= cache_consultas.ttl and not clasificacion.comprobar(self._version_ranking()):
+            logger.info("La base de datos tiene escrituras de otro proceso; se recarga la clasificación.")
+            self.reconstruir_ranking()
+        return True
+
+    def actualizar_ranking(self, puntos_por_jugador):
+        """
+        Suma puntos en la clasificación en memoria, si está activa para esta base de datos.
+
+        Se llama después de confirmar los puntos en la base de datos; los jugadores que no
+        estén en la clasificación se añaden.
+
+        Args:
+            puntos_por_jugador (dict[int, int]): Los puntos a sumar por id de jugador.
+        """
+        if clasificacion.activa(self._base_de_datos()):
+            clasificacion.sumar(puntos_por_jugador)
+
+    def _base_de_datos(self):
+        return str(engine_sincrono(self.db.get_bind()).url)
+
+    def obtener_id(self, nombre, tipo):
+        """
+        Obtiene el id de un jugador por su nombre, si no existe lo crea, sin hacer commit.
+
+        El id se busca primero en mapa_jugadores y después en la base de datos. Sólo si
+        el jugador no existe se hace un upsert sobre el índice único de nombre (INSERT
+        ... ON CONFLICT), que devuelve el id aunque lo acabe de crear otra petición
+        concurrente. El jugador nuevo se confirma con la siguiente escritura de la
+        sesión, y sólo entonces se guarda en el mapa y entra en la clasificación.
+
+        Args:
+            nombre (str): El nombre del jugador.
+            tipo (str): El tipo del jugador si hay que crearlo ('humano' o 'maquina').
+
+        Returns:
+            int: El id del jugador.
+        """
+        base_de_datos = self._base_de_datos()
+        jugador_id = mapa_jugadores.obtener(base_de_datos, nombre)
+        if jugador_id is not None:
+            return jugador_id
+        jugador_id = self.db.info.get("jugadores_nuevos", {}).get(nombre)
+        if jugador_id is not None:
+            return jugador_id
+        logger.info("Jugador %s no está en el mapa de jugadores, consultando/creando.", nombre)
+        try:
+            jugador_id = self.db.execute(select(Jugador.id).where(Jugador.nombre == nombre)).scalar_one_or_none()
+            if jugador_id is not None:
+                mapa_jugadores.guardar(base_de_datos, nombre, jugador_id)
+                return jugador_id
+            stmt = sqlite_insert(Jugador).values(nombre=nombre, tipo=tipo, puntos=0)
+            stmt = stmt.on_conflict_do_update(index_elements=[Jugador.nombre], set_={"nombre": stmt.excluded.nombre})
+            jugador_id = self.db.execute(stmt.returning(Jugador.id)).scalar_one()
+            self._registrar_al_confirmar(nombre, jugador_id)
+            return jugador_id
+        except Exception as e:
+            logger.error("Error al obtener o crear el id del jugador: %s", e)
+            self.db.rollback()
+            raise e
+
+    def _registrar_al_confirmar(self, nombre, jugador_id):
+        # Los jugadores creados por obtener_id se guardan en el mapa y en la clasificación
+        # cuando se confirma la transacción que los crea, y se descartan si se deshace
+        nuevos = self.db.info.get("jugadores_nuevos")
+        if nuevos is None:
+            nuevos = self.db.info["jugadores_nuevos"] = {}
+            base_de_datos = self._base_de_datos()
+
+            def al_confirmar(session):
+                for nombre_nuevo, id_nuevo in nuevos.items():
+                    mapa_jugadores.guardar(base_de_datos, nombre_nuevo, id_nuevo)
+                if nuevos and clasificacion.activa(base_de_datos):
+                    clasificacion.sumar(dict.fromkeys(nuevos.values(), 0))
+                nuevos.clear()
+
+            event.listen(self.db, "after_commit", al_confirmar)
+            event.listen(self.db, "after_rollback", lambda session: nuevos.clear())
+        nuevos[nombre] = jugador_id
+
     def get_or_create(self, nombre, tipo):
         """
-        Obtiene un jugador por su nombre, si no existe lo crea.
+        Obtiene un jugador por su nombre, si no existe lo crea y lo confirma.
+
+        A diferencia de obtener_id, el jugador creado se confirma en el momento, de modo
+        que otras sesiones (p. ej. la del escritor diferido) ya pueden usarlo; si existía,
+        no se hace commit.
 
         Args:
             nombre (str): El nombre del jugador.
@@ -170,17 +945,103 @@ class JugadorRepository:
         Returns:
             Jugador: El jugador obtenido o creado.
         """
-        logger.info(f"Consultando/Creando jugador: {nombre}, Tipo: {tipo}")
+        logger.info("Consultando/Creando jugador: %s, Tipo: %s", nombre, tipo)
         try:
-            jugador = self.db.query(Jugador).filter(Jugador.nombre == nombre).first()
-            if not jugador:
-                logger.info(f"Jugador no encontrado, creando nuevo jugador: {nombre}")
-                jugador = Jugador(nombre=nombre, tipo=tipo)
-                self.db.add(jugador)
+            jugador_id = self.obtener_id(nombre, tipo)
+            if self.db.info.get("jugadores_nuevos"):
                 self.db.commit()
-                self.db.refresh(jugador)
-            logger.info(f"Jugador obtenido o creado: {jugador}")
+            # Session.get no consulta la base de datos si el jugador ya está cargado en la sesión
+            jugador = self.db.get(Jugador, jugador_id)
+            logger.info("Jugador obtenido o creado: %s", jugador)
             return jugador
         except Exception as e:
-            logger.error(f"Error al obtener o crear jugador: {e}")
+            logger.error("Error al obtener o crear jugador: %s", e)
             raise e
+
+
+    def obtener_o_crear_lote(self, jugadores):
+        """
+        Obtiene los ids de varios jugadores por nombre, creando los que no existan, sin hacer commit.
+
+        Los ids se buscan primero en mapa_jugadores; el resto se consultan en bloques y
+        los que faltan se insertan con INSERT ... ON CONFLICT DO NOTHING. Los jugadores
+        nuevos se confirman junto con la siguiente escritura, en la misma transacción,
+        por lo que sólo se guardan en el mapa los que ya existían.
+
+        Args:
+            jugadores (list[tuple[str, str]]): Pares (nombre, tipo) de los jugadores.
+
+        Returns:
+            dict[str, int]: Los ids de los jugadores por nombre.
+        """
+        tipos = dict(jugadores)
+        base_de_datos = self._base_de_datos()
+        ids = {}
+        for nombre in tipos:
+            jugador_id = mapa_jugadores.obtener(base_de_datos, nombre)
+            if jugador_id is not None:
+                ids[nombre] = jugador_id
+        pendientes = [nombre for nombre in tipos if nombre not in ids]
+        logger.info("Consultando/Creando lote de %s jugadores (%s en el mapa).", len(tipos), len(ids))
+        if not pendientes:
+            return ids
+        try:
+            existentes = self._consultar_ids(pendientes)
+            for nombre, jugador_id in existentes.items():
+                mapa_jugadores.guardar(base_de_datos, nombre, jugador_id)
+            ids.update(existentes)
+            nuevos = [nombre for nombre in pendientes if nombre not in existentes]
+            if nuevos:
+                self.db.execute(
+                    sqlite_insert(Jugador).on_conflict_do_nothing(index_elements=[Jugador.nombre]),
+                    [{"nombre": nombre, "tipo": tipos[nombre], "puntos": 0} for nombre in nuevos]
+                )
+                ids.update(self._consultar_ids(nuevos))
+            return ids
+        except Exception as e:
+            logger.error("Error al obtener o crear el lote de jugadores: %s", e)
+            self.db.rollback()
+            raise e
+
+    def _consultar_ids(self, nombres):
+        # En bloques de 500 para no superar el límite de parámetros de SQLite
+        ids = {}
+        for i in range(0, len(nombres), 500):
+            ids.update(self.db.execute(
+                select(Jugador.nombre, Jugador.id).where(Jugador.nombre.in_(nombres[i:i + 500]))
+            ).all())
+        return ids
+
+
+class RepositorioAsync:
+
+    repositorio = None
+
+    def __init__(self, db: AsyncSession):
+        """
+        Inicializa la variante asíncrona de un repositorio.
+
+        Cada método del repositorio síncrono se expone como corrutina y se ejecuta
+        con AsyncSession.run_sync, de modo que ambos comparten consultas y caché.
+
+        Args:
+            db (AsyncSession): La sesión asíncrona de la base de datos.
+        """
+        self.db = db
+
+    def __getattr__(self, nombre):
+        metodo = getattr(self.repositorio, nombre)
+        if nombre.startswith("_") or not callable(metodo):
+            raise AttributeError(nombre)
+
+        async def llamada(*args, **kwargs):
+            return await self.db.run_sync(lambda session: metodo(self.repositorio(session), *args, **kwargs))
+        return llamada
+
+
+class PartidaRepositoryAsync(RepositorioAsync):
+    repositorio = PartidaRepository
+
+
+class JugadorRepositoryAsync(RepositorioAsync):
+    repositorio = JugadorRepository
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field
 from enum import Enum
 
 class JugadaEnum(str, Enum):
@@ -20,6 +22,11 @@ class EstadoPartidaEnum(str, Enum):
     FINALIZADA = 'finalizada'
     ABANDONADA = 'abandonada'
 
+class GranularidadEnum(str, Enum):
+    MINUTO = 'minuto'
+    HORA = 'hora'
+    DIA = 'dia'
+
 class JugadorBase(BaseModel):
     nombre: str
     tipo: TipoJugadorEnum
@@ -31,3 +38,18 @@ class JugadaBase(BaseModel):
 class PartidaBase(BaseModel):
     estado: str
     ganador: JugadorBase = None
+
+class JugadaLote(BaseModel):
+    jugada_jugador1: JugadaEnum
+    jugada_jugador2: JugadaEnum
+
+class PartidaLote(BaseModel):
+    jugador1: JugadorBase
+    jugador2: JugadorBase
+    jugadas: List[JugadaLote] = Field(min_length=1, max_length=3)
+    estado: EstadoPartidaEnum = EstadoPartidaEnum.FINALIZADA
+    ganador: Optional[str] = None  # Nombre del ganador; si se indica, debe coincidir con las jugadas
+    finalizada_en: Optional[datetime] = None  # Por defecto, el momento del registro
+
+class LotePartidas(BaseModel):
+    partidas: List[PartidaLote] = Field(min_length=1, max_length=10000)
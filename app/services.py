@@ -1,23 +1,81 @@
-from app.logger_config import get_logger
-from app.models import JugadaEnum, Jugador, Partida, Jugada
-from app.repositories import PartidaRepository, JugadorRepository
+import random
+from array import array
+from collections import Counter
+import numpy as np
+from app.logger_config import get_logger, get_logger_jugadas
+from app.cache import cache_consultas
+from app.metricas import jugadas_registradas, partidas_terminadas
+from app.models import JugadaEnum, Jugador, Partida, Jugada, ahora_utc
+from app.schemas import EstadoPartidaEnum, ResultadoJugadaEnum, PartidaLote
+from app.repositories import PartidaRepository, JugadorRepository, CLAVE_PARTIDAS_GANADAS, clave_estado, clave_jugada
 
-# Obtener el logger
+# Obtener el logger (y el de los mensajes por jugada, que admite muestreo)
 logger = get_logger(__name__)
+logger_jugadas = get_logger_jugadas(__name__)
+
+# Códigos enteros de las jugadas y resultados (el índice es el código)
+JUGADAS = [JugadaEnum.PIEDRA, JugadaEnum.PAPEL, JugadaEnum.TIJERA]
+RESULTADOS = [ResultadoJugadaEnum.EMPATE, ResultadoJugadaEnum.GANADA, ResultadoJugadaEnum.PERDIDA]
+
+# Resultado de la jugada del jugador (fila) contra la del rival (columna)
+TABLA_RESULTADOS = np.array([
+    [0, 2, 1],  # piedra: empata con piedra, pierde con papel, gana a tijera
+    [1, 0, 2],  # papel: gana a piedra, empata con papel, pierde con tijera
+    [2, 1, 0],  # tijera: pierde con piedra, gana a papel, empata con tijera
+], dtype=np.int8)
+
+_RESULTADOS_POR_JUGADAS = {
+    (jugada_jugador, jugada_rival): RESULTADOS[TABLA_RESULTADOS[i, j]].value
+    for i, jugada_jugador in enumerate(JUGADAS)
+    for j, jugada_rival in enumerate(JUGADAS)
+}
+
+# Código de cada jugada y jugada que gana a cada una (por código)
+CODIGOS_JUGADAS = {jugada: codigo for codigo, jugada in enumerate(JUGADAS)}
+GANA_A = [int(np.flatnonzero(TABLA_RESULTADOS[:, rival] == 1)[0]) for rival in range(len(JUGADAS))]
+
+def _participantes(partida):
+    """Ids de los jugadores de una partida (las partidas anteriores a guardarlos no tienen)."""
+    return [jugador_id for jugador_id in (partida.jugador1_id, partida.jugador2_id) if jugador_id is not None]
+
+def _transicion(estado_anterior, estado_nuevo):
+    """Incrementos de los contadores de estado al pasar una partida de un estado a otro (nulos si no cambia)."""
+    transicion = Counter({clave_estado(estado_nuevo): 1})
+    transicion[clave_estado(estado_anterior)] -= 1
+    return dict(transicion)
+
+def _contar_lote(origen, partidas):
+    """Suma a las métricas las jugadas y partidas terminadas de un lote ya guardado."""
+    jugadas_registradas.inc(origen, valor=sum(len(partida.get("jugadas", ())) for partida in partidas))
+    for estado, n in Counter(partida.get("estado") for partida in partidas).items():
+        if estado is not None:
+            partidas_terminadas.inc(origen, EstadoPartidaEnum(estado).value, valor=n)
+
+def _puntos_por_ganador(partidas):
+    """Puntos que suma cada ganador de un lote de partidas (uno por partida ganada)."""
+    return dict(Counter(partida["ganador_id"] for partida in partidas if partida.get("ganador_id") is not None))
+
 
 class JuegoService:
 
-    def __init__(self, partida_repo: PartidaRepository, jugador_repo: JugadorRepository):
+    def __init__(self, partida_repo: PartidaRepository, jugador_repo: JugadorRepository, escritor=None):
         """
         Inicializa el servicio del juego con los repositorios de partidas y jugadores.
 
+        Con un escritor diferido, las partidas y sus jugadas se guardan en memoria y no
+        se escriben en la base de datos hasta que terminan; entonces se encolan en el
+        escritor, que las guarda en lotes (ver app.escritura_diferida).
+
         Args:
             partida_repo (PartidaRepository): Repositorio de partidas.
             jugador_repo (JugadorRepository): Repositorio de jugadores.
+            escritor (EscritorDiferido | None): Escritor diferido de las partidas terminadas.
         """
         self.partida_repo = partida_repo
         self.jugador_repo = jugador_repo
-        logger.info("JuegoService inicializado.")
+        self.escritor = escritor
+        self._jugadas_pendientes = {}  # partida en curso -> jugadas aún sin guardar
+        logger.debug("JuegoService inicializado.")
 
     def iniciar_partida(self, jugador1: Jugador, jugador2: Jugador):
         """
@@ -30,14 +88,23 @@ class JuegoService:
         Returns:
             Partida: La partida que se ha iniciado.
         """
-        logger.info(f"Iniciando partida entre {jugador1.nombre} y {jugador2.nombre}.")
+        logger.info("Iniciando partida entre %s y %s.", jugador1.nombre, jugador2.nombre)
         try:
-            partida = Partida(estado='en curso')
+            partida = Partida(estado='en curso', jugador1_id=jugador1.id, jugador2_id=jugador2.id)
+            if self.escritor is not None:
+                partida.creada_en = ahora_utc()
+                self._jugadas_pendientes[partida] = []
+                return partida
+            self.partida_repo.incrementar_contadores({clave_estado(partida.estado): 1})
+            self.partida_repo.incrementar_contadores_jugador(
+                {jugador_id: {clave_estado(partida.estado): 1} for jugador_id in _participantes(partida)}
+            )
             self.partida_repo.save(partida)
-            logger.info(f"Partida iniciada con éxito: {partida}")
+            cache_consultas.invalidar()
+            logger.info("Partida iniciada con éxito: %s", partida)
             return partida
         except Exception as e:
-            logger.error(f"Error al iniciar la partida: {e}")
+            logger.error("Error al iniciar la partida: %s", e)
             raise e
 
     def registrar_jugada(self, partida: Partida, jugador: Jugador, jugada_jugador: JugadaEnum, jugada_maquina: JugadaEnum):
@@ -53,15 +120,22 @@ class JuegoService:
         Returns:
             str: El resultado de la jugada ('ganada', 'perdida' o 'empate').
         """
-        logger.info(f"Registrando jugada de {jugador.nombre} en la partida {partida.id}. Jugada jugador: {jugada_jugador}, Jugada máquina: {jugada_maquina}.")
+        logger_jugadas.info("Registrando jugada de %s en la partida %s. Jugada jugador: %s, Jugada máquina: %s.", jugador.nombre, partida.id, jugada_jugador, jugada_maquina)
         try:
             resultado = self.determinar_resultado(jugada_jugador, jugada_maquina)
+            jugadas_registradas.inc("partida")
+            if self.escritor is not None:
+                self._jugadas_pendientes[partida].append({"jugador_id": jugador.id, "tipo": jugada_jugador, "resultado": resultado})
+                return resultado
             jugada = Jugada(partida_id=partida.id, jugador_id=jugador.id, tipo=jugada_jugador, resultado=resultado)
+            self.partida_repo.incrementar_contadores({clave_jugada(jugada_jugador, resultado): 1})
+            self.partida_repo.incrementar_contadores_jugador({jugador.id: {clave_jugada(jugada_jugador, resultado): 1}})
             self.partida_repo.save(jugada)
-            logger.info(f"Jugada registrada con éxito: {jugada}. Resultado: {resultado}")
+            cache_consultas.invalidar()
+            logger_jugadas.info("Jugada registrada con éxito: %s. Resultado: %s", jugada, resultado)
             return resultado
         except Exception as e:
-            logger.error(f"Error al registrar la jugada: {e}")
+            logger.error("Error al registrar la jugada: %s", e)
             raise e
 
     def determinar_resultado(self, jugada_jugador, jugada_maquina):
@@ -75,18 +149,10 @@ class JuegoService:
         Returns:
             str: El resultado de la jugada ('ganada', 'perdida' o 'empate').
         """
-        logger.info(f"Determinando resultado. Jugada jugador: {jugada_jugador}, Jugada máquina: {jugada_maquina}.")
-        if jugada_jugador == jugada_maquina:
-            logger.info("Resultado: empate.")
-            return 'empate'
-        elif (jugada_jugador == JugadaEnum.PIEDRA and jugada_maquina == JugadaEnum.TIJERA) or \
-             (jugada_jugador == JugadaEnum.PAPEL and jugada_maquina == JugadaEnum.PIEDRA) or \
-             (jugada_jugador == JugadaEnum.TIJERA and jugada_maquina == JugadaEnum.PAPEL):
-            logger.info("Resultado: ganada.")
-            return 'ganada'
-        else:
-            logger.info("Resultado: perdida.")
-            return 'perdida'
+        logger_jugadas.info("Determinando resultado. Jugada jugador: %s, Jugada máquina: %s.", jugada_jugador, jugada_maquina)
+        resultado = _RESULTADOS_POR_JUGADAS[(JugadaEnum(jugada_jugador), JugadaEnum(jugada_maquina))]
+        logger_jugadas.info("Resultado: %s.", resultado)
+        return resultado
 
     def finalizar_partida(self, partida: Partida, ganador: Jugador):
         """
@@ -96,15 +162,30 @@ class JuegoService:
             partida (Partida): La partida que se va a finalizar.
             ganador (Jugador): El jugador que ha ganado la partida.
         """
-        logger.info(f"Finalizando partida {partida.id}. Ganador: {ganador.nombre}.")
+        logger.info("Finalizando partida %s. Ganador: %s.", partida.id, ganador.nombre)
         try:
+            momento = ahora_utc()
+            partidas_terminadas.inc("partida", "finalizada")
+            if self.escritor is not None:
+                partida.ganador_id, partida.estado, partida.finalizada_en = ganador.id, 'finalizada', momento
+                self._escribir_diferida(partida)
+                return
+            transicion = _transicion(partida.estado, 'finalizada')
+            nueva_victoria = 0 if partida.ganador_id is not None else 1
+            self.partida_repo.incrementar_contadores({**transicion, CLAVE_PARTIDAS_GANADAS: nueva_victoria}, momento)
+            por_jugador = {jugador_id: dict(transicion) for jugador_id in _participantes(partida)}
+            por_jugador.setdefault(ganador.id, {})[CLAVE_PARTIDAS_GANADAS] = nueva_victoria
+            self.partida_repo.incrementar_contadores_jugador(por_jugador)
             partida.ganador_id = ganador.id
             partida.estado = 'finalizada'
+            partida.finalizada_en = momento
             ganador.puntos += 1
             self.partida_repo.save(partida)
-            logger.info(f"Partida finalizada. Ganador {ganador.nombre}, Puntos totales: {ganador.puntos}")
+            cache_consultas.invalidar()
+            self.jugador_repo.actualizar_ranking({ganador.id: 1})
+            logger.info("Partida finalizada. Ganador %s, Puntos totales: %s", ganador.nombre, ganador.puntos)
         except Exception as e:
-            logger.error(f"Error al finalizar la partida {partida.id}: {e}")
+            logger.error("Error al finalizar la partida %s: %s", partida.id, e)
             raise e
 
     def marcar_abandonada(self, partida: Partida):
@@ -114,11 +195,430 @@ class JuegoService:
         Args:
             partida (Partida): La partida que se va a marcar como abandonada.
         """
-        logger.info(f"Marcando partida {partida.id} como abandonada.")
+        logger.info("Marcando partida %s como abandonada.", partida.id)
         try:
+            momento = ahora_utc()
+            partidas_terminadas.inc("partida", "abandonada")
+            if self.escritor is not None:
+                partida.estado, partida.finalizada_en = 'abandonada', momento
+                self._escribir_diferida(partida)
+                return
+            transicion = _transicion(partida.estado, 'abandonada')
+            self.partida_repo.incrementar_contadores(transicion, momento)
+            self.partida_repo.incrementar_contadores_jugador({jugador_id: transicion for jugador_id in _participantes(partida)})
             partida.estado = 'abandonada'
+            partida.finalizada_en = momento
             self.partida_repo.save(partida)
-            logger.info(f"Partida {partida.id} marcada como abandonada.")
+            cache_consultas.invalidar()
+            logger.info("Partida %s marcada como abandonada.", partida.id)
+        except Exception as e:
+            logger.error("Error al marcar la partida %s como abandonada: %s", partida.id, e)
+            raise e
+
+    def _escribir_diferida(self, partida: Partida):
+        # Los contadores, los puntos del ganador y la clasificación los actualiza el escritor con el lote
+        partida.id = self.escritor.escribir({
+            "estado": partida.estado,
+            "ganador_id": partida.ganador_id,
+            "jugador1_id": partida.jugador1_id,
+            "jugador2_id": partida.jugador2_id,
+            "jugadas": self._jugadas_pendientes.pop(partida, []),
+            "creada_en": partida.creada_en,
+            "finalizada_en": partida.finalizada_en
+        })
+
+    def resolver_partida(self, jugador1: Jugador, jugador2: Jugador, jugadas_jugador1, jugadas_jugador2):
+        """
+        Resuelve en memoria una partida completa al mejor de 3 sin persistirla.
+
+        Se aplica la misma regla que en el juego de consola: gana el jugador 1 si
+        ha ganado más jugadas que el jugador 2; en otro caso gana el jugador 2.
+
+        Args:
+            jugador1 (Jugador): El jugador cuyas jugadas se registran.
+            jugador2 (Jugador): El rival.
+            jugadas_jugador1 (list[JugadaEnum]): Las jugadas del jugador 1.
+            jugadas_jugador2 (list[JugadaEnum]): Las jugadas del jugador 2.
+
+        Returns:
+            dict: La partida lista para PartidaRepository.guardar_lote.
+        """
+        ganadas_jugador1 = 0
+        ganadas_jugador2 = 0
+        jugadas = []
+        for jugada_jugador1, jugada_jugador2 in zip(jugadas_jugador1, jugadas_jugador2):
+            resultado = self.determinar_resultado(jugada_jugador1, jugada_jugador2)
+            if resultado == 'ganada':
+                ganadas_jugador1 += 1
+            elif resultado == 'perdida':
+                ganadas_jugador2 += 1
+            jugadas.append({"jugador_id": jugador1.id, "tipo": jugada_jugador1, "resultado": resultado})
+        ganador = jugador1 if ganadas_jugador1 > ganadas_jugador2 else jugador2
+        return {
+            "estado": EstadoPartidaEnum.FINALIZADA,
+            "ganador_id": ganador.id,
+            "jugador1_id": jugador1.id,
+            "jugador2_id": jugador2.id,
+            "jugadas": jugadas
+        }
+
+    def registrar_partidas_simuladas(self, partidas):
+        """
+        Persiste un lote de partidas ya resueltas en una única transacción.
+
+        Args:
+            partidas (list[dict]): Partidas generadas con resolver_partida.
+
+        Returns:
+            list[int]: Los ids de las partidas guardadas.
+        """
+        logger.info("Registrando lote de %s partidas simuladas.", len(partidas))
+        try:
+            ids = self.partida_repo.guardar_lote(partidas)
+            _contar_lote("simulada", partidas)
+            cache_consultas.invalidar()
+            self.jugador_repo.actualizar_ranking(_puntos_por_ganador(partidas))
+            return ids
         except Exception as e:
-            logger.error(f"Error al marcar la partida {partida.id} como abandonada: {e}")
+            logger.error("Error al registrar el lote de partidas simuladas: %s", e)
             raise e
+
+
+    def registrar_partidas_lote(self, partidas: list[PartidaLote]):
+        """
+        Registra partidas completas jugadas fuera de la aplicación en una única transacción.
+
+        El resultado de cada partida se recalcula a partir de sus jugadas con la regla del
+        mejor de 3; si la partida indica un ganador, debe coincidir con el calculado.
+
+        Args:
+            partidas (list[PartidaLote]): Las partidas, con sus jugadores y jugadas.
+
+        Returns:
+            list[int]: Los ids de las partidas guardadas, en el mismo orden.
+
+        Raises:
+            ValueError: Si una partida no es coherente con sus jugadas.
+        """
+        logger.info("Registrando lote de %s partidas externas.", len(partidas))
+        try:
+            # Primero se validan todas las partidas, con los lados 1 y 2 como jugadores provisionales
+            lado1, lado2 = Jugador(id=1), Jugador(id=2)
+            lote = []
+            for i, partida in enumerate(partidas):
+                nombres = (partida.jugador1.nombre, partida.jugador2.nombre)
+                if nombres[0] == nombres[1]:
+                    raise ValueError(f"Partida {i}: los dos jugadores son el mismo.")
+                if partida.estado not in (EstadoPartidaEnum.FINALIZADA, EstadoPartidaEnum.ABANDONADA):
+                    raise ValueError(f"Partida {i}: sólo se admiten partidas finalizadas o abandonadas.")
+                resuelta = self.resolver_partida(
+                    lado1, lado2,
+                    [jugada.jugada_jugador1 for jugada in partida.jugadas],
+                    [jugada.jugada_jugador2 for jugada in partida.jugadas]
+                )
+                ganador = nombres[resuelta["ganador_id"] - 1]
+                if partida.estado == EstadoPartidaEnum.ABANDONADA:
+                    resuelta.update(estado=EstadoPartidaEnum.ABANDONADA, ganador_id=None)
+                    ganador = None
+                if partida.ganador is not None and partida.ganador != ganador:
+                    raise ValueError(f"Partida {i}: el ganador '{partida.ganador}' no coincide con las jugadas.")
+                if partida.finalizada_en is not None:
+                    resuelta["finalizada_en"] = partida.finalizada_en
+                lote.append((nombres, ganador, resuelta))
+
+            ids_jugadores = self.jugador_repo.obtener_o_crear_lote(
+                [(j.nombre, j.tipo) for partida in partidas for j in (partida.jugador1, partida.jugador2)]
+            )
+            for nombres, ganador, resuelta in lote:
+                resuelta["ganador_id"] = ids_jugadores[ganador] if ganador is not None else None
+                resuelta["jugador1_id"], resuelta["jugador2_id"] = ids_jugadores[nombres[0]], ids_jugadores[nombres[1]]
+                for jugada in resuelta["jugadas"]:
+                    jugada["jugador_id"] = ids_jugadores[nombres[0]]
+            ids = self.partida_repo.guardar_lote([resuelta for _, _, resuelta in lote])
+            _contar_lote("lote", [resuelta for _, _, resuelta in lote])
+            cache_consultas.invalidar()
+            # Los jugadores nuevos entran en la clasificación aunque no hayan ganado
+            self.jugador_repo.actualizar_ranking({
+                **dict.fromkeys(ids_jugadores.values(), 0),
+                **_puntos_por_ganador([resuelta for _, _, resuelta in lote])
+            })
+            return ids
+        except Exception as e:
+            logger.error("Error al registrar el lote de partidas externas: %s", e)
+            raise e
+
+
+class SimuladorVectorizado:
+
+    def __init__(self, semilla=None, partidas_por_bloque=1_000_000):
+        """
+        Inicializa un simulador de partidas máquina vs máquina con NumPy.
+
+        Args:
+            semilla (int | None): Semilla del generador aleatorio.
+            partidas_por_bloque (int): Partidas generadas por bloque, para acotar la memoria.
+        """
+        self.rng = np.random.default_rng(semilla)
+        self.partidas_por_bloque = partidas_por_bloque
+        logger.debug("SimuladorVectorizado inicializado.")
+
+    def simular_bloque(self, n_partidas):
+        """
+        Genera y resuelve un bloque de partidas al mejor de 3.
+
+        Args:
+            n_partidas (int): Número de partidas del bloque.
+
+        Returns:
+            dict[str, np.ndarray]: Un diccionario con la siguiente estructura:
+                {
+                    "jugadas_jugador1": np.ndarray,  # (n, 3) int8 con los códigos de JUGADAS.
+                    "jugadas_jugador2": np.ndarray,  # (n, 3) int8 con los códigos de JUGADAS.
+                    "resultados": np.ndarray,  # (n, 3) int8 con los códigos de RESULTADOS.
+                    "gana_jugador1": np.ndarray  # (n,) bool, True si gana el jugador 1.
+                }
+        """
+        jugadas_jugador1 = self.rng.integers(0, 3, size=(n_partidas, 3), dtype=np.int8)
+        jugadas_jugador2 = self.rng.integers(0, 3, size=(n_partidas, 3), dtype=np.int8)
+        resultados = TABLA_RESULTADOS[jugadas_jugador1, jugadas_jugador2]
+        ganadas_jugador1 = np.count_nonzero(resultados == 1, axis=1)
+        ganadas_jugador2 = np.count_nonzero(resultados == 2, axis=1)
+        return {
+            "jugadas_jugador1": jugadas_jugador1,
+            "jugadas_jugador2": jugadas_jugador2,
+            "resultados": resultados,
+            "gana_jugador1": ganadas_jugador1 > ganadas_jugador2
+        }
+
+    def simular(self, n_partidas, devolver_filas=False):
+        """
+        Simula n partidas y devuelve los resultados agregados.
+
+        Args:
+            n_partidas (int): Número de partidas a simular.
+            devolver_filas (bool): Si es True, incluye los bloques generados en "filas".
+
+        Returns:
+            dict: Un diccionario con la siguiente estructura:
+                {
+                    "partidas": int,  # Número de partidas simuladas.
+                    "victorias_jugador1": int,  # Partidas ganadas por el jugador 1.
+                    "victorias_jugador2": int,  # Partidas ganadas por el jugador 2.
+                    "jugadas_por_resultado": np.ndarray,  # (3, 3): jugada x resultado del jugador 1.
+                    "filas": list[dict]  # Sólo si devolver_filas; ver simular_bloque.
+                }
+        """
+        logger.info("Simulando %s partidas vectorizadas.", n_partidas)
+        victorias_jugador1 = 0
+        jugadas_por_resultado = np.zeros(9, dtype=np.int64)
+        filas = []
+        restantes = n_partidas
+        while restantes > 0:
+            bloque = self.simular_bloque(min(self.partidas_por_bloque, restantes))
+            victorias_jugador1 += int(np.count_nonzero(bloque["gana_jugador1"]))
+            codigos = bloque["jugadas_jugador1"].astype(np.intp) * 3 + bloque["resultados"]
+            jugadas_por_resultado += np.bincount(codigos.ravel(), minlength=9)
+            if devolver_filas:
+                filas.append(bloque)
+            restantes -= len(bloque["gana_jugador1"])
+        resumen = {
+            "partidas": n_partidas,
+            "victorias_jugador1": victorias_jugador1,
+            "victorias_jugador2": n_partidas - victorias_jugador1,
+            "jugadas_por_resultado": jugadas_por_resultado.reshape(3, 3)
+        }
+        if devolver_filas:
+            resumen["filas"] = filas
+        logger.info("Simulación terminada: %s victorias del jugador 1 de %s.", victorias_jugador1, n_partidas)
+        return resumen
+
+    @staticmethod
+    def a_partidas(bloque, jugador1: Jugador, jugador2: Jugador):
+        """
+        Convierte un bloque simulado en partidas para PartidaRepository.guardar_lote.
+
+        Args:
+            bloque (dict[str, np.ndarray]): Un bloque devuelto por simular_bloque.
+            jugador1 (Jugador): El jugador cuyas jugadas se registran.
+            jugador2 (Jugador): El rival.
+
+        Returns:
+            list[dict]: Las partidas con sus jugadas.
+        """
+        return [
+            {
+                "estado": EstadoPartidaEnum.FINALIZADA,
+                "ganador_id": jugador1.id if gana else jugador2.id,
+                "jugador1_id": jugador1.id,
+                "jugador2_id": jugador2.id,
+                "jugadas": [
+                    {"jugador_id": jugador1.id, "tipo": JUGADAS[tipo], "resultado": RESULTADOS[resultado]}
+                    for tipo, resultado in zip(tipos, resultados)
+                ]
+            }
+            for tipos, resultados, gana in zip(
+                bloque["jugadas_jugador1"].tolist(), bloque["resultados"].tolist(), bloque["gana_jugador1"].tolist()
+            )
+        ]
+
+
+class Estrategia:
+
+    nombre = None
+
+    def __init__(self, semilla=None):
+        """
+        Interfaz de las estrategias de la máquina.
+
+        En cada ronda se llama a elegir para obtener la jugada de la máquina y, una vez
+        conocida la del rival, a observar. Ambas operaciones son O(1).
+
+        Args:
+            semilla (int | None): Semilla del generador aleatorio de la estrategia.
+        """
+        self.rng = random.Random(semilla)
+
+    def elegir(self):
+        """
+        Elige la próxima jugada de la máquina.
+
+        Returns:
+            JugadaEnum: La jugada elegida.
+        """
+        raise NotImplementedError
+
+    def observar(self, jugada_rival):
+        """
+        Actualiza el estado de la estrategia con la última jugada del rival.
+
+        Args:
+            jugada_rival (JugadaEnum): La jugada del rival en la ronda que acaba de terminar.
+        """
+
+
+class EstrategiaAleatoria(Estrategia):
+    """Elige cada jugada al azar con probabilidad uniforme."""
+
+    nombre = 'aleatoria'
+
+    def elegir(self):
+        return JUGADAS[self.rng.randrange(len(JUGADAS))]
+
+
+class EstrategiaMarkov(Estrategia):
+
+    nombre = 'markov'
+
+    def __init__(self, orden=2, semilla=None):
+        """
+        Predice la jugada del rival según las que ha hecho tras sus últimas `orden` jugadas
+        (un modelo de Markov / n-grama) y elige la que le gana.
+
+        Los conteos se guardan en un array plano de 3^orden x 3 enteros y el contexto
+        (las últimas jugadas del rival) como un número en base 3 que se desplaza en cada
+        ronda, por lo que elegir y observar no recorren el historial.
+
+        Args:
+            orden (int): Número de jugadas previas del rival que forman el contexto.
+            semilla (int | None): Semilla para desempatar y para las primeras rondas.
+        """
+        super().__init__(semilla)
+        self.orden = orden
+        self._contextos = len(JUGADAS) ** orden
+        self._conteos = array('L', bytes(array('L').itemsize * self._contextos * len(JUGADAS)))
+        self._contexto = 0
+        self._observadas = 0
+
+    def elegir(self):
+        if self._observadas < self.orden:
+            return JUGADAS[self.rng.randrange(len(JUGADAS))]
+        i = self._contexto * len(JUGADAS)
+        conteos = self._conteos[i:i + len(JUGADAS)]
+        maximo = max(conteos)
+        if maximo == 0:
+            return JUGADAS[self.rng.randrange(len(JUGADAS))]
+        prediccion = self.rng.choice([codigo for codigo, n in enumerate(conteos) if n == maximo])
+        return JUGADAS[GANA_A[prediccion]]
+
+    def observar(self, jugada_rival):
+        codigo = CODIGOS_JUGADAS[jugada_rival]
+        if self._observadas >= self.orden:
+            self._conteos[self._contexto * len(JUGADAS) + codigo] += 1
+        self._contexto = (self._contexto * len(JUGADAS) + codigo) % self._contextos
+        self._observadas += 1
+
+
+class EstrategiaFrecuencias(EstrategiaMarkov):
+    """Elige la jugada que gana a la más frecuente del rival (Markov de orden 0)."""
+
+    nombre = 'frecuencias'
+
+    def __init__(self, semilla=None):
+        super().__init__(orden=0, semilla=semilla)
+
+
+class EstrategiaMixta(Estrategia):
+
+    nombre = 'mixta'
+
+    def __init__(self, estrategias=None, exploracion=0.1, olvido=0.9, semilla=None):
+        """
+        Combina varias estrategias: en cada ronda juega la propuesta de la que mejor
+        resultado habría obtenido en las rondas recientes y, con probabilidad
+        `exploracion`, una jugada al azar para no ser predecible.
+
+        Args:
+            estrategias (list[Estrategia] | None): Las estrategias a combinar; por defecto,
+                frecuencias y Markov de órdenes 1 y 2.
+            exploracion (float): Probabilidad de jugar al azar.
+            olvido (float): Factor por el que se multiplica la puntuación en cada ronda.
+            semilla (int | None): Semilla del generador aleatorio.
+        """
+        super().__init__(semilla)
+        self.estrategias = estrategias or [
+            EstrategiaFrecuencias(semilla=self.rng.random()),
+            EstrategiaMarkov(orden=1, semilla=self.rng.random()),
+            EstrategiaMarkov(orden=2, semilla=self.rng.random()),
+        ]
+        self.exploracion = exploracion
+        self.olvido = olvido
+        self._puntuaciones = [0.0] * len(self.estrategias)
+        self._propuestas = None
+
+    def elegir(self):
+        self._propuestas = [CODIGOS_JUGADAS[estrategia.elegir()] for estrategia in self.estrategias]
+        if self.rng.random() < self.exploracion:
+            return JUGADAS[self.rng.randrange(len(JUGADAS))]
+        mejor = max(range(len(self.estrategias)), key=self._puntuaciones.__getitem__)
+        return JUGADAS[self._propuestas[mejor]]
+
+    def observar(self, jugada_rival):
+        codigo = CODIGOS_JUGADAS[jugada_rival]
+        if self._propuestas is not None:
+            for i, propuesta in enumerate(self._propuestas):
+                # +1 si la propuesta habría ganado, -1 si habría perdido
+                resultado = TABLA_RESULTADOS[propuesta, codigo]
+                self._puntuaciones[i] = self._puntuaciones[i] * self.olvido + (resultado == 1) - (resultado == 2)
+            self._propuestas = None
+        for estrategia in self.estrategias:
+            estrategia.observar(jugada_rival)
+
+
+ESTRATEGIAS = {
+    estrategia.nombre: estrategia
+    for estrategia in (EstrategiaAleatoria, EstrategiaFrecuencias, EstrategiaMarkov, EstrategiaMixta)
+}
+
+
+def crear_estrategia(nombre, semilla=None):
+    """
+    Crea una estrategia por su nombre ('aleatoria', 'frecuencias', 'markov' o 'mixta').
+
+    Args:
+        nombre (str): El nombre de la estrategia.
+        semilla (int | None): Semilla del generador aleatorio.
+
+    Returns:
+        Estrategia: La estrategia con su configuración por defecto.
+    """
+    return ESTRATEGIAS[nombre](semilla=semilla)
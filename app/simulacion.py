@@ -0,0 +1,217 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.logger_config import get_logger
+from app.cache import cache_consultas
+from app.ranking import clasificacion
+from app.database import crear_sesion_local, init_db
+from app.repositories import PartidaRepository, JugadorRepository
+from app.services import JuegoService, SimuladorVectorizado
+from app.registro_partidas import EscritorRegistro
+
+# Obtener el logger
+logger = get_logger(__name__)
+
+# Carpeta donde cada proceso escribe su shard
+shards_dir = os.path.join("data", "shards")
+
+
+def simular_partidas_en_lotes(db, n_partidas, batch_size, semilla=None, progreso=None):
+    """
+    Simula partidas entre "Máquina 1" y "Máquina 2" y las guarda en lotes.
+
+    Args:
+        db (Session): La sesión de la base de datos donde guardar las partidas.
+        n_partidas (int): Número de partidas a simular.
+        batch_size (int): Número de partidas por lote (un commit por lote).
+        semilla (int | np.random.SeedSequence | None): Semilla del simulador.
+        progreso (callable | None): Se llama con el número de partidas guardadas tras cada lote.
+
+    Returns:
+        int: El número de partidas guardadas.
+    """
+    jugador_repo = JugadorRepository(db)
+    juego_service = JuegoService(PartidaRepository(db), jugador_repo)
+    maquina_1 = jugador_repo.get_or_create("Máquina 1", tipo="maquina")
+    maquina_2 = jugador_repo.get_or_create("Máquina 2", tipo="maquina")
+    simulador = SimuladorVectorizado(semilla)
+
+    guardadas = 0
+    while guardadas < n_partidas:
+        bloque = simulador.simular_bloque(min(batch_size, n_partidas - guardadas))
+        juego_service.registrar_partidas_simuladas(simulador.a_partidas(bloque, maquina_1, maquina_2))
+        guardadas += len(bloque["gana_jugador1"])
+        if progreso:
+            progreso(guardadas)
+    return guardadas
+
+
+def simular_a_registro(ruta, n_partidas, batch_size, semilla=None, progreso=None):
+    """
+    Simula partidas entre "Máquina 1" y "Máquina 2" y las añade a un registro binario.
+
+    Es la alternativa a simular_partidas_en_lotes cuando no hace falta la base de
+    datos: las jugadas se escriben en un fichero de sólo añadir (ver
+    app.registro_partidas), que después se puede analizar o importar.
+
+    Args:
+        ruta (str): Ruta del fichero del registro (se añade al final si existe).
+        n_partidas (int): Número de partidas a simular.
+        batch_size (int): Número de partidas por bloque escrito.
+        semilla (int | np.random.SeedSequence | None): Semilla del simulador.
+        progreso (callable | None): Se llama con el número de partidas escritas tras cada bloque.
+
+    Returns:
+        int: El número de partidas escritas.
+    """
+    simulador = SimuladorVectorizado(semilla)
+    escritas = 0
+    with EscritorRegistro(ruta) as escritor:
+        escritor.registrar_jugador(1, "Máquina 1")
+        escritor.registrar_jugador(2, "Máquina 2")
+        while escritas < n_partidas:
+            bloque = simulador.simular_bloque(min(batch_size, n_partidas - escritas))
+            escritas += escritor.escribir_bloque(bloque, 1, 2)
+            if progreso:
+                progreso(escritas)
+    return escritas
+
+
+def simular_en_shard(ruta_shard, n_partidas, batch_size, semilla):
+    """
+    Simula partidas en un proceso independiente y las guarda en su propio shard.
+
+    Args:
+        ruta_shard (str): Ruta del fichero SQLite del shard (se recrea si existe).
+        n_partidas (int): Número de partidas a simular.
+        batch_size (int): Número de partidas por lote.
+        semilla (np.random.SeedSequence): Semilla independiente para este proceso.
+
+    Returns:
+        str: La ruta del shard generado.
+    """
+    logger.info("Simulando %s partidas en el shard %s.", n_partidas, ruta_shard)
+    if os.path.exists(ruta_shard):
+        os.remove(ruta_shard)
+    sesion_local = crear_sesion_local(f"sqlite:///{ruta_shard}")
+    init_db(sesion_local.kw["bind"])
+    db = sesion_local()
+    try:
+        simular_partidas_en_lotes(db, n_partidas, batch_size, semilla)
+    finally:
+        db.close()
+        sesion_local.kw["bind"].dispose()
+    return ruta_shard
+
+
+def fusionar_shard(engine, ruta_shard):
+    """
+    Consolida un shard en la base de datos principal remapeando los ids.
+
+    Los jugadores se emparejan por nombre (creándolos si no existen) y los ids de
+    partidas se desplazan por encima del máximo actual. La copia se hace con
+    INSERT ... SELECT sobre el shard adjuntado, en una única transacción, y los
+    contadores de estadisticas_agregadas, estadisticas_periodo y estadisticas_jugador
+    del shard se suman a los principales.
+
+    Args:
+        engine (Engine): El engine de la base de datos principal.
+        ruta_shard (str): Ruta del fichero SQLite del shard.
+
+    Returns:
+        int: El número de partidas fusionadas.
+    """
+    logger.info("Fusionando el shard %s.", ruta_shard)
+    with engine.connect() as conn:
+        conn.execute(text("ATTACH DATABASE :ruta AS shard"), {"ruta": ruta_shard})
+        conn.commit()
+        try:
+            conn.execute(text("CREATE TEMP TABLE mapa_jugadores (shard_id INTEGER PRIMARY KEY, id INTEGER)"))
+            for shard_id, nombre, tipo, puntos in conn.execute(text("SELECT id, nombre, tipo, puntos FROM shard.jugadores")).all():
+                jugador_id = conn.execute(text("SELECT id FROM jugadores WHERE nombre = :nombre"), {"nombre": nombre}).scalar()
+                if jugador_id is None:
+                    jugador_id = conn.execute(
+                        text("INSERT INTO jugadores (nombre, tipo, puntos) VALUES (:nombre, :tipo, 0) RETURNING id"),
+                        {"nombre": nombre, "tipo": tipo}
+                    ).scalar()
+                conn.execute(text("INSERT INTO mapa_jugadores VALUES (:shard_id, :id)"), {"shard_id": shard_id, "id": jugador_id})
+                conn.execute(text("UPDATE jugadores SET puntos = puntos + :puntos WHERE id = :id"), {"puntos": puntos or 0, "id": jugador_id})
+
+            desplazamiento = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM partidas")).scalar()
+            fusionadas = conn.execute(text(
+                "INSERT INTO partidas (id, estado, ganador_id, jugador1_id, jugador2_id, creada_en, finalizada_en) "
+                "SELECT p.id + :desplazamiento, p.estado, m.id, m1.id, m2.id, p.creada_en, p.finalizada_en "
+                "FROM shard.partidas p LEFT JOIN mapa_jugadores m ON m.shard_id = p.ganador_id "
+                "LEFT JOIN mapa_jugadores m1 ON m1.shard_id = p.jugador1_id "
+                "LEFT JOIN mapa_jugadores m2 ON m2.shard_id = p.jugador2_id"
+            ), {"desplazamiento": desplazamiento}).rowcount
+            conn.execute(text(
+                "INSERT INTO jugadas (partida_id, jugador_id, tipo, resultado) "
+                "SELECT j.partida_id + :desplazamiento, m.id, j.tipo, j.resultado "
+                "FROM shard.jugadas j LEFT JOIN mapa_jugadores m ON m.shard_id = j.jugador_id "
+                "ORDER BY j.id"
+            ), {"desplazamiento": desplazamiento})
+            conn.execute(text(
+                "INSERT INTO estadisticas_agregadas (clave, valor) "
+                "SELECT clave, valor FROM shard.estadisticas_agregadas WHERE true "
+                "ON CONFLICT (clave) DO UPDATE SET valor = estadisticas_agregadas.valor + excluded.valor"
+            ))
+            conn.execute(text(
+                "INSERT INTO estadisticas_periodo (granularidad, inicio, clave, valor) "
+                "SELECT granularidad, inicio, clave, valor FROM shard.estadisticas_periodo WHERE true "
+                "ON CONFLICT (granularidad, inicio, clave) DO UPDATE SET valor = estadisticas_periodo.valor + excluded.valor"
+            ))
+            conn.execute(text(
+                "INSERT INTO estadisticas_jugador (jugador_id, clave, valor) "
+                "SELECT m.id, e.clave, e.valor FROM shard.estadisticas_jugador e "
+                "JOIN mapa_jugadores m ON m.shard_id = e.jugador_id WHERE true "
+                "ON CONFLICT (jugador_id, clave) DO UPDATE SET valor = estadisticas_jugador.valor + excluded.valor"
+            ))
+            conn.execute(text("DROP TABLE mapa_jugadores"))
+            conn.commit()
+            cache_consultas.invalidar()
+        except Exception as e:
+            logger.error("Error al fusionar el shard %s: %s", ruta_shard, e)
+            conn.rollback()
+            raise e
+        finally:
+            conn.execute(text("DETACH DATABASE shard"))
+            conn.commit()
+    if clasificacion.activa(str(engine.url)):
+        # Los puntos del shard se han sumado en SQL: se recarga la clasificación
+        with Session(bind=engine) as db:
+            JugadorRepository(db).reconstruir_ranking()
+    logger.info("Shard %s fusionado: %s partidas.", ruta_shard, fusionadas)
+    return fusionadas
+
+
+def simular_en_paralelo(engine, n_partidas, batch_size, workers, semilla=None):
+    """
+    Reparte la simulación entre varios procesos, cada uno con su shard, y los fusiona.
+
+    Args:
+        engine (Engine): El engine de la base de datos principal.
+        n_partidas (int): Número total de partidas a simular.
+        batch_size (int): Número de partidas por lote en cada proceso.
+        workers (int): Número de procesos.
+        semilla (int | None): Semilla de la que se derivan las de cada proceso.
+
+    Returns:
+        int: El número de partidas fusionadas en la base de datos principal.
+    """
+    os.makedirs(shards_dir, exist_ok=True)
+    repartos = [n_partidas // workers + (1 if i < n_partidas % workers else 0) for i in range(workers)]
+    semillas = np.random.SeedSequence(semilla).spawn(workers)
+    rutas = [os.path.join(shards_dir, f"shard_{i}.db") for i in range(workers)]
+
+    logger.info("Simulando %s partidas con %s procesos.", n_partidas, workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        shards = list(pool.map(simular_en_shard, rutas, repartos, [batch_size] * workers, semillas))
+
+    fusionadas = 0
+    for ruta_shard in shards:
+        fusionadas += fusionar_shard(engine, ruta_shard)
+        os.remove(ruta_shard)
+    return fusionadas
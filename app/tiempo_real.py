@@ -0,0 +1,200 @@
+import json
+import anyio
+from fastapi import WebSocket, WebSocketDisconnect
+from app.logger_config import get_logger
+from app.models import ahora_utc
+from app.schemas import EstadoPartidaEnum, JugadaEnum, PartidaLote
+from app.services import JuegoService, crear_estrategia
+
+# Obtener el logger
+logger = get_logger(__name__)
+
+# Nombre del rival de los jugadores conectados, como en el juego de consola
+NOMBRE_MAQUINA = "Máquina"
+JUGADAS_POR_PARTIDA = 3
+
+
+class PartidaEnCurso:
+
+    def __init__(self, nombre_jugador, estrategia, juego_service: JuegoService):
+        """
+        Máquina de estados en memoria de una partida al mejor de 3 contra la máquina.
+
+        La partida empieza en curso, pasa a finalizada tras la tercera jugada o a
+        abandonada si el jugador se desconecta antes, y no toca la base de datos: al
+        terminar se convierte en una PartidaLote (o, con los ids de los jugadores, en
+        una partida de PartidaRepository.guardar_lote) para guardarla de una vez.
+
+        Args:
+            nombre_jugador (str): El nombre del jugador humano.
+            estrategia (Estrategia): La estrategia de la máquina.
+            juego_service (JuegoService): El servicio que determina el resultado de cada jugada.
+        """
+        self.nombre_jugador = nombre_jugador
+        self.estrategia = estrategia
+        self.juego_service = juego_service
+        self.estado = EstadoPartidaEnum.EN_CURSO
+        self.jugadas = []  # pares (jugada del jugador, jugada de la máquina)
+        self.resultados = []
+        self.creada_en = ahora_utc()
+        self.finalizada_en = None
+        self.ganadas_jugador = 0
+        self.ganadas_maquina = 0
+        self.ganador = None
+
+    def jugar(self, jugada_jugador: JugadaEnum):
+        """
+        Juega una ronda: la máquina elige su jugada y se actualiza el marcador.
+
+        Args:
+            jugada_jugador (JugadaEnum): La jugada del jugador.
+
+        Returns:
+            dict: El resultado de la ronda, con la siguiente estructura:
+                {
+                    "ronda": int,  # Número de la ronda, desde 1.
+                    "jugada": str,  # La jugada del jugador.
+                    "jugada_maquina": str,  # La jugada de la máquina.
+                    "resultado": str,  # 'ganada', 'perdida' o 'empate', para el jugador.
+                    "marcador": dict[str, int],  # Jugadas ganadas por "jugador" y "maquina".
+                    "estado": str,  # El estado de la partida tras la ronda.
+                    "ganador": str | None  # El nombre del ganador, si ha finalizado.
+                }
+
+        Raises:
+            ValueError: Si la partida ya no está en curso.
+        """
+        if self.estado != EstadoPartidaEnum.EN_CURSO:
+            raise ValueError("La partida ya ha terminado.")
+        jugada_maquina = self.estrategia.elegir()
+        self.estrategia.observar(jugada_jugador)
+        resultado = self.juego_service.determinar_resultado(jugada_jugador, jugada_maquina)
+        if resultado == 'ganada':
+            self.ganadas_jugador += 1
+        elif resultado == 'perdida':
+            self.ganadas_maquina += 1
+        self.jugadas.append((jugada_jugador, jugada_maquina))
+        self.resultados.append(resultado)
+        if len(self.jugadas) == JUGADAS_POR_PARTIDA:
+            self.estado = EstadoPartidaEnum.FINALIZADA
+            self.finalizada_en = ahora_utc()
+            # Como en la consola, el empate lo gana la máquina
+            self.ganador = self.nombre_jugador if self.ganadas_jugador > self.ganadas_maquina else NOMBRE_MAQUINA
+        return {
+            "ronda": len(self.jugadas),
+            "jugada": jugada_jugador.value,
+            "jugada_maquina": jugada_maquina.value,
+            "resultado": resultado,
+            "marcador": {"jugador": self.ganadas_jugador, "maquina": self.ganadas_maquina},
+            "estado": self.estado.value,
+            "ganador": self.ganador
+        }
+
+    def abandonar(self):
+        """Marca como abandonada una partida en curso."""
+        if self.estado == EstadoPartidaEnum.EN_CURSO:
+            self.estado = EstadoPartidaEnum.ABANDONADA
+            self.finalizada_en = ahora_utc()
+
+    def a_partida_lote(self):
+        """
+        Convierte la partida terminada en una partida para JuegoService.registrar_partidas_lote.
+
+        Returns:
+            PartidaLote: La partida con sus jugadores y jugadas.
+        """
+        return PartidaLote(
+            jugador1={"nombre": self.nombre_jugador, "tipo": "humano"},
+            jugador2={"nombre": NOMBRE_MAQUINA, "tipo": "maquina"},
+            jugadas=[{"jugada_jugador1": jugador, "jugada_jugador2": maquina} for jugador, maquina in self.jugadas],
+            estado=self.estado,
+            ganador=self.ganador,
+            finalizada_en=self.finalizada_en
+        )
+
+    def a_partida(self, jugador_id, maquina_id):
+        """
+        Convierte la partida terminada en una partida para PartidaRepository.guardar_lote.
+
+        Args:
+            jugador_id (int): El id del jugador.
+            maquina_id (int): El id de la máquina.
+
+        Returns:
+            dict: La partida con los ids de sus jugadores, su ganador y sus jugadas.
+        """
+        ganadores = {self.nombre_jugador: jugador_id, NOMBRE_MAQUINA: maquina_id}
+        return {
+            "estado": self.estado,
+            "ganador_id": ganadores.get(self.ganador),
+            "jugador1_id": jugador_id,
+            "jugador2_id": maquina_id,
+            "jugadas": [
+                {"jugador_id": jugador_id, "tipo": jugador, "resultado": resultado}
+                for (jugador, _), resultado in zip(self.jugadas, self.resultados)
+            ],
+            "creada_en": self.creada_en,
+            "finalizada_en": self.finalizada_en
+        }
+
+
+def _leer_jugada(texto):
+    try:
+        return JugadaEnum(json.loads(texto)["jugada"])
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+async def atender_jugador(websocket: WebSocket, nombre, estrategia, guardar):
+    """
+    Atiende a un jugador conectado por WebSocket hasta que se desconecta.
+
+    Cada mensaje del cliente es {"jugada": "piedra" | "papel" | "tijera"} y cada
+    respuesta, el resultado de la ronda (ver PartidaEnCurso.jugar). Al terminar una
+    partida se guarda y la respuesta incluye su "partida_id"; si no se puede guardar,
+    la respuesta incluye un "error" y la conexión sigue abierta. La siguiente jugada
+    empieza una partida nueva contra la misma estrategia, que sigue aprendiendo. Si la
+    conexión termina a mitad de partida, por una desconexión o por cualquier error (p.
+    ej. un mensaje binario), la partida se guarda como abandonada.
+
+    Args:
+        websocket (WebSocket): La conexión, ya aceptada.
+        nombre (str): El nombre del jugador.
+        estrategia (str): El nombre de la estrategia de la máquina.
+        guardar (callable): Corrutina que guarda una PartidaEnCurso terminada y devuelve su id.
+    """
+    juego_service = JuegoService(None, None)
+    estrategia_maquina = crear_estrategia(estrategia)
+    partida = None
+    try:
+        while True:
+            jugada = _leer_jugada(await websocket.receive_text())
+            if jugada is None:
+                await websocket.send_json({"error": "Mensaje no válido: se espera {\"jugada\": \"piedra\" | \"papel\" | \"tijera\"}."})
+                continue
+            if partida is None:
+                partida = PartidaEnCurso(nombre, estrategia_maquina, juego_service)
+            ronda = partida.jugar(jugada)
+            if partida.estado == EstadoPartidaEnum.FINALIZADA:
+                terminada, partida = partida, None
+                try:
+                    ronda["partida_id"] = await guardar(terminada)
+                except Exception as e:
+                    logger.error("Error al guardar la partida del jugador %s: %s", nombre, e)
+                    ronda["partida_id"] = None
+                    ronda["error"] = "No se ha podido guardar la partida."
+            await websocket.send_json(ronda)
+    except WebSocketDisconnect:
+        logger.info("Jugador %s desconectado.", nombre)
+    except Exception as e:
+        logger.error("Error en la conexión del jugador %s: %s", nombre, e)
+        raise e
+    finally:
+        if partida is not None and partida.jugadas:
+            partida.abandonar()
+            # La conexión ya está cerrada: el guardado no se interrumpe si se cancela la tarea
+            with anyio.CancelScope(shield=True):
+                try:
+                    await guardar(partida)
+                except Exception as e:
+                    logger.error("Error al guardar la partida abandonada del jugador %s: %s", nombre, e)
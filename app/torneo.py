@@ -0,0 +1,260 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from app.logger_config import get_logger
+from app.repositories import PartidaRepository, JugadorRepository
+from app.services import (
+    JuegoService, SimuladorVectorizado, TABLA_RESULTADOS, CODIGOS_JUGADAS, ESTRATEGIAS, EstrategiaMarkov
+)
+
+# Obtener el logger
+logger = get_logger(__name__)
+
+# Estrategias del torneo por defecto
+ESTRATEGIAS_TORNEO = ['aleatoria', 'frecuencias', 'markov:1', 'markov:2', 'markov:3', 'mixta']
+
+# Órdenes admitidos en 'markov:<orden>': la tabla de transiciones crece como 3^orden
+ORDEN_MARKOV_MAXIMO = 8
+
+# Parámetros de la puntuación Elo
+ELO_INICIAL = 1500.0
+ELO_K = 16.0
+
+
+def crear_estrategia_torneo(especificacion, semilla=None):
+    """
+    Crea una estrategia a partir de su especificación en el torneo.
+
+    La especificación es el nombre de una estrategia ('aleatoria', 'frecuencias',
+    'markov' o 'mixta') o 'markov:<orden>' para un modelo de Markov de otro orden,
+    entre 1 y ORDEN_MARKOV_MAXIMO.
+
+    Args:
+        especificacion (str): La especificación de la estrategia.
+        semilla (int | None): Semilla del generador aleatorio.
+
+    Returns:
+        Estrategia: La estrategia.
+
+    Raises:
+        ValueError: Si la especificación no es válida.
+    """
+    nombre, _, parametro = especificacion.partition(':')
+    if nombre == 'markov' and parametro:
+        if not parametro.isdigit() or not 1 <= int(parametro) <= ORDEN_MARKOV_MAXIMO:
+            raise ValueError(f"Orden de Markov no válido: {especificacion} (debe estar entre 1 y {ORDEN_MARKOV_MAXIMO})")
+        return EstrategiaMarkov(orden=int(parametro), semilla=semilla)
+    if nombre not in ESTRATEGIAS or parametro:
+        raise ValueError(f"Estrategia no válida: {especificacion}")
+    return ESTRATEGIAS[nombre](semilla=semilla)
+
+
+def normalizar_estrategia_torneo(especificacion):
+    """
+    Devuelve la forma única de una especificación de estrategia del torneo.
+
+    'markov' y 'markov:<orden>' se escriben siempre con el orden explícito (así
+    'markov' y 'markov:2' son la misma estrategia); el resto no cambia.
+
+    Args:
+        especificacion (str): La especificación de la estrategia.
+
+    Returns:
+        str: La especificación normalizada.
+
+    Raises:
+        ValueError: Si la especificación no es válida.
+    """
+    estrategia = crear_estrategia_torneo(especificacion)
+    if especificacion.partition(':')[0] == 'markov':
+        return f"markov:{estrategia.orden}"
+    return especificacion
+
+
+def jugar_enfrentamiento(estrategia_a, estrategia_b, n_partidas, semilla):
+    """
+    Juega n partidas al mejor de 3 entre dos estrategias.
+
+    Cada estrategia se crea una vez y aprende de las jugadas del rival a lo largo de
+    todas las partidas del enfrentamiento. Se ejecuta en los procesos del pool.
+
+    Args:
+        estrategia_a (str): Especificación de la primera estrategia.
+        estrategia_b (str): Especificación de la segunda estrategia.
+        n_partidas (int): Número de partidas.
+        semilla (int): Semilla de la que se derivan las de ambas estrategias.
+
+    Returns:
+        dict[str, np.ndarray]: Un diccionario con la siguiente estructura:
+            {
+                "jugadas_a": np.ndarray,  # (n, 3) int8 con los códigos de JUGADAS.
+                "jugadas_b": np.ndarray,  # (n, 3) int8 con los códigos de JUGADAS.
+            }
+    """
+    semilla_a, semilla_b = np.random.SeedSequence(semilla).generate_state(2).tolist()
+    a = crear_estrategia_torneo(estrategia_a, semilla_a)
+    b = crear_estrategia_torneo(estrategia_b, semilla_b)
+    jugadas_a = np.empty(n_partidas * 3, dtype=np.int8)
+    jugadas_b = np.empty(n_partidas * 3, dtype=np.int8)
+    for i in range(n_partidas * 3):
+        jugada_a = a.elegir()
+        jugada_b = b.elegir()
+        a.observar(jugada_b)
+        b.observar(jugada_a)
+        jugadas_a[i] = CODIGOS_JUGADAS[jugada_a]
+        jugadas_b[i] = CODIGOS_JUGADAS[jugada_b]
+    return {"jugadas_a": jugadas_a.reshape(n_partidas, 3), "jugadas_b": jugadas_b.reshape(n_partidas, 3)}
+
+
+def puntuaciones_partidas(jugadas_a, jugadas_b):
+    """
+    Calcula el resultado de cada partida para el primer jugador.
+
+    Args:
+        jugadas_a (np.ndarray): (n, 3) códigos de las jugadas del primer jugador.
+        jugadas_b (np.ndarray): (n, 3) códigos de las jugadas del segundo jugador.
+
+    Returns:
+        np.ndarray: (n,) float, 1 si gana el primero, 0 si gana el segundo y 0.5 si empatan.
+    """
+    resultados = TABLA_RESULTADOS[jugadas_a, jugadas_b]
+    diferencia = np.count_nonzero(resultados == 1, axis=1) - np.count_nonzero(resultados == 2, axis=1)
+    return (np.sign(diferencia) + 1) / 2
+
+
+def calcular_elo(indices_a, indices_b, puntuaciones, n_jugadores, k=ELO_K, inicial=ELO_INICIAL):
+    """
+    Calcula la puntuación Elo de un torneo, ronda a ronda.
+
+    En cada ronda se juega una partida de cada enfrentamiento; las probabilidades
+    esperadas se calculan con las puntuaciones al empezar la ronda y las variaciones
+    se suman al terminarla, de modo que el resultado no depende del orden de los
+    enfrentamientos.
+
+    Args:
+        indices_a (np.ndarray): (m,) índice del primer jugador de cada enfrentamiento.
+        indices_b (np.ndarray): (m,) índice del segundo jugador de cada enfrentamiento.
+        puntuaciones (np.ndarray): (m, n) resultado de cada partida para el primer jugador.
+        n_jugadores (int): Número de jugadores.
+        k (float): Factor K de Elo.
+        inicial (float): Puntuación inicial de cada jugador.
+
+    Returns:
+        np.ndarray: (n_jugadores,) la puntuación final de cada jugador.
+    """
+    elo = np.full(n_jugadores, inicial)
+    for ronda in puntuaciones.T:
+        esperada = 1 / (1 + 10 ** ((elo[indices_b] - elo[indices_a]) / 400))
+        variacion = k * (ronda - esperada)
+        elo += np.bincount(indices_a, weights=variacion, minlength=n_jugadores)
+        elo -= np.bincount(indices_b, weights=variacion, minlength=n_jugadores)
+    return elo
+
+
+def _guardar_enfrentamiento(juego_service, jugador_a, jugador_b, resultado, batch_size):
+    # Como en puntuaciones_partidas, el empate al mejor de 3 no tiene ganador (ni suma puntos
+    # en la clasificación); los lados se alternan para repartir las partidas como jugador 1
+    for inicio in range(0, len(resultado["jugadas_a"]), batch_size):
+        partidas = []
+        for jugadas_1, jugadas_2, jugador1, jugador2 in (
+            (resultado["jugadas_a"], resultado["jugadas_b"], jugador_a, jugador_b),
+            (resultado["jugadas_b"], resultado["jugadas_a"], jugador_b, jugador_a),
+        ):
+            desplazamiento = 0 if jugador1 is jugador_a else 1
+            tramo = slice(inicio + desplazamiento, inicio + batch_size, 2)
+            resultados = TABLA_RESULTADOS[jugadas_1[tramo], jugadas_2[tramo]]
+            ganadas = np.count_nonzero(resultados == 1, axis=1)
+            perdidas = np.count_nonzero(resultados == 2, axis=1)
+            bloque = {"jugadas_jugador1": jugadas_1[tramo], "resultados": resultados, "gana_jugador1": ganadas > perdidas}
+            empates = (ganadas == perdidas).tolist()
+            for partida, empate in zip(SimuladorVectorizado.a_partidas(bloque, jugador1, jugador2), empates):
+                if empate:
+                    partida["ganador_id"] = None
+                partidas.append(partida)
+        juego_service.registrar_partidas_simuladas(partidas)
+
+
+def jugar_torneo(estrategias, n_partidas, workers=None, semilla=None, db=None, batch_size=10000):
+    """
+    Juega un torneo de todos contra todos entre estrategias de la máquina.
+
+    Cada enfrentamiento se juega en un proceso del pool. Si se indica una sesión, las
+    partidas se guardan con un jugador "Estrategia <especificación>" por estrategia; las
+    empatadas se guardan sin ganador, de modo que los puntos de cada jugador son sus
+    victorias en la clasificación. Las especificaciones se normalizan con
+    normalizar_estrategia_torneo ('markov' aparece como 'markov:2').
+
+    Args:
+        estrategias (list[str]): Especificaciones de las estrategias (ver crear_estrategia_torneo).
+        n_partidas (int): Número de partidas de cada enfrentamiento.
+        workers (int | None): Número de procesos; por defecto, uno por núcleo.
+        semilla (int | None): Semilla de la que se derivan las de cada enfrentamiento.
+        db (Session | None): Sesión de la base de datos donde guardar las partidas.
+        batch_size (int): Número de partidas por lote al guardarlas.
+
+    Returns:
+        list[dict]: La clasificación, de mayor a menor Elo, con la siguiente estructura:
+            [
+                {
+                    "estrategia": str,  # Especificación normalizada de la estrategia.
+                    "elo": float,  # Puntuación Elo final.
+                    "victorias": int,  # Partidas ganadas.
+                    "empates": int,  # Partidas empatadas.
+                    "derrotas": int  # Partidas perdidas.
+                },
+                ...
+            ]
+
+    Raises:
+        ValueError: Si alguna estrategia no es válida o está repetida.
+    """
+    estrategias = [normalizar_estrategia_torneo(especificacion) for especificacion in estrategias]
+    if len(set(estrategias)) != len(estrategias):
+        raise ValueError("Las estrategias del torneo no pueden repetirse.")
+    enfrentamientos = list(itertools.combinations(range(len(estrategias)), 2))
+    semillas = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(semilla).spawn(len(enfrentamientos))]
+    workers = workers or os.cpu_count() or 1
+
+    logger.info(
+        "Torneo de %s estrategias (%s enfrentamientos de %s partidas) con %s procesos.",
+        len(estrategias), len(enfrentamientos), n_partidas, workers
+    )
+    if db is not None:
+        jugador_repo = JugadorRepository(db)
+        juego_service = JuegoService(PartidaRepository(db), jugador_repo)
+        jugadores = [jugador_repo.get_or_create(f"Estrategia {e}", tipo="maquina") for e in estrategias]
+
+    indices_a = np.array([a for a, _ in enfrentamientos], dtype=np.intp)
+    indices_b = np.array([b for _, b in enfrentamientos], dtype=np.intp)
+    puntuaciones = np.empty((len(enfrentamientos), n_partidas))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        resultados = pool.map(
+            jugar_enfrentamiento,
+            [estrategias[a] for a in indices_a], [estrategias[b] for b in indices_b],
+            [n_partidas] * len(enfrentamientos), semillas
+        )
+        for i, resultado in enumerate(resultados):
+            puntuaciones[i] = puntuaciones_partidas(resultado["jugadas_a"], resultado["jugadas_b"])
+            if db is not None:
+                _guardar_enfrentamiento(juego_service, jugadores[indices_a[i]], jugadores[indices_b[i]], resultado, batch_size)
+
+    elo = calcular_elo(indices_a, indices_b, puntuaciones, len(estrategias))
+    victorias = np.bincount(indices_a, weights=(puntuaciones == 1).sum(axis=1), minlength=len(estrategias)) \
+        + np.bincount(indices_b, weights=(puntuaciones == 0).sum(axis=1), minlength=len(estrategias))
+    empates = np.bincount(indices_a, weights=(puntuaciones == 0.5).sum(axis=1), minlength=len(estrategias)) \
+        + np.bincount(indices_b, weights=(puntuaciones == 0.5).sum(axis=1), minlength=len(estrategias))
+    jugadas = n_partidas * (len(estrategias) - 1)
+    clasificacion_torneo = [
+        {
+            "estrategia": especificacion,
+            "elo": float(elo[i]),
+            "victorias": int(victorias[i]),
+            "empates": int(empates[i]),
+            "derrotas": jugadas - int(victorias[i]) - int(empates[i])
+        }
+        for i, especificacion in enumerate(estrategias)
+    ]
+    clasificacion_torneo.sort(key=lambda fila: -fila["elo"])
+    logger.info("Torneo terminado; gana %s.", clasificacion_torneo[0]["estrategia"] if clasificacion_torneo else None)
+    return clasificacion_torneo
@@ -0,0 +1,113 @@
+"""
+Throughput de los endpoints síncronos (threadpool) frente a los asíncronos (aiosqlite).
+
+Lanza N clientes concurrentes contra la aplicación ASGI en el mismo proceso y
+mide peticiones/s y latencias. La caché de consultas se desactiva salvo que se
+indique --con_cache, para que todas las peticiones lleguen a SQLite.
+
+Uso:
+    python -m benchmarks.bench_async --clientes 500 --peticiones 10
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+from fastapi import FastAPI, Depends
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
+from app.cache import cache_consultas
+from app.database import get_async_db
+from app.main import app as app_async
+from app.repositories import PartidaRepository, JugadorRepository
+from benchmarks.comun import crear_base_temporal, imprimir_tabla, poblar_partidas
+
+RUTAS = ["/get_global_info", "/mano_fuerte", "/estadisticas", "/ranking"]
+
+
+def crear_app_sincrona(sesion_local):
+    # Los mismos endpoints con def y sesiones síncronas, como antes de la migración
+    app = FastAPI()
+
+    def get_db():
+        db = sesion_local()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/get_global_info")
+    def get_global_info(db: Session = Depends(get_db)):
+        return PartidaRepository(db).obtener_info_global()
+
+    @app.get("/mano_fuerte")
+    def mano_fuerte(db: Session = Depends(get_db)):
+        mano, porcentaje = PartidaRepository(db).obtener_mano_fuerte()
+        return {"mano_fuerte": mano, "porcentaje_victorias": porcentaje}
+
+    @app.get("/estadisticas")
+    def estadisticas(db: Session = Depends(get_db)):
+        return PartidaRepository(db).obtener_estadisticas_partidas()
+
+    @app.get("/ranking")
+    def ranking(db: Session = Depends(get_db)):
+        return JugadorRepository(db).obtener_ranking()
+
+    return app
+
+
+async def cargar(app, clientes, peticiones):
+    latencias = []
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as client:
+
+        async def cliente(i):
+            for j in range(peticiones):
+                inicio = time.perf_counter()
+                respuesta = await client.get(RUTAS[(i + j) % len(RUTAS)])
+                respuesta.raise_for_status()
+                latencias.append((time.perf_counter() - inicio) * 1000)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente(i) for i in range(clientes)))
+        duracion = time.perf_counter() - inicio
+    latencias.sort()
+    return {
+        "peticiones_s": len(latencias) / duracion,
+        "p50_ms": latencias[len(latencias) // 2],
+        "p99_ms": latencias[int(len(latencias) * 0.99)],
+        "media_ms": statistics.fmean(latencias),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clientes', type=int, default=500)
+    parser.add_argument('--peticiones', type=int, default=10, help="Peticiones por cliente.")
+    parser.add_argument('--partidas', type=int, default=10000, help="Partidas de la base de datos de prueba.")
+    parser.add_argument('--con_cache', action='store_true', help="Mantiene activa la caché de consultas.")
+    args = parser.parse_args()
+
+    if not args.con_cache:
+        cache_consultas.ttl = 0
+    engine, sesion_local = crear_base_temporal()
+    poblar_partidas(engine, args.partidas)
+    PartidaRepository(sesion_local()).reconstruir_contadores()
+
+    async_engine = create_async_engine(str(engine.url).replace("sqlite://", "sqlite+aiosqlite://", 1))
+    async_session_local = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def get_async_db_bench():
+        async with async_session_local() as session:
+            yield session
+
+    app_async.dependency_overrides[get_async_db] = get_async_db_bench
+
+    filas = []
+    for nombre, app in [("sync (def)", crear_app_sincrona(sesion_local)), ("async (async def)", app_async)]:
+        filas.append({"modo": nombre, "clientes": args.clientes, **asyncio.run(cargar(app, args.clientes, args.peticiones))})
+    imprimir_tabla(filas, ["modo", "clientes", "peticiones_s", "p50_ms", "p99_ms", "media_ms"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Throughput mixto de lecturas y escrituras con el engine por defecto y con el perfil SQLite.
+
+Varios hilos lectores consultan las estadísticas mientras un hilo escritor juega
+partidas con JuegoService (un commit por jugada). La caché de consultas se desactiva.
+
+Uso:
+    python -m benchmarks.bench_concurrencia --lectores 8 --segundos 10
+"""
+import argparse
+import threading
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.cache import cache_consultas
+from app.database import crear_engine, init_db
+from app.repositories import PartidaRepository, JugadorRepository
+from app.schemas import JugadaEnum
+from app.services import JuegoService
+from benchmarks.comun import crear_base_temporal, imprimir_tabla, poblar_partidas
+
+
+def ejecutar(engine, lectores, segundos):
+    sesion_local = sessionmaker(bind=engine)
+    fin = time.monotonic() + segundos
+    resultados = {"lecturas": 0, "escrituras": 0, "bloqueos": 0}
+    lock = threading.Lock()
+
+    def contar(clave):
+        with lock:
+            resultados[clave] += 1
+
+    def lector():
+        db = sesion_local()
+        repo = PartidaRepository(db)
+        while time.monotonic() < fin:
+            try:
+                repo.obtener_estadisticas_partidas()
+                JugadorRepository(db).obtener_ranking()
+                db.rollback()
+                contar("lecturas")
+            except OperationalError:
+                db.rollback()
+                contar("bloqueos")
+        db.close()
+
+    def escritor():
+        db = sesion_local()
+        jugador_repo = JugadorRepository(db)
+        servicio = JuegoService(PartidaRepository(db), jugador_repo)
+        jugador = jugador_repo.get_or_create("Jugador1", "humano")
+        maquina = jugador_repo.get_or_create("Máquina", "maquina")
+        while time.monotonic() < fin:
+            try:
+                partida = servicio.iniciar_partida(jugador, maquina)
+                for _ in range(3):
+                    servicio.registrar_jugada(partida, jugador, JugadaEnum.PIEDRA, JugadaEnum.TIJERA)
+                servicio.finalizar_partida(partida, jugador)
+                contar("escrituras")
+            except OperationalError:
+                db.rollback()
+                contar("bloqueos")
+        db.close()
+
+    hilos = [threading.Thread(target=lector) for _ in range(lectores)] + [threading.Thread(target=escritor)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return {
+        "lecturas_s": resultados["lecturas"] / segundos,
+        "partidas_s": resultados["escrituras"] / segundos,
+        "bloqueos": resultados["bloqueos"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lectores', type=int, default=8)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--partidas', type=int, default=100000, help="Partidas iniciales de la base de datos.")
+    args = parser.parse_args()
+
+    cache_consultas.ttl = 0
+    filas = []
+    for perfil in ["por defecto", "WAL + pragmas"]:
+        base, sesion_local = crear_base_temporal()
+        poblar_partidas(base, args.partidas)
+        PartidaRepository(sesion_local()).reconstruir_contadores()
+        base.dispose()
+        url = str(base.url)
+        engine = create_engine(url) if perfil == "por defecto" else crear_engine(url)
+        init_db(engine)
+        filas.append({"perfil": perfil, "lectores": args.lectores, **ejecutar(engine, args.lectores, args.segundos)})
+        engine.dispose()
+    imprimir_tabla(filas, ["perfil", "lectores", "lecturas_s", "partidas_s", "bloqueos"])
+
+
+if __name__ == "__main__":
+    main()
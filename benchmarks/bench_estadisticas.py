@@ -0,0 +1,52 @@
+"""
+Latencia de los conteos de partidas: tres COUNT(*) frente a una sola pasada.
+
+Los endpoints de estadísticas leen la tabla de contadores; estos conteos desde las
+partidas son los que usa reconstruir_contadores (p. ej. al actualizar una base de
+datos anterior en init_db), cuyo tiempo crece con el número de partidas.
+
+Uso:
+    python -m benchmarks.bench_estadisticas --tamanos 1000000 10000000
+"""
+import argparse
+from sqlalchemy import func
+from app.models import Partida
+from app.repositories import PartidaRepository
+from app.schemas import EstadoPartidaEnum
+from benchmarks.comun import crear_base_temporal, imprimir_tabla, medir, poblar_partidas
+
+
+def conteos_tres_consultas(db):
+    # Implementación anterior: una consulta por conteo
+    return {
+        "total_partidas": db.query(func.count(Partida.id)).scalar(),
+        "partidas_ganadas": db.query(func.count(Partida.id)).filter(Partida.ganador_id.isnot(None)).scalar(),
+        "partidas_abandonadas": db.query(func.count(Partida.id)).filter(Partida.estado == EstadoPartidaEnum.ABANDONADA).scalar(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[1_000_000, 10_000_000], help="Número de partidas de cada base de datos.")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    filas = []
+    for n in args.tamanos:
+        engine, sesion_local = crear_base_temporal()
+        poblar_partidas(engine, n)
+        db = sesion_local()
+        repo = PartidaRepository(db)
+        assert conteos_tres_consultas(db) == repo.obtener_conteos_partidas()
+        for nombre, funcion in [
+            ("tres COUNT(*)", lambda: conteos_tres_consultas(db)),
+            ("una pasada", repo.obtener_conteos_partidas),
+        ]:
+            filas.append({"partidas": n, "consulta": nombre, **medir(funcion, args.repeticiones)})
+        db.close()
+        engine.dispose()
+    imprimir_tabla(filas, ["partidas", "consulta", "p50_ms", "p99_ms", "media_ms"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Decisiones por segundo de cada estrategia de la máquina.
+
+Cada decisión es una llamada a elegir seguida de observar con la jugada del rival.
+El rival repite un ciclo con sesgo (piedra, piedra, papel, tijera), de modo que
+también se muestra la fracción de jugadas que gana cada estrategia.
+
+Uso:
+    python -m benchmarks.bench_estrategias --jugadas 200000
+"""
+import argparse
+import time
+from app.services import ESTRATEGIAS, JUGADAS, TABLA_RESULTADOS, CODIGOS_JUGADAS, crear_estrategia
+from benchmarks.comun import imprimir_tabla
+
+CICLO_RIVAL = [0, 0, 1, 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jugadas', type=int, default=200000)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    rival = [JUGADAS[CICLO_RIVAL[i % len(CICLO_RIVAL)]] for i in range(args.jugadas)]
+    filas = []
+    for nombre in ESTRATEGIAS:
+        estrategia = crear_estrategia(nombre, args.semilla)
+        elegidas = []
+        inicio = time.perf_counter()
+        for jugada_rival in rival:
+            elegidas.append(estrategia.elegir())
+            estrategia.observar(jugada_rival)
+        duracion = time.perf_counter() - inicio
+        ganadas = sum(
+            TABLA_RESULTADOS[CODIGOS_JUGADAS[elegida], CODIGOS_JUGADAS[jugada_rival]] == 1
+            for elegida, jugada_rival in zip(elegidas, rival)
+        )
+        filas.append({
+            "estrategia": nombre,
+            "decisiones_s": args.jugadas / duracion,
+            "us_por_decision": duracion / args.jugadas * 1e6,
+            "fraccion_ganadas": ganadas / args.jugadas,
+        })
+    imprimir_tabla(filas, ["estrategia", "decisiones_s", "us_por_decision", "fraccion_ganadas"])
+
+
+if __name__ == "__main__":
+    main()
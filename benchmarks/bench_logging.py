@@ -0,0 +1,74 @@
+"""
+Coste del logging por jugada simulada y por petición.
+
+Compara el FileHandler síncrono anterior con el pipeline QueueHandler/QueueListener,
+con y sin muestreo de los mensajes por jugada, y con el nivel subido a WARNING.
+Los logs se escriben en un fichero temporal.
+
+Uso:
+    python -m benchmarks.bench_logging --jugadas 200000 --peticiones 2000
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from fastapi.testclient import TestClient
+from app import logger_config
+from app.logger_config import FiltroMuestreo
+from app.main import app
+from app.repositories import PartidaRepository
+from app.services import JuegoService, logger_jugadas
+from benchmarks.comun import imprimir_tabla
+
+FORMATO = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+
+def configurar(modo, ruta):
+    raiz = logging.getLogger()
+    handler = logging.FileHandler(ruta)
+    handler.setFormatter(FORMATO)
+    logger_jugadas.filters.clear()
+    raiz.setLevel(logging.WARNING if modo == "WARNING" else logging.INFO)
+    if modo == "FileHandler síncrono":
+        raiz.handlers = [handler]
+    else:
+        raiz.handlers = [logger_config._queue_handler]
+        logger_config._listener.handlers = (handler,)
+        if modo == "cola + muestreo 1%":
+            logger_jugadas.addFilter(FiltroMuestreo(0.01))
+    return handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jugadas', type=int, default=200000)
+    parser.add_argument('--peticiones', type=int, default=2000)
+    args = parser.parse_args()
+
+    ruta = os.path.join(tempfile.mkdtemp(prefix="ppt_bench_"), "app.log")
+    servicio = JuegoService(None, None)
+    # Las peticiones no llegan a la base de datos: se mide el coste fijo de la petición
+    PartidaRepository.obtener_estadisticas_partidas = lambda self: {"total_partidas": 0}
+
+    filas = []
+    with TestClient(app) as client:
+        for modo in ["FileHandler síncrono", "QueueHandler", "cola + muestreo 1%", "WARNING"]:
+            handler = configurar(modo, ruta)
+            inicio = time.perf_counter()
+            for _ in range(args.jugadas):
+                servicio.determinar_resultado('piedra', 'tijera')
+            por_jugada = (time.perf_counter() - inicio) / args.jugadas * 1e6
+            inicio = time.perf_counter()
+            for _ in range(args.peticiones):
+                client.get("/estadisticas")
+            por_peticion = (time.perf_counter() - inicio) / args.peticiones * 1e6
+            logger_config.vaciar_logs()
+            handler.close()
+            filas.append({"modo": modo, "us_por_jugada": por_jugada, "us_por_peticion": por_peticion})
+    imprimir_tabla(filas, ["modo", "us_por_jugada", "us_por_peticion"])
+    os.remove(ruta)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Coste de las métricas de /metrics en las rutas calientes.
+
+Ejecuta las mismas mediciones en dos procesos, con METRICAS=1 y METRICAS=0 (la
+instrumentación de los repositorios se decide al importar la aplicación):
+una consulta de repositorio servida por la caché, un save con su commit y las
+peticiones a /cache/metricas (sin base de datos) y /get_global_info.
+La aplicación usa una base de datos temporal con --partidas partidas. Los dos
+procesos se alternan --rondas veces y se toma el mínimo de cada medición, ya que
+el ruido entre ejecuciones es mayor que el coste de las métricas.
+
+Uso:
+    python -m benchmarks.bench_metricas --llamadas 100000 --peticiones 2000
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.comun import imprimir_tabla
+
+COLUMNAS = ["us_consulta_cacheada", "us_save_commit", "us_peticion_sin_bd", "us_peticion_cacheada"]
+
+
+def _por_llamada(funcion, n):
+    inicio = time.perf_counter()
+    for _ in range(n):
+        funcion()
+    return (time.perf_counter() - inicio) / n * 1e6
+
+
+def medir_proceso(llamadas, peticiones):
+    # Se importa aquí para que METRICAS y DATABASE_URL del proceso hijo se apliquen
+    from fastapi.testclient import TestClient
+    from app.database import SessionLocal, engine, init_db
+    from app.main import app
+    from app.models import Jugada
+    from app.repositories import PartidaRepository
+    from app.schemas import JugadaEnum, ResultadoJugadaEnum
+    from benchmarks.comun import poblar_partidas
+
+    init_db(engine)
+    poblar_partidas(engine, int(os.environ["BENCH_PARTIDAS"]))
+    resultado = {}
+    with SessionLocal() as db:
+        repo = PartidaRepository(db)
+        resultado["us_consulta_cacheada"] = _por_llamada(repo.obtener_info_global, llamadas)
+        resultado["us_save_commit"] = _por_llamada(
+            lambda: repo.save(Jugada(partida_id=1, jugador_id=1, tipo=JugadaEnum.PIEDRA, resultado=ResultadoJugadaEnum.EMPATE)),
+            max(1, llamadas // 100)
+        )
+    with TestClient(app) as client:
+        client.get("/get_global_info")
+        resultado["us_peticion_sin_bd"] = _por_llamada(lambda: client.get("/cache/metricas"), peticiones)
+        resultado["us_peticion_cacheada"] = _por_llamada(lambda: client.get("/get_global_info"), peticiones)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--llamadas', type=int, default=100000)
+    parser.add_argument('--peticiones', type=int, default=2000)
+    parser.add_argument('--partidas', type=int, default=10000)
+    parser.add_argument('--rondas', type=int, default=3)
+    parser.add_argument('--hijo', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        print(json.dumps(medir_proceso(args.llamadas, args.peticiones)))
+        return
+
+    mediciones = {"1": [], "0": []}
+    for activas in ["1", "0"] * args.rondas:
+        directorio = tempfile.mkdtemp(prefix="ppt_bench_")
+        ruta = os.path.join(directorio, "bench.db")
+        entorno = {**os.environ, "METRICAS": activas, "BENCH_PARTIDAS": str(args.partidas), "DATABASE_URL": f"sqlite:///{ruta}"}
+        salida = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_metricas", "--hijo",
+             "--llamadas", str(args.llamadas), "--peticiones", str(args.peticiones)],
+            env=entorno, capture_output=True, text=True, check=True
+        )
+        shutil.rmtree(directorio, ignore_errors=True)
+        mediciones[activas].append(json.loads(salida.stdout.splitlines()[-1]))
+    filas = [
+        {"metricas": nombre, **{c: min(m[c] for m in mediciones[activas]) for c in COLUMNAS}}
+        for nombre, activas in [("activas", "1"), ("desactivadas", "0")]
+    ]
+    filas.append({"metricas": "sobrecoste", **{c: filas[0][c] - filas[1][c] for c in COLUMNAS}})
+    imprimir_tabla(filas, ["metricas"] + COLUMNAS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Generador de carga para el juego en tiempo real (/ws/partida).
+
+Abre N conexiones WebSocket concurrentes contra un servidor ya arrancado; cada
+cliente juega M partidas completas con jugadas al azar. Mide las partidas por
+segundo y la latencia de ida y vuelta de cada jugada.
+
+Uso:
+    uvicorn app.main:app --port 8000
+    python -m benchmarks.carga_websocket --url ws://127.0.0.1:8000/ws/partida --clientes 2000 --partidas 5
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from urllib.parse import urlencode
+import websockets
+from benchmarks.comun import imprimir_tabla
+
+JUGADAS = ["piedra", "papel", "tijera"]
+
+
+async def cliente(url, i, partidas, latencias, rng):
+    async with websockets.connect(f"{url}?{urlencode({'nombre': f'Carga {i}', 'estrategia': 'markov'})}", open_timeout=60) as conexion:
+        terminadas = 0
+        while terminadas < partidas:
+            inicio = time.perf_counter()
+            await conexion.send(json.dumps({"jugada": rng.choice(JUGADAS)}))
+            ronda = json.loads(await conexion.recv())
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            if ronda["estado"] == "finalizada":
+                terminadas += 1
+
+
+async def cargar(url, clientes, partidas, semilla):
+    latencias = []
+    rng = random.Random(semilla)
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(
+        *(cliente(url, i, partidas, latencias, random.Random(rng.random())) for i in range(clientes)),
+        return_exceptions=True
+    )
+    duracion = time.perf_counter() - inicio
+    errores = [r for r in resultados if isinstance(r, Exception)]
+    latencias.sort()
+    return {
+        "clientes": clientes,
+        "errores": len(errores),
+        "partidas_s": (clientes - len(errores)) * partidas / duracion,
+        "jugadas_s": len(latencias) / duracion,
+        "p50_ms": latencias[len(latencias) // 2] if latencias else 0,
+        "p99_ms": latencias[int(len(latencias) * 0.99)] if latencias else 0,
+        "media_ms": statistics.fmean(latencias) if latencias else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default="ws://127.0.0.1:8000/ws/partida")
+    parser.add_argument('--clientes', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--partidas', type=int, default=5, help="Partidas por cliente.")
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    filas = [asyncio.run(cargar(args.url, clientes, args.partidas, args.semilla)) for clientes in args.clientes]
+    imprimir_tabla(filas, ["clientes", "errores", "partidas_s", "jugadas_s", "p50_ms", "p99_ms", "media_ms"])
+
+
+if __name__ == "__main__":
+    main()
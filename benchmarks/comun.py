@@ -0,0 +1,131 @@
+import atexit
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from app.database import init_db
+from app.models import valor_sql  # también registra las tablas en Base.metadata
+from app.repositories import PartidaRepository
+from app.schemas import EstadoPartidaEnum, JugadaEnum, ResultadoJugadaEnum
+
+
+def tamano(texto):
+    """Convierte un tamaño como 10000, 10k, 1M o 10M en un entero (tipo de argparse)."""
+    multiplicadores = {"k": 1_000, "m": 1_000_000}
+    texto = texto.strip().lower().replace("_", "")
+    if texto and texto[-1] in multiplicadores:
+        return int(float(texto[:-1]) * multiplicadores[texto[-1]])
+    return int(texto)
+
+
+def medir(funcion, repeticiones=5, calentamiento=1, operaciones=1):
+    """
+    Mide la latencia de una función.
+
+    Args:
+        funcion (callable): La función a medir, sin argumentos.
+        repeticiones (int): Número de ejecuciones medidas.
+        calentamiento (int): Ejecuciones previas que no se miden.
+        operaciones (int): Operaciones que hace cada ejecución; las latencias se
+            dan por operación, para medir en lotes las operaciones muy rápidas.
+
+    Returns:
+        dict[str, float]: Latencias en milisegundos (media, p50, p90, p99, min) y ops/s.
+    """
+    for _ in range(calentamiento):
+        funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000 / operaciones)
+    tiempos.sort()
+    return {
+        "media_ms": statistics.fmean(tiempos),
+        "p50_ms": tiempos[len(tiempos) // 2],
+        "p90_ms": tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.9))],
+        "p99_ms": tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.99))],
+        "min_ms": tiempos[0],
+        "ops_s": 1000 / statistics.fmean(tiempos) if statistics.fmean(tiempos) > 0 else float("inf"),
+    }
+
+
+def crear_base_temporal(nombre="bench.db"):
+    """
+    Crea una base de datos SQLite vacía en un directorio temporal.
+
+    Returns:
+        tuple[Engine, sessionmaker]: El engine y su fábrica de sesiones.
+    """
+    directorio = tempfile.mkdtemp(prefix="ppt_bench_")
+    atexit.register(shutil.rmtree, directorio, ignore_errors=True)
+    ruta = os.path.join(directorio, nombre)
+    engine = create_engine(f"sqlite:///{ruta}")
+    init_db(engine)
+    return engine, sessionmaker(bind=engine)
+
+
+def poblar_partidas(engine, n_partidas, semilla=0):
+    """
+    Inserta n partidas finalizadas con sus 3 jugadas directamente en SQLite.
+
+    Los datos son deterministas: el 10% de las partidas están abandonadas y el
+    resto las gana uno de dos jugadores; el ganador y las jugadas se obtienen de
+    un hash del id de la partida desplazado por la semilla.
+
+    Args:
+        engine (Engine): El engine de la base de datos a poblar.
+        n_partidas (int): Número de partidas a insertar.
+        semilla (int): Semilla de los datos; la misma semilla genera la misma base de datos.
+    """
+    # Los valores de los enums dependen del esquema configurado (texto o compacto)
+    e, j, r = EstadoPartidaEnum, JugadaEnum, ResultadoJugadaEnum
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO jugadores (nombre, tipo, puntos) VALUES ('Máquina 1', 'MAQUINA', 0), ('Máquina 2', 'MAQUINA', 0)"))
+        conn.execute(text(
+            "WITH RECURSIVE seq(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM seq WHERE x < :n) "
+            "INSERT INTO partidas (estado, ganador_id) "
+            f"SELECT CASE WHEN x % 10 = 0 THEN {valor_sql(e.ABANDONADA)} ELSE {valor_sql(e.FINALIZADA)} END, "
+            "CASE WHEN x % 10 = 0 THEN NULL ELSE 1 + (x * 7919 + :semilla) % 2 END FROM seq"
+        ), {"n": n_partidas, "semilla": semilla})
+        conn.execute(text(
+            "INSERT INTO jugadas (partida_id, jugador_id, tipo, resultado) "
+            "SELECT p.id, 1, "
+            f"CASE (p.id * 31 + r.n + :semilla) % 3 WHEN 0 THEN {valor_sql(j.PIEDRA)} WHEN 1 THEN {valor_sql(j.PAPEL)} ELSE {valor_sql(j.TIJERA)} END, "
+            f"CASE (p.id * 17 + r.n + :semilla * 7) % 3 WHEN 0 THEN {valor_sql(r.GANADA)} WHEN 1 THEN {valor_sql(r.PERDIDA)} ELSE {valor_sql(r.EMPATE)} END "
+            "FROM partidas p, (SELECT 0 AS n UNION ALL SELECT 1 UNION ALL SELECT 2) r"
+        ), {"semilla": semilla})
+        conn.execute(text(
+            "UPDATE jugadores SET puntos = (SELECT COUNT(*) FROM partidas WHERE ganador_id = jugadores.id)"
+        ))
+
+
+def generar_datos(engine, n_partidas, semilla=0):
+    """
+    Puebla una base de datos vacía con n partidas (ver poblar_partidas) y reconstruye
+    sus contadores de estadísticas, de modo que todas las consultas y endpoints
+    devuelven los datos generados.
+
+    Args:
+        engine (Engine): El engine de la base de datos, ya inicializada con init_db.
+        n_partidas (int): Número de partidas a insertar.
+        semilla (int): Semilla de los datos.
+    """
+    poblar_partidas(engine, n_partidas, semilla)
+    with sessionmaker(bind=engine)() as db:
+        PartidaRepository(db).reconstruir_contadores()
+
+
+def imprimir_tabla(filas, columnas):
+    """Imprime una lista de diccionarios como una tabla de texto."""
+    anchos = [max(len(c), *(len(_formatear(f[c])) for f in filas)) for c in columnas]
+    print("  ".join(c.ljust(a) for c, a in zip(columnas, anchos)))
+    for fila in filas:
+        print("  ".join(_formatear(fila[c]).ljust(a) for c, a in zip(columnas, anchos)))
+
+
+def _formatear(valor):
+    return f"{valor:.3f}" if isinstance(valor, float) else str(valor)
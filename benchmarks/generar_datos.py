@@ -0,0 +1,40 @@
+"""
+Genera una base de datos sintética con un número fijo de partidas y una semilla.
+
+Cada partida tiene 3 jugadas, así que 10k, 1M y 10M partidas son 30k, 3M y 30M
+jugadas. La misma semilla genera siempre los mismos datos. La base de datos no
+debe tener partidas; por defecto se usa la de la aplicación (data/game.db).
+
+Uso:
+    python -m benchmarks.generar_datos --partidas 1M --semilla 42
+    python -m benchmarks.generar_datos --partidas 10M --base_datos /tmp/bench.db
+"""
+import argparse
+import time
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from app.database import init_db
+from app.models import Partida
+from benchmarks.comun import generar_datos, tamano
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--partidas', type=tamano, default=10_000, help="Número de partidas (admite 10k, 1M, 10M).")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--base_datos', default="data/game.db")
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{args.base_datos}")
+    init_db(engine)
+    with sessionmaker(bind=engine)() as db:
+        if db.query(func.count(Partida.id)).scalar():
+            parser.error(f"La base de datos {args.base_datos} ya tiene partidas.")
+    inicio = time.perf_counter()
+    generar_datos(engine, args.partidas, args.semilla)
+    print(f"{args.partidas} partidas generadas en {args.base_datos} en {time.perf_counter() - inicio:.1f} s.")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
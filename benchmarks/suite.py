@@ -0,0 +1,205 @@
+"""
+Suite de benchmarks de servicios, repositorios, endpoints y simulación.
+
+Para cada tamaño genera una base de datos temporal con generar_datos (o usa la
+indicada con --base_datos) y mide, con la caché de consultas desactivada:
+
+- servicio: JuegoService.determinar_resultado y SimuladorVectorizado.simular_bloque.
+- repositorio: las consultas de estadísticas y ranking y PartidaRepository.save.
+- ruta: GET /get_global_info, /estadisticas, /mano_fuerte, /mano_debil y /ranking.
+
+Informa ops/s y percentiles por operación. Con --guardar escribe los resultados en
+JSON; con --comparar los compara con una línea base guardada y termina con error
+si la p50 de algún caso empeora más que --umbral.
+
+Uso:
+    python -m benchmarks.suite --tamanos 10k 1M --guardar resultados.json
+    python -m benchmarks.suite --comparar benchmarks/linea_base.json --umbral 0.25
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from app.cache import cache_consultas
+from app.database import get_async_db
+from app.logger_config import vaciar_logs
+from app.main import app
+from app.models import Jugada
+from app.repositories import PartidaRepository, JugadorRepository
+from app.schemas import JugadaEnum, ResultadoJugadaEnum
+from app.services import JuegoService, SimuladorVectorizado
+from benchmarks.comun import crear_base_temporal, generar_datos, imprimir_tabla, medir, tamano
+
+RUTAS = ["/get_global_info", "/estadisticas", "/mano_fuerte", "/mano_debil", "/ranking"]
+JUGADAS_LOTE = 10_000
+PARTIDAS_SIMULADAS = 1_000_000
+
+
+def casos_servicio(semilla):
+    rng = random.Random(semilla)
+    jugadas = [(rng.choice(list(JugadaEnum)), rng.choice(list(JugadaEnum))) for _ in range(JUGADAS_LOTE)]
+    servicio = JuegoService(None, None)
+    simulador = SimuladorVectorizado(semilla=semilla)
+
+    def determinar_resultado():
+        for jugada_jugador, jugada_maquina in jugadas:
+            servicio.determinar_resultado(jugada_jugador, jugada_maquina)
+
+    return [
+        ("servicio", "determinar_resultado", determinar_resultado, JUGADAS_LOTE),
+        ("servicio", "simular_bloque", lambda: simulador.simular_bloque(PARTIDAS_SIMULADAS), PARTIDAS_SIMULADAS),
+    ]
+
+
+def casos_repositorio(db):
+    partida_repo, jugador_repo = PartidaRepository(db), JugadorRepository(db)
+    return [
+        ("repositorio", "obtener_info_global", partida_repo.obtener_info_global, 1),
+        ("repositorio", "obtener_estadisticas_partidas", partida_repo.obtener_estadisticas_partidas, 1),
+        ("repositorio", "obtener_mano_fuerte", partida_repo.obtener_mano_fuerte, 1),
+        ("repositorio", "obtener_mano_debil", partida_repo.obtener_mano_debil, 1),
+        ("repositorio", "obtener_ranking", jugador_repo.obtener_ranking, 1),
+    ]
+
+
+def caso_save(db):
+    # Se mide al final, ya que añade jugadas a la base de datos
+    partida_repo = PartidaRepository(db)
+    jugada = lambda: Jugada(partida_id=1, jugador_id=1, tipo=JugadaEnum.PIEDRA, resultado=ResultadoJugadaEnum.EMPATE)
+    return ("repositorio", "save", lambda: partida_repo.save(jugada()), 1)
+
+
+def casos_rutas(client):
+    def peticion(ruta):
+        def get():
+            client.get(ruta).raise_for_status()
+        return get
+    return [("ruta", f"GET {ruta}", peticion(ruta), 1) for ruta in RUTAS]
+
+
+def ejecutar(engine, sesion_local, client, partidas, args):
+    """
+    Ejecuta todos los casos sobre una base de datos ya generada.
+
+    Los casos se ejecutan args.rondas veces, uno tras otro, y de cada caso se queda
+    la ronda con menor p50: las interrupciones de otros procesos sólo hacen más
+    lenta una medición, así que la mejor ronda es la más reproducible.
+
+    Returns:
+        list[dict]: Una fila por caso, con grupo, caso, partidas, ops/s y latencias por operación en µs.
+    """
+    async_engine = create_async_engine(str(engine.url).replace("sqlite://", "sqlite+aiosqlite://", 1))
+    async_session_local = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def get_async_db_bench():
+        async with async_session_local() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = get_async_db_bench
+    mejores = {}
+    try:
+        with sesion_local() as db:
+            JugadorRepository(db).reconstruir_ranking()
+            casos = casos_servicio(args.semilla) + casos_repositorio(db) + casos_rutas(client) + [caso_save(db)]
+            for _ in range(args.rondas):
+                for grupo, nombre, funcion, operaciones in casos:
+                    # Los logs encolados por el caso anterior se escriben antes de medir el siguiente
+                    vaciar_logs()
+                    metricas = medir(funcion, args.repeticiones, calentamiento=2, operaciones=operaciones)
+                    fila = {
+                        "grupo": grupo, "caso": nombre, "partidas": partidas, "ops_s": metricas.pop("ops_s"),
+                        # En microsegundos, ya que las operaciones del servicio duran menos de un milisegundo
+                        **{nombre_ms.replace("_ms", "_us"): valor * 1000 for nombre_ms, valor in metricas.items()}
+                    }
+                    if nombre not in mejores or fila["p50_us"] < mejores[nombre]["p50_us"]:
+                        mejores[nombre] = fila
+    finally:
+        app.dependency_overrides.clear()
+    return list(mejores.values())
+
+
+def clave(fila):
+    return f"{fila['caso']}@{fila['partidas']}"
+
+
+def comparar(filas, linea_base, umbral):
+    """
+    Compara las medianas por operación con las de una línea base.
+
+    Args:
+        filas (list[dict]): Los resultados de esta ejecución.
+        linea_base (dict): Los resultados guardados, por clave caso@partidas.
+        umbral (float): Empeoramiento relativo de la p50 a partir del que hay regresión.
+
+    Returns:
+        list[dict]: Una fila por caso con la variación y su estado ('ok', 'mejora',
+            'REGRESIÓN' o 'sin base').
+    """
+    comparacion = []
+    for fila in filas:
+        base = linea_base.get(clave(fila))
+        if base is None:
+            comparacion.append({**fila, "base_p50_us": float("nan"), "variacion_pct": float("nan"), "estado": "sin base"})
+            continue
+        variacion = fila["p50_us"] / base["p50_us"] - 1
+        estado = "REGRESIÓN" if variacion > umbral else "mejora" if variacion < -umbral else "ok"
+        comparacion.append({**fila, "base_p50_us": base["p50_us"], "variacion_pct": variacion * 100, "estado": estado})
+    return comparacion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', type=tamano, nargs='+', default=[10_000], help="Partidas de cada base de datos (10k, 1M, 10M).")
+    parser.add_argument('--base_datos', help="Base de datos ya generada (ver benchmarks.generar_datos) en lugar de --tamanos; el caso save le añade jugadas.")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--repeticiones', type=int, default=30, help="Mediciones de cada caso en cada ronda.")
+    parser.add_argument('--rondas', type=int, default=3)
+    parser.add_argument('--guardar', help="Fichero JSON en el que guardar los resultados.")
+    parser.add_argument('--comparar', help="Fichero JSON de la línea base con el que comparar.")
+    parser.add_argument('--umbral', type=float, default=0.25, help="Empeoramiento máximo de la p50 (0.25 = 25%%).")
+    args = parser.parse_args()
+
+    # Sin caché, cada consulta y petición llega a SQLite
+    cache_consultas.ttl = 0
+    filas = []
+    with TestClient(app) as client:
+        if args.base_datos:
+            engine = create_engine(f"sqlite:///{args.base_datos}")
+            sesion_local = sessionmaker(bind=engine)
+            with sesion_local() as db:
+                partidas = PartidaRepository(db).obtener_conteos_partidas()["total_partidas"]
+            filas += ejecutar(engine, sesion_local, client, partidas, args)
+            engine.dispose()
+        else:
+            for partidas in args.tamanos:
+                engine, sesion_local = crear_base_temporal()
+                generar_datos(engine, partidas, args.semilla)
+                filas += ejecutar(engine, sesion_local, client, partidas, args)
+                engine.dispose()
+
+    columnas = ["grupo", "caso", "partidas", "ops_s", "p50_us", "p90_us", "p99_us"]
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as fichero:
+            json.dump({
+                "semilla": args.semilla, "repeticiones": args.repeticiones, "rondas": args.rondas, "python": platform.python_version(),
+                "resultados": {clave(fila): fila for fila in filas}
+            }, fichero, indent=2, ensure_ascii=False)
+    if not args.comparar:
+        imprimir_tabla(filas, columnas)
+        return
+    with open(args.comparar, encoding="utf-8") as fichero:
+        comparacion = comparar(filas, json.load(fichero)["resultados"], args.umbral)
+    imprimir_tabla(comparacion, columnas + ["base_p50_us", "variacion_pct", "estado"])
+    regresiones = [clave(fila) for fila in comparacion if fila["estado"] == "REGRESIÓN"]
+    if regresiones:
+        print(f"Regresiones de más del {args.umbral:.0%}: {', '.join(regresiones)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
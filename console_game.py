@@ -1,10 +1,17 @@
-import random
 import sys
+import json
+import time
 import argparse
 from app.models import JugadaEnum
-from app.database import SessionLocal, init_db
-from app.services import JuegoService
+from app.database import SessionLocal, engine, init_db
+from app.services import JuegoService, SimuladorVectorizado, ESTRATEGIAS, crear_estrategia
 from app.repositories import PartidaRepository, JugadorRepository
+from app.simulacion import simular_partidas_en_lotes, simular_en_paralelo, simular_a_registro
+from app.registro_partidas import leer_registro, estadisticas_registro, importar_registro
+from app.analitica import analizar, bloques_bd, bloques_fichero
+from app.torneo import ESTRATEGIAS_TORNEO, jugar_torneo
+from app.escritura_diferida import EscritorDiferido, DURABILIDAD_PARTIDA, DURABILIDAD_DIFERIDA
+from app.migracion_esquema import ESQUEMA_COMPACTO, ESQUEMA_TEXTO, migrar_esquema
 
 
 # Opciones de jugadas
@@ -13,13 +20,14 @@ opciones = {
     'papel': JugadaEnum.PAPEL,
     'tijera': JugadaEnum.TIJERA
 }
+lista_opciones = list(opciones.values())
 
 # Función principal para el juego humano vs máquina
-def jugar_partida_humano_vs_maquina():
+def jugar_partida_humano_vs_maquina(estrategia='aleatoria', escritor=None):
     db = SessionLocal()
     jugador_repo = JugadorRepository(db)
     partida_repo = PartidaRepository(db)
-    juego_service = JuegoService(partida_repo, jugador_repo)
+    juego_service = JuegoService(partida_repo, jugador_repo, escritor)
 
     try:
         print("¡Iniciando partida de Piedra 🪨, Papel 📜 o Tijera ✂️!")
@@ -28,6 +36,7 @@ def jugar_partida_humano_vs_maquina():
         jugador = jugador_repo.get_or_create(nombreJugador, tipo="humano")
         maquina = jugador_repo.get_or_create("Máquina", tipo="maquina")
         partida = juego_service.iniciar_partida(jugador, maquina)
+        estrategia_maquina = crear_estrategia(estrategia)
 
         
         jugadas_ganadas_humano = 0
@@ -41,7 +50,8 @@ def jugar_partida_humano_vs_maquina():
                     print("Entrada no válida. Intenta de nuevo.")
                     continue
 
-                jugada_maquina = random.choice(list(opciones.values()))
+                jugada_maquina = estrategia_maquina.elegir()
+                estrategia_maquina.observar(opciones[jugada_humano])
                 print(f"La máquina eligió: {jugada_maquina}")
 
                 resultado = juego_service.registrar_jugada(partida, jugador, opciones[jugada_humano], jugada_maquina)
@@ -71,15 +81,18 @@ def jugar_partida_humano_vs_maquina():
         db.close()
 
 # Función para el modo máquina vs máquina
-def jugar_partida_maquina_vs_maquina(n_partidas):
+def jugar_partida_maquina_vs_maquina(n_partidas, estrategia='aleatoria', escritor=None):
     db = SessionLocal()
     jugador_repo = JugadorRepository(db)
     partida_repo = PartidaRepository(db)
-    juego_service = JuegoService(partida_repo, jugador_repo)
+    juego_service = JuegoService(partida_repo, jugador_repo, escritor)
 
     try:
         maquina_1 = jugador_repo.get_or_create("Máquina 1", tipo="maquina")
         maquina_2 = jugador_repo.get_or_create("Máquina 2", tipo="maquina")
+        # Cada máquina aprende de las jugadas de la otra a lo largo de todas las partidas
+        estrategia_1 = crear_estrategia(estrategia)
+        estrategia_2 = crear_estrategia(estrategia)
 
         for partida_num in range(n_partidas):
             print(f"\nIniciando partida {partida_num + 1} de {n_partidas} entre Máquina 1 y Máquina 2...")
@@ -90,8 +103,10 @@ def jugar_partida_maquina_vs_maquina(n_partidas):
             total_jugadas = 0
 
             while total_jugadas in range(3):
-                jugada_maquina_1 = random.choice(list(opciones.values()))
-                jugada_maquina_2 = random.choice(list(opciones.values()))
+                jugada_maquina_1 = estrategia_1.elegir()
+                jugada_maquina_2 = estrategia_2.elegir()
+                estrategia_1.observar(jugada_maquina_2)
+                estrategia_2.observar(jugada_maquina_1)
                 print(f"Máquina 1 eligió: {jugada_maquina_1}, Máquina 2 eligió: {jugada_maquina_2}")
 
                 resultado = juego_service.registrar_jugada(partida, maquina_1, jugada_maquina_1, jugada_maquina_2)
@@ -117,17 +132,181 @@ def jugar_partida_maquina_vs_maquina(n_partidas):
     finally:
         db.close()
 
+# Función para el modo máquina vs máquina en lotes
+def jugar_partidas_maquina_lote(n_partidas, batch_size):
+    db = SessionLocal()
+
+    try:
+        inicio = time.perf_counter()
+        simular_partidas_en_lotes(
+            db, n_partidas, batch_size,
+            progreso=lambda guardadas: print(f"{guardadas}/{n_partidas} partidas guardadas.")
+        )
+        duracion = time.perf_counter() - inicio
+
+        print(f"{n_partidas} partidas en {duracion:.2f} s ({n_partidas / duracion:.0f} partidas/s).")
+
+    finally:
+        db.close()
+
+# Función para el modo máquina vs máquina en un registro binario, sin base de datos
+def jugar_partidas_maquina_registro(n_partidas, batch_size, ruta):
+    inicio = time.perf_counter()
+    simular_a_registro(ruta, n_partidas, batch_size)
+    duracion = time.perf_counter() - inicio
+
+    print(f"{n_partidas} partidas escritas en {ruta} en {duracion:.2f} s ({n_partidas / duracion:.0f} partidas/s).")
+
+# Función para mostrar las estadísticas de un registro binario
+def mostrar_estadisticas_registro(ruta):
+    inicio = time.perf_counter()
+    estadisticas = estadisticas_registro(leer_registro(ruta))
+    duracion = time.perf_counter() - inicio
+
+    print(f"Partidas: {estadisticas['total_partidas']}.")
+    for jugador_id, puntos in sorted(estadisticas["puntos"].items()):
+        print(f"Jugador {jugador_id}: {puntos} partidas ganadas.")
+    for jugada, fila in zip(lista_opciones, estadisticas["jugadas_por_resultado"]):
+        print(f"{jugada.value}: {fila[1]} ganadas, {fila[2]} perdidas, {fila[0]} empates.")
+    print(f"Mano fuerte: {estadisticas['mano_fuerte'][0].value} ({estadisticas['mano_fuerte'][1]:.2f}%).")
+    print(f"Mano débil: {estadisticas['mano_debil'][0].value} ({estadisticas['mano_debil'][1]:.2f}%).")
+    print(f"Calculadas en {duracion:.2f} s.")
+
+# Función para importar un registro binario en la base de datos
+def importar_registro_partidas(ruta, batch_size):
+    db = SessionLocal()
+
+    try:
+        inicio = time.perf_counter()
+        importadas = importar_registro(db, ruta, batch_size)
+        duracion = time.perf_counter() - inicio
+
+        print(f"{importadas} partidas importadas en {duracion:.2f} s.")
+
+    finally:
+        db.close()
+
+# Función para analizar las jugadas guardadas o las de un fichero
+def analizar_jugadas(ruta=None):
+    db = None if ruta else SessionLocal()
+
+    try:
+        inicio = time.perf_counter()
+        analisis = analizar(bloques_fichero(ruta) if ruta else bloques_bd(db))
+        duracion = time.perf_counter() - inicio
+
+        print(json.dumps(analisis, ensure_ascii=False, indent=2))
+        print(f"{analisis['jugadas']} jugadas analizadas en {duracion:.2f} s.")
+
+    finally:
+        if db is not None:
+            db.close()
+
+# Función para el modo máquina vs máquina en varios procesos
+def jugar_partidas_maquina_paralelo(n_partidas, batch_size, workers):
+    inicio = time.perf_counter()
+    fusionadas = simular_en_paralelo(engine, n_partidas, batch_size, workers)
+    duracion = time.perf_counter() - inicio
+
+    print(f"{fusionadas} partidas en {duracion:.2f} s con {workers} procesos ({fusionadas / duracion:.0f} partidas/s).")
+
+# Función para simular partidas sin persistirlas (Monte Carlo)
+def simular_partidas(n_partidas):
+    inicio = time.perf_counter()
+    resumen = SimuladorVectorizado().simular(n_partidas)
+    duracion = time.perf_counter() - inicio
+
+    print(f"Máquina 1 ganó {resumen['victorias_jugador1']} partidas, Máquina 2 ganó {resumen['victorias_jugador2']}.")
+    for jugada, fila in zip(lista_opciones, resumen["jugadas_por_resultado"]):
+        print(f"{jugada.value}: {fila[1]} ganadas, {fila[2]} perdidas, {fila[0]} empates.")
+    print(f"{n_partidas * 3} jugadas en {duracion:.2f} s ({n_partidas * 3 / duracion:.0f} jugadas/s).")
+
+# Función para el torneo de todos contra todos entre estrategias
+def jugar_torneo_estrategias(estrategias, n_partidas, workers, guardar):
+    db = SessionLocal() if guardar else None
+
+    try:
+        inicio = time.perf_counter()
+        clasificacion_torneo = jugar_torneo(estrategias, n_partidas, workers=workers, db=db)
+        duracion = time.perf_counter() - inicio
+
+        for posicion, fila in enumerate(clasificacion_torneo, start=1):
+            print(f"{posicion}. {fila['estrategia']}: Elo {fila['elo']:.0f} ({fila['victorias']} ganadas, {fila['empates']} empatadas, {fila['derrotas']} perdidas)")
+        total = n_partidas * len(estrategias) * (len(estrategias) - 1) // 2
+        print(f"{total} partidas en {duracion:.2f} s ({total / duracion:.0f} partidas/s).")
+
+    finally:
+        if db is not None:
+            db.close()
+
+# Función para recalcular los contadores de estadísticas
+def reconstruir_estadisticas():
+    db = SessionLocal()
+
+    try:
+        contadores = PartidaRepository(db).reconstruir_contadores()
+        for clave, valor in sorted(contadores.items()):
+            print(f"{clave}: {valor}")
+
+    finally:
+        db.close()
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Juego de Piedra, Papel o Tijera.")
-    parser.add_argument('--modo', choices=['humano', 'maquina'], default='humano', help="Elige el modo de juego: 'humano' o 'maquina'.")
-    parser.add_argument('--n_partidas', type=int, default=1, help="Número de partidas para el modo 'maquina'.")
+    parser.add_argument('--modo', choices=['humano', 'maquina', 'simulacion', 'torneo'], default='humano', help="Elige el modo de juego: 'humano', 'maquina', 'simulacion' (sin guardar las partidas) o 'torneo' (todos contra todos entre estrategias).")
+    parser.add_argument('--n_partidas', type=int, default=1, help="Número de partidas para los modos 'maquina' y 'simulacion', y de cada enfrentamiento en el modo 'torneo'.")
+    parser.add_argument('--batch_size', '--batch-size', type=int, default=None, help="Simula el modo 'maquina' en memoria y guarda las partidas en lotes de este tamaño.")
+    parser.add_argument('--reconstruir_estadisticas', action='store_true', help="Recalcula la tabla de contadores estadisticas_agregadas a partir de las partidas y jugadas guardadas.")
+    parser.add_argument('--workers', type=int, default=None, help="Número de procesos para el modo 'maquina' en lotes (cada uno escribe en su propio shard) y para el modo 'torneo' (por defecto, uno por núcleo).")
+    parser.add_argument('--estrategia', choices=list(ESTRATEGIAS), default='aleatoria', help="Estrategia de la máquina en los modos 'humano' y 'maquina' (sin lotes): 'aleatoria', 'frecuencias', 'markov' o 'mixta'.")
+    parser.add_argument('--estrategias', nargs='+', default=ESTRATEGIAS_TORNEO, help="Estrategias del modo 'torneo'; admite 'markov:<orden>'.")
+    parser.add_argument('--guardar', action='store_true', help="En el modo 'torneo', guarda las partidas en la base de datos.")
+    parser.add_argument('--escritura_diferida', action='store_true', help="En los modos 'humano' y 'maquina' (sin lotes), guarda cada partida al terminar, en lotes desde un hilo en segundo plano, en lugar de una escritura por jugada.")
+    parser.add_argument('--durabilidad', choices=[DURABILIDAD_PARTIDA, DURABILIDAD_DIFERIDA], default=DURABILIDAD_PARTIDA, help="Con escritura diferida: 'partida' espera a que cada partida se confirme al terminar; 'diferida' sigue jugando y las guarda al salir.")
+    parser.add_argument('--migrar_esquema', choices=[ESQUEMA_COMPACTO, ESQUEMA_TEXTO], default=None, help="Convierte las jugadas y los estados de la base de datos al esquema 'compacto' (enteros) o 'texto' y termina; después arranca con ESQUEMA_COMPACTO=1 o 0 según corresponda.")
+    parser.add_argument('--registro', default=None, help="En el modo 'maquina', escribe las jugadas simuladas en este registro binario en lugar de en la base de datos.")
+    parser.add_argument('--importar_registro', default=None, help="Importa en la base de datos las partidas de un registro binario.")
+    parser.add_argument('--estadisticas_registro', default=None, help="Muestra las estadísticas de un registro binario sin importarlo.")
+    parser.add_argument('--analizar', nargs='?', const='', default=None, help="Analiza las jugadas (matriz de jugada por resultado, transiciones y rachas) de la base de datos o, si se indica, de un registro binario (.bin) o una exportación de /export/jugadas (.ndjson o .csv, opcionalmente .gz).")
     args = parser.parse_args()
 
+    if args.migrar_esquema:
+        convertidas = migrar_esquema(engine, compacto=args.migrar_esquema == ESQUEMA_COMPACTO)
+        print(f"Tablas convertidas al esquema {args.migrar_esquema}: {', '.join(convertidas) or 'ninguna'}")
+        sys.exit(0)
+
     # Inicializar la base de datos (crear tablas)
     init_db()
 
-    if args.modo == 'maquina':
-        jugar_partida_maquina_vs_maquina(args.n_partidas)
+    if args.reconstruir_estadisticas:
+        reconstruir_estadisticas()
+    elif args.analizar is not None:
+        analizar_jugadas(args.analizar or None)
+    elif args.estadisticas_registro:
+        mostrar_estadisticas_registro(args.estadisticas_registro)
+    elif args.importar_registro:
+        importar_registro_partidas(args.importar_registro, args.batch_size or 10000)
+    elif args.modo == 'maquina' and args.registro:
+        jugar_partidas_maquina_registro(args.n_partidas, args.batch_size or 100000, args.registro)
+    elif args.modo == 'simulacion':
+        simular_partidas(args.n_partidas)
+    elif args.modo == 'torneo':
+        jugar_torneo_estrategias(args.estrategias, args.n_partidas, args.workers, args.guardar)
+    elif args.modo == 'maquina' and args.workers and args.workers > 1:
+        jugar_partidas_maquina_paralelo(args.n_partidas, args.batch_size or 10000, args.workers)
+    elif args.modo == 'maquina' and args.batch_size:
+        jugar_partidas_maquina_lote(args.n_partidas, args.batch_size)
     else:
-        jugar_partida_humano_vs_maquina()
+        escritor = EscritorDiferido(SessionLocal, durabilidad=args.durabilidad) if args.escritura_diferida else None
+        if escritor is not None:
+            escritor.iniciar()
+        try:
+            if args.modo == 'maquina':
+                jugar_partida_maquina_vs_maquina(args.n_partidas, args.estrategia, escritor)
+            else:
+                jugar_partida_humano_vs_maquina(args.estrategia, escritor)
+        finally:
+            # Se guardan las partidas pendientes antes de salir
+            if escritor is not None:
+                escritor.detener()
@@ -0,0 +1,38 @@
+import sqlite3
+import pytest
+from app.cache import cache_consultas, mapa_jugadores
+from app.ranking import clasificacion
+
+# La caché de consultas, el mapa de jugadores y la clasificación son globales al proceso: se vacían entre tests
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    cache_consultas.limpiar()
+    mapa_jugadores.limpiar()
+    clasificacion.limpiar()
+    yield
+    cache_consultas.limpiar()
+    mapa_jugadores.limpiar()
+    clasificacion.limpiar()
+
+# Base de datos con el esquema original del proyecto (antes de los contadores, fechas y
+# jugadores de cada partida): dos jugadores, tres partidas finalizadas y una en curso
+ESQUEMA_INICIAL = [
+    "CREATE TABLE jugadores (id INTEGER NOT NULL PRIMARY KEY, nombre VARCHAR, tipo VARCHAR(7), puntos INTEGER)",
+    "CREATE TABLE partidas (id INTEGER NOT NULL PRIMARY KEY, estado VARCHAR(10), ganador_id INTEGER REFERENCES jugadores (id))",
+    "CREATE TABLE jugadas (id INTEGER NOT NULL PRIMARY KEY, partida_id INTEGER REFERENCES partidas (id), "
+    "jugador_id INTEGER REFERENCES jugadores (id), tipo VARCHAR(6), resultado VARCHAR(7))",
+    "INSERT INTO jugadores VALUES (1, 'Ana', 'HUMANO', 2), (2, 'Máquina', 'MAQUINA', 1)",
+    "INSERT INTO partidas VALUES (1, 'FINALIZADA', 1), (2, 'FINALIZADA', 1), (3, 'FINALIZADA', 2), (4, 'EN_CURSO', NULL)",
+    "INSERT INTO jugadas (partida_id, jugador_id, tipo, resultado) VALUES "
+    "(1, 1, 'PIEDRA', 'GANADA'), (2, 1, 'PIEDRA', 'GANADA'), (2, 1, 'PAPEL', 'EMPATE'), (3, 1, 'TIJERA', 'PERDIDA'), (4, 1, 'PAPEL', 'PERDIDA')",
+]
+
+@pytest.fixture
+def base_de_datos_inicial(tmp_path):
+    ruta = tmp_path / "inicial.db"
+    conexion = sqlite3.connect(ruta)
+    for sentencia in ESQUEMA_INICIAL:
+        conexion.execute(sentencia)
+    conexion.commit()
+    conexion.close()
+    return f"sqlite:///{ruta}"
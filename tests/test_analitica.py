@@ -0,0 +1,109 @@
+# tests/test_analitica.py
+
+import asyncio
+import gzip
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from app.analitica import AnalizadorJugadas, analizar, bloques_bd, bloques_fichero
+from app.database import init_db
+from app.simulacion import simular_a_registro, simular_partidas_en_lotes
+from app.registro_partidas import leer_registro
+
+def analisis_directo(jugadores, tipos, resultados):
+    # Referencia sin bloques: recorre la secuencia de cada jugador
+    transiciones = np.zeros((3, 3, 3), dtype=int)
+    rachas = [dict() for _ in range(3)]
+    for jugador in set(jugadores):
+        secuencia = [(t, r) for j, t, r in zip(jugadores, tipos, resultados) if j == jugador]
+        for (tipo, resultado), (siguiente, _) in zip(secuencia, secuencia[1:]):
+            transiciones[resultado, tipo, siguiente] += 1
+        longitud = 1
+        for (_, resultado), (_, siguiente) in zip(secuencia, secuencia[1:] + [(None, None)]):
+            if siguiente == resultado:
+                longitud += 1
+            else:
+                rachas[resultado][longitud] = rachas[resultado].get(longitud, 0) + 1
+                longitud = 1
+    return transiciones, rachas
+
+@pytest.mark.parametrize("tamano_bloque", [1, 7, 1000])
+def test_analizador_coincide_con_el_recorrido_directo(tamano_bloque):
+    rng = np.random.default_rng(5)
+    jugadores = rng.integers(1, 4, size=300)
+    tipos = rng.integers(0, 3, size=300)
+    resultados = rng.choice(3, size=300, p=[0.2, 0.5, 0.3])
+    transiciones, rachas = analisis_directo(jugadores.tolist(), tipos.tolist(), resultados.tolist())
+
+    analizador = AnalizadorJugadas()
+    for inicio in range(0, 300, tamano_bloque):
+        tramo = slice(inicio, inicio + tamano_bloque)
+        analizador.procesar(jugadores[tramo], tipos[tramo], resultados[tramo])
+    analisis = analizador.resultado()
+
+    assert analisis["jugadas"] == 300
+    assert analisis["matriz"]["papel"]["ganada"] == int(np.count_nonzero((tipos == 1) & (resultados == 1)))
+    assert analisis["transiciones"]["ganada"]["piedra"]["tijera"] == transiciones[1, 0, 2]
+    assert [[[v for v in fila.values()] for fila in jugada.values()] for jugada in analisis["transiciones"].values()] \
+        == transiciones.tolist()
+    assert list(analisis["rachas"].values()) == rachas
+    assert analisis["racha_maxima"]["ganada"] == max(rachas[1])
+    assert analisis["repite_tras"]["perdida"] == pytest.approx(
+        np.trace(transiciones[2]) / transiciones[2].sum() * 100
+    )
+
+def test_analizar_sin_jugadas():
+    analisis = analizar([])
+
+    assert analisis["jugadas"] == 0
+    assert analisis["rachas"] == {"empate": {}, "ganada": {}, "perdida": {}}
+    assert analisis["repite_tras"] == {"empate": 0.0, "ganada": 0.0, "perdida": 0.0}
+
+def test_analizar_bd_registro_y_exportacion_coinciden(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'game.db'}")
+    init_db(engine)
+    db = sessionmaker(bind=engine)()
+    simular_partidas_en_lotes(db, 200, 50, semilla=9)
+    ruta_registro = str(tmp_path / "partidas.bin")
+    simular_a_registro(ruta_registro, 200, 50, semilla=9)
+    registros = leer_registro(ruta_registro)
+    ruta_csv = tmp_path / "jugadas.csv.gz"
+    with gzip.open(ruta_csv, "wt", encoding="utf-8") as fichero:
+        fichero.write("id,partida_id,jugador_id,tipo,resultado\n")
+        for i, registro in enumerate(registros):
+            tipo = ("piedra", "papel", "tijera")[registro["tipo"]]
+            resultado = ("empate", "ganada", "perdida")[registro["resultado"]]
+            fichero.write(f"{i + 1},{registro['partida']},{registro['jugador']},{tipo},{resultado}\n")
+
+    desde_bd = analizar(bloques_bd(db, tamano_bloque=64))
+    desde_registro = analizar(bloques_fichero(ruta_registro, tamano_bloque=100))
+    desde_csv = analizar(bloques_fichero(str(ruta_csv), tamano_bloque=1000))
+
+    assert desde_bd["jugadas"] == 600
+    assert desde_bd == desde_registro == desde_csv
+    db.close()
+    engine.dispose()
+
+def test_bloques_bd_con_driver_asincrono(tmp_path):
+    ruta = tmp_path / "game.db"
+    engine = create_engine(f"sqlite:///{ruta}")
+    init_db(engine)
+    with sessionmaker(bind=engine)() as db:
+        simular_partidas_en_lotes(db, 50, 50, semilla=3)
+        sincrono = [[columna.tolist() for columna in bloque] for bloque in bloques_bd(db, tamano_bloque=64)]
+
+    async def recorrer():
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{ruta}")
+        async with async_sessionmaker(async_engine)() as session:
+            bloques = await session.run_sync(lambda db: [[columna.tolist() for columna in bloque] for bloque in bloques_bd(db, tamano_bloque=64)])
+        await async_engine.dispose()
+        return bloques
+
+    # Con aiosqlite se recorre con stream_results, por bloques del mismo tamaño
+    asincrono = asyncio.run(recorrer())
+
+    assert len(sincrono) == 3
+    assert asincrono == sincrono
+    engine.dispose()
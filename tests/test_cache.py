@@ -0,0 +1,71 @@
+# tests/test_cache.py
+
+import time
+from unittest.mock import MagicMock
+from app.cache import CacheConsultas, MapaJugadores
+
+def test_acierto_y_fallo():
+    cache = CacheConsultas(ttl=60)
+    cargar = MagicMock(return_value=1)
+
+    assert cache.obtener("clave", cargar) == 1
+    assert cache.obtener("clave", cargar) == 1
+
+    cargar.assert_called_once()
+    assert cache.metricas()["aciertos"] == 1
+    assert cache.metricas()["fallos"] == 1
+
+def test_invalidar_por_version():
+    cache = CacheConsultas(ttl=60)
+    cache.obtener("clave", lambda: 1)
+
+    cache.invalidar()
+
+    assert cache.obtener("clave", lambda: 2) == 2
+
+def test_expulsion_lru():
+    cache = CacheConsultas(max_entradas=2, ttl=60)
+    cache.obtener("a", lambda: 1)
+    cache.obtener("b", lambda: 2)
+    cache.obtener("a", lambda: 1)
+
+    cache.obtener("c", lambda: 3)
+
+    assert cache.obtener("a", lambda: -1) == 1
+    assert cache.obtener("b", lambda: -1) == -1
+    assert cache.metricas()["expulsiones"] == 2
+
+def test_sirve_obsoleto_mientras_recarga():
+    cache = CacheConsultas(ttl=0.01, ttl_obsoleto=60)
+    cache.obtener("clave", lambda: 1)
+    time.sleep(0.02)
+
+    assert cache.obtener("clave", lambda: 2, recargar=lambda: 3) == 1
+    cache._pool.shutdown(wait=True)
+
+    assert cache.obtener("clave", lambda: 2) == 3
+    assert cache.metricas()["obsoletos"] == 1
+
+def test_entrada_cargada_durante_una_escritura_no_se_sirve():
+    cache = CacheConsultas(ttl=60)
+
+    def cargar_con_escritura_concurrente():
+        cache.invalidar()
+        return "antiguo"
+
+    cache.obtener("clave", cargar_con_escritura_concurrente)
+
+    assert cache.obtener("clave", lambda: "nuevo") == "nuevo"
+
+def test_mapa_jugadores_lru():
+    mapa = MapaJugadores(max_entradas=2)
+    mapa.guardar("sqlite://", "Ana", 1)
+    mapa.guardar("sqlite://", "Luis", 2)
+    mapa.obtener("sqlite://", "Ana")
+
+    mapa.guardar("sqlite://", "Eva", 3)
+
+    assert mapa.obtener("sqlite://", "Ana") == 1
+    assert mapa.obtener("sqlite://", "Luis") is None
+    assert mapa.obtener("otra.db", "Ana") is None
+    assert (mapa.aciertos, mapa.fallos, mapa.expulsiones) == (2, 2, 1)
@@ -0,0 +1,98 @@
+# tests/test_database.py
+
+from datetime import datetime
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool, QueuePool
+from app.database import crear_engine, init_db
+import app.models
+from app.models import Jugador, Partida, valor_sql
+from app.repositories import PartidaRepository, JugadorRepository
+from app.schemas import EstadoPartidaEnum, GranularidadEnum, JugadaEnum
+from app.services import JuegoService
+
+def pragmas(engine, nombres):
+    with engine.connect() as conn:
+        return {nombre: conn.exec_driver_sql(f"PRAGMA {nombre}").scalar() for nombre in nombres}
+
+def test_crear_engine_aplica_pragmas(tmp_path):
+    engine = crear_engine(f"sqlite:///{tmp_path / 'game.db'}")
+
+    assert isinstance(engine.pool, QueuePool)
+    assert pragmas(engine, ["journal_mode", "synchronous", "busy_timeout"]) == {
+        "journal_mode": "wal",
+        "synchronous": 1,  # NORMAL
+        "busy_timeout": 5000
+    }
+    engine.dispose()
+
+def test_crear_engine_pragmas_personalizados(tmp_path):
+    engine = crear_engine(f"sqlite:///{tmp_path / 'game.db'}", pragmas={"synchronous": "OFF"})
+
+    assert pragmas(engine, ["journal_mode", "synchronous"]) == {"journal_mode": "delete", "synchronous": 0}
+    engine.dispose()
+
+def test_crear_engine_en_memoria_comparte_conexion():
+    engine = crear_engine("sqlite://")
+
+    assert isinstance(engine.pool, StaticPool)
+    engine.dispose()
+
+def test_init_db_anade_columnas_nuevas(tmp_path):
+    engine = crear_engine(f"sqlite:///{tmp_path / 'game.db'}")
+    # La columna estado tiene el tipo del esquema configurado (texto o compacto)
+    tipo_estado = Partida.__table__.c.estado.type.compile(dialect=engine.dialect)
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE partidas (id INTEGER PRIMARY KEY, estado {tipo_estado}, ganador_id INTEGER)"))
+        conn.execute(text(f"INSERT INTO partidas (estado) VALUES ({valor_sql(EstadoPartidaEnum.FINALIZADA)})"))
+
+    init_db(engine)
+
+    columnas = {columna["name"] for columna in inspect(engine).get_columns("partidas")}
+    assert {"creada_en", "finalizada_en"} <= columnas
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM partidas")).scalar() == 1
+    engine.dispose()
+
+def test_init_db_rechaza_nombres_de_jugador_repetidos(tmp_path):
+    engine = crear_engine(f"sqlite:///{tmp_path / 'game.db'}")
+    init_db(engine)
+    # Una base de datos anterior al índice único de nombre, con un jugador repetido
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ux_jugadores_nombre"))
+        conn.execute(text("INSERT INTO jugadores (nombre, puntos) VALUES ('Ana', 0), ('Ana', 1), ('Luis', 0)"))
+
+    with pytest.raises(RuntimeError, match="Ana"):
+        init_db(engine)
+
+    assert "ux_jugadores_nombre" not in {indice["name"] for indice in inspect(engine).get_indexes("jugadores")}
+    engine.dispose()
+
+@pytest.mark.skipif(app.models.ESQUEMA_COMPACTO, reason="la base de datos inicial usa el esquema de texto")
+def test_init_db_reconstruye_los_contadores_de_una_base_anterior(base_de_datos_inicial):
+    engine = crear_engine(base_de_datos_inicial)
+    init_db(engine)
+    db = sessionmaker(bind=engine)()
+    partida_repo, jugador_repo = PartidaRepository(db), JugadorRepository(db)
+
+    assert partida_repo.obtener_estadisticas_partidas() == {"total_partidas": 4, "partidas_ganadas": 3, "partidas_abandonadas": 0}
+    assert partida_repo.obtener_mano_fuerte() == (JugadaEnum.PIEDRA, 100.0)
+    estadisticas = jugador_repo.obtener_estadisticas(1)
+    assert (estadisticas["total_victorias"], estadisticas["distribucion_manos"]["piedra"]) == (2, 2)
+    # Al terminar la partida que estaba en curso, los contadores siguen cuadrando
+    servicio = JuegoService(partida_repo, jugador_repo)
+    servicio.finalizar_partida(db.get(Partida, 4), db.get(Jugador, 2))
+    assert partida_repo.obtener_contadores(["estado:en curso", "estado:finalizada"]) == {"estado:en curso": 0, "estado:finalizada": 4}
+    assert partida_repo.obtener_estadisticas_periodo(
+        datetime(2000, 1, 1), datetime(2100, 1, 1), GranularidadEnum.DIA
+    )["total_partidas"] == 1
+    db.close()
+
+    # Con los contadores ya cargados, init_db no los vuelve a calcular
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE estadisticas_agregadas SET valor = 99 WHERE clave = 'estado:finalizada'"))
+    init_db(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT valor FROM estadisticas_agregadas WHERE clave = 'estado:finalizada'")).scalar() == 99
+    engine.dispose()
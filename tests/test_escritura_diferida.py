@@ -0,0 +1,124 @@
+# tests/test_escritura_diferida.py
+
+import asyncio
+import queue
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from app.database import init_db
+from app.escritura_diferida import EscritorDiferido, ColaLlenaError, DURABILIDAD_DIFERIDA
+from app.models import Jugador, Partida, Jugada
+from app.repositories import PartidaRepository, JugadorRepository
+from app.schemas import EstadoPartidaEnum, JugadaEnum
+from app.services import JuegoService
+
+@pytest.fixture
+def sesion_local(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'game.db'}")
+    init_db(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+def _partida(ganador_id):
+    return {
+        "estado": EstadoPartidaEnum.FINALIZADA, "ganador_id": ganador_id, "jugador1_id": 1, "jugador2_id": 2,
+        "jugadas": [{"jugador_id": 1, "tipo": JugadaEnum.PIEDRA, "resultado": 'ganada'}]
+    }
+
+def test_escritor_agrupa_en_lotes(sesion_local):
+    db = sesion_local()
+    jugador_repo = JugadorRepository(db)
+    ids = [jugador_repo.obtener_id("Ana", "humano"), jugador_repo.obtener_id("Máquina", "maquina")]
+    db.commit()
+    escritor = EscritorDiferido(sesion_local, tamano_lote=4)
+
+    # Las partidas encoladas antes de iniciar el escritor se guardan en lotes completos
+    futuros = [escritor.encolar(_partida(ids[i % 2])) for i in range(10)]
+    escritor.iniciar()
+    escritor.vaciar(timeout=10)
+
+    assert [futuro.result() for futuro in futuros] == list(range(1, 11))
+    assert escritor.metricas() == {"encoladas": 10, "pendientes": 0, "escritas": 10, "lotes": 3, "errores": 0}
+    assert db.query(func.count(Jugada.id)).scalar() == 10
+    assert [j.puntos for j in db.query(Jugador).order_by(Jugador.id)] == [5, 5]
+    escritor.detener()
+    assert not escritor.activo
+
+def test_escritor_contrapresion(sesion_local):
+    escritor = EscritorDiferido(sesion_local, max_pendientes=1, timeout_encolar=0.01)
+    escritor.encolar(_partida(None))
+
+    with pytest.raises(queue.Full):
+        escritor.encolar(_partida(None), bloquear=False)
+    with pytest.raises(ColaLlenaError):
+        escritor.encolar(_partida(None))
+
+def test_escritor_detener_guarda_pendientes(sesion_local):
+    escritor = EscritorDiferido(sesion_local, durabilidad=DURABILIDAD_DIFERIDA)
+    escritor.iniciar()
+
+    assert [escritor.escribir(_partida(None)) for _ in range(3)] == [None] * 3
+    escritor.detener(timeout=10)
+
+    assert sesion_local().query(func.count(Partida.id)).scalar() == 3
+
+def test_escritor_error_en_lote(sesion_local):
+    escritor = EscritorDiferido(sesion_local)
+    futuro = escritor.encolar({"ganador_id": None, "jugadas": []})  # sin estado
+    escritor.iniciar()
+
+    with pytest.raises(KeyError):
+        futuro.result(timeout=10)
+    assert escritor.metricas()["errores"] == 1
+    # El escritor sigue funcionando tras el error
+    assert escritor.escribir(_partida(None)) == 1
+    escritor.detener()
+
+def test_juego_service_con_escritura_diferida(sesion_local):
+    db = sesion_local()
+    jugador_repo = JugadorRepository(db)
+    partida_repo = PartidaRepository(db)
+    escritor = EscritorDiferido(sesion_local)
+    escritor.iniciar()
+    servicio = JuegoService(partida_repo, jugador_repo, escritor)
+    jugador = jugador_repo.get_or_create("Ana", "humano")
+    maquina = jugador_repo.get_or_create("Máquina", "maquina")
+
+    partida = servicio.iniciar_partida(jugador, maquina)
+    servicio.registrar_jugada(partida, jugador, JugadaEnum.PAPEL, JugadaEnum.PIEDRA)
+    servicio.registrar_jugada(partida, jugador, JugadaEnum.PIEDRA, JugadaEnum.PAPEL)
+    # Nada se escribe hasta que la partida termina
+    assert db.query(func.count(Partida.id)).scalar() == 0
+    servicio.finalizar_partida(partida, jugador)
+    abandonada = servicio.iniciar_partida(jugador, maquina)
+    servicio.registrar_jugada(abandonada, jugador, JugadaEnum.TIJERA, JugadaEnum.TIJERA)
+    servicio.marcar_abandonada(abandonada)
+    escritor.detener()
+
+    assert (partida.id, abandonada.id) == (1, 2)
+    db.expire_all()
+    assert db.get(Jugador, jugador.id).puntos == 1
+    assert [j.partida_id for j in db.query(Jugada).order_by(Jugada.id)] == [1, 1, 2]
+    assert partida_repo.obtener_conteos_agregados() == partida_repo.obtener_conteos_partidas()
+    assert partida_repo.obtener_estadisticas_partidas() == {"total_partidas": 2, "partidas_ganadas": 1, "partidas_abandonadas": 1}
+
+def test_escritor_sigue_si_se_cancela_una_espera(sesion_local):
+    escritor = EscritorDiferido(sesion_local)
+
+    async def cancelar_espera():
+        tarea = asyncio.create_task(escritor.escribir_async(_partida(None)))
+        await asyncio.sleep(0)
+        tarea.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await tarea
+
+    # El futuro de la partida se cancela antes de que el escritor la guarde
+    asyncio.run(cancelar_espera())
+    escritor.iniciar()
+    escritor.vaciar(timeout=10)
+
+    assert escritor.activo
+    assert escritor.escribir(_partida(None)) == 2
+    assert escritor.metricas()["errores"] == 0
+    assert sesion_local().query(func.count(Partida.id)).scalar() == 2
+    escritor.detener()
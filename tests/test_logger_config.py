@@ -0,0 +1,18 @@
+# tests/test_logger_config.py
+
+import logging
+from app.logger_config import FiltroMuestreo
+
+def registro():
+    return logging.LogRecord("app.services.jugadas", logging.INFO, __file__, 1, "Resultado: %s.", ("ganada",), None)
+
+def test_filtro_muestreo_extremos():
+    assert all(FiltroMuestreo(1).filter(registro()) for _ in range(100))
+    assert not any(FiltroMuestreo(0).filter(registro()) for _ in range(100))
+
+def test_filtro_muestreo_fraccion():
+    filtro = FiltroMuestreo(0.25)
+
+    pasan = sum(filtro.filter(registro()) for _ in range(10000))
+
+    assert 2000 < pasan < 3000
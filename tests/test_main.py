@@ -1,8 +1,17 @@
+import gzip
+import json
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import MagicMock
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
 from app.main import app
+from app.metricas import METRICAS_ACTIVAS
+from app.database import init_db, get_db, get_async_db
 from app.repositories import PartidaRepository, JugadorRepository
+from app.services import JuegoService
+from app.schemas import JugadaEnum
 
 # Simula una sesión de base de datos
 @pytest.fixture
@@ -107,3 +116,265 @@ def test_estadisticas(client, mock_db_session, monkeypatch):
         "partidas_ganadas": 30,
         "partidas_abandonadas": 5
     }
+
+# Cliente contra una base de datos real con dos partidas (una ganada y una abandonada)
+@pytest.fixture
+def client_con_base_de_datos(tmp_path):
+    ruta = tmp_path / "game.db"
+    engine = create_engine(f"sqlite:///{ruta}")
+    init_db(engine)
+    session_local = sessionmaker(bind=engine)
+    db = session_local()
+    jugador_repo = JugadorRepository(db)
+    servicio = JuegoService(PartidaRepository(db), jugador_repo)
+    jugador = jugador_repo.get_or_create("Jugador1", "humano")
+    maquina = jugador_repo.get_or_create("Máquina", "maquina")
+    partida = servicio.iniciar_partida(jugador, maquina)
+    servicio.registrar_jugada(partida, jugador, JugadaEnum.PAPEL, JugadaEnum.PIEDRA)
+    servicio.finalizar_partida(partida, jugador)
+    servicio.marcar_abandonada(servicio.iniciar_partida(jugador, maquina))
+    jugador_id = jugador.id
+    db.close()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{ruta}")
+    async_session_local = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def get_async_db_prueba():
+        async with async_session_local() as session:
+            yield session
+
+    def get_db_prueba():
+        with session_local() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = get_async_db_prueba
+    app.dependency_overrides[get_db] = get_db_prueba
+    try:
+        with TestClient(app) as client:
+            yield client, jugador_id
+    finally:
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+# Prueba de los endpoints asíncronos contra una base de datos real
+def test_endpoints_async_con_base_de_datos(client_con_base_de_datos):
+    client, jugador_id = client_con_base_de_datos
+
+    assert client.get("/estadisticas").json() == {
+        "total_partidas": 2,
+        "partidas_ganadas": 1,
+        "partidas_abandonadas": 1
+    }
+    assert client.get("/mano_fuerte").json() == {"mano_fuerte": "papel", "porcentaje_victorias": 100.0}
+    assert client.get("/ranking").json()[0] == {"id": jugador_id, "nombre": "Jugador1", "tipo": "humano", "puntos": 1}
+
+# Pruebas de la exportación en streaming
+def test_export_jugadas_ndjson(client_con_base_de_datos):
+    client, jugador_id = client_con_base_de_datos
+
+    response = client.get("/export/jugadas")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(linea) for linea in response.text.splitlines()] == [
+        {"id": 1, "partida_id": 1, "jugador_id": jugador_id, "tipo": "papel", "resultado": "ganada"}
+    ]
+
+def test_export_partidas_csv_filtrado(client_con_base_de_datos):
+    client, jugador_id = client_con_base_de_datos
+
+    todas = client.get("/export/partidas", params={"formato": "csv"})
+    ganadas = client.get("/export/partidas", params={"formato": "csv", "jugador_id": jugador_id})
+    rango = client.get("/export/partidas", params={"formato": "csv", "desde_id": 2, "hasta_id": 2})
+
+    assert todas.text.splitlines() == ["id,estado,ganador_id", f"1,finalizada,{jugador_id}", "2,abandonada,"]
+    assert ganadas.text.splitlines() == ["id,estado,ganador_id", f"1,finalizada,{jugador_id}"]
+    assert rango.text.splitlines() == ["id,estado,ganador_id", "2,abandonada,"]
+
+def test_export_gzip(client_con_base_de_datos):
+    client, _ = client_con_base_de_datos
+
+    response = client.get("/export/partidas", params={"gzip": True})
+
+    assert response.headers["content-type"] == "application/gzip"
+    assert 'filename="partidas.ndjson.gz"' in response.headers["content-disposition"]
+    assert len(gzip.decompress(response.content).decode().splitlines()) == 2
+
+# Prueba del análisis de jugadas
+def test_analitica_jugadas(client_con_base_de_datos):
+    client, jugador_id = client_con_base_de_datos
+
+    analisis = client.get("/analitica/jugadas").json()
+    ninguna = client.get("/analitica/jugadas", params={"jugador_id": jugador_id + 100}).json()
+
+    assert analisis["jugadas"] == 1
+    assert analisis["matriz"]["papel"] == {"empate": 0, "ganada": 1, "perdida": 0}
+    assert analisis["rachas"]["ganada"] == {"1": 1}
+    assert analisis["racha_maxima"] == {"empate": 0, "ganada": 1, "perdida": 0}
+    assert ninguna["jugadas"] == 0
+
+# Prueba del registro de partidas en lote
+def test_registrar_partidas_bulk(client_con_base_de_datos):
+    client, jugador_id = client_con_base_de_datos
+    lote = {"partidas": [
+        {"jugador1": {"nombre": "Jugador1", "tipo": "humano"}, "jugador2": {"nombre": "Externo", "tipo": "maquina"},
+         "jugadas": [{"jugada_jugador1": "tijera", "jugada_jugador2": "papel"},
+                     {"jugada_jugador1": "tijera", "jugada_jugador2": "piedra"},
+                     {"jugada_jugador1": "piedra", "jugada_jugador2": "tijera"}],
+         "ganador": "Jugador1"},
+        {"jugador1": {"nombre": "Externo", "tipo": "maquina"}, "jugador2": {"nombre": "Jugador1", "tipo": "humano"}, "estado": "abandonada",
+         "jugadas": [{"jugada_jugador1": "papel", "jugada_jugador2": "papel"}]}
+    ]}
+
+    response = client.post("/partidas/bulk", json=lote)
+
+    assert response.status_code == 200
+    assert response.json() == {"partidas_registradas": 2, "ids": [3, 4]}
+    assert client.get("/estadisticas").json() == {
+        "total_partidas": 4,
+        "partidas_ganadas": 2,
+        "partidas_abandonadas": 2
+    }
+    assert client.get("/ranking").json()[0] == {"id": jugador_id, "nombre": "Jugador1", "tipo": "humano", "puntos": 2}
+
+def test_registrar_partidas_bulk_no_valido(client_con_base_de_datos):
+    client, _ = client_con_base_de_datos
+    lote = {"partidas": [
+        {"jugador1": {"nombre": "Jugador1", "tipo": "humano"}, "jugador2": {"nombre": "Externo", "tipo": "humano"},
+         "jugadas": [{"jugada_jugador1": "piedra", "jugada_jugador2": "papel"}], "ganador": "Jugador1"}
+    ]}
+
+    response = client.post("/partidas/bulk", json=lote)
+
+    assert response.status_code == 422
+    assert client.get("/estadisticas").json()["total_partidas"] == 2
+    assert client.post("/partidas/bulk", json={"partidas": []}).status_code == 422
+
+# Pruebas del ranking paginado y de la posición de un jugador
+def test_ranking_paginado_y_posicion(client_con_base_de_datos):
+    client, jugador_id = client_con_base_de_datos
+
+    assert [j["nombre"] for j in client.get("/ranking", params={"top": 1}).json()] == ["Jugador1"]
+    assert [j["nombre"] for j in client.get("/ranking", params={"top": 5, "offset": 1}).json()] == ["Máquina"]
+    assert client.get(f"/ranking/{jugador_id}").json() == {
+        "id": jugador_id, "nombre": "Jugador1", "tipo": "humano", "puntos": 1, "posicion": 1
+    }
+    assert client.get("/ranking/999").status_code == 404
+    assert client.get("/ranking", params={"top": 0}).status_code == 422
+
+# Prueba del endpoint de métricas de Prometheus
+@pytest.mark.skipif(not METRICAS_ACTIVAS, reason="Métricas desactivadas con METRICAS=0")
+def test_metrics(client_con_base_de_datos):
+    client, jugador_id = client_con_base_de_datos
+    lote = {"partidas": [
+        {"jugador1": {"nombre": "Jugador1", "tipo": "humano"}, "jugador2": {"nombre": "Externo", "tipo": "maquina"},
+         "jugadas": [{"jugada_jugador1": "tijera", "jugada_jugador2": "papel"}]}
+    ]}
+    client.get(f"/ranking/{jugador_id}")
+    client.post("/partidas/bulk", json=lote)
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    assert '# TYPE ppt_peticiones_http_segundos histogram' in response.text
+    assert 'ppt_peticiones_http_segundos_count{metodo="GET",ruta="/ranking/{jugador_id}",estado="200"}' in response.text
+    assert 'ppt_repositorio_segundos_count{repositorio="PartidaRepository",metodo="guardar_lote"}' in response.text
+    assert 'ppt_commit_segundos_count{operacion="guardar_lote"}' in response.text
+    assert 'ppt_sesiones_abiertas_total{tipo="asincrona"}' in response.text
+    assert 'ppt_partidas_total{origen="lote",estado="finalizada"}' in response.text
+
+# Prueba de las estadísticas de un intervalo
+def test_estadisticas_por_periodo(client_con_base_de_datos):
+    client, _ = client_con_base_de_datos
+
+    por_dia = client.get("/estadisticas", params={"granularidad": "dia"}).json()
+    vacio = client.get("/estadisticas", params={"desde": "2000-01-01T00:00:00", "hasta": "2000-01-02T00:00:00"}).json()
+
+    assert por_dia["granularidad"] == "dia"
+    assert (por_dia["total_partidas"], por_dia["partidas_ganadas"], por_dia["partidas_abandonadas"]) == (2, 1, 1)
+    assert len(por_dia["periodos"]) == 1
+    assert vacio == {"granularidad": "hora", "total_partidas": 0, "partidas_ganadas": 0, "partidas_abandonadas": 0, "periodos": []}
+    assert client.get("/estadisticas", params={"granularidad": "semana"}).status_code == 422
+
+# Prueba de las estadísticas de un jugador
+def test_estadisticas_jugador(client_con_base_de_datos):
+    client, jugador_id = client_con_base_de_datos
+
+    response = client.get(f"/jugadores/{jugador_id}/estadisticas")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "id": jugador_id,
+        "nombre": "Jugador1",
+        "total_partidas": 2,
+        "total_victorias": 1,
+        "total_derrotas": 0,
+        "partidas_abandonadas": 1,
+        "winrate": 50.0,
+        "distribucion_manos": {"piedra": 0, "papel": 1, "tijera": 0},
+        "mano_fuerte": {"mano": "papel", "porcentaje_victorias": 100.0},
+        "mano_debil": None
+    }
+    assert client.get("/jugadores/999/estadisticas").status_code == 404
+
+# Prueba del juego en tiempo real por WebSocket
+def test_ws_partida(client_con_base_de_datos):
+    client, jugador_id = client_con_base_de_datos
+
+    with client.websocket_connect("/ws/partida?nombre=Ana&estrategia=markov") as websocket:
+        websocket.send_text("no es json")
+        assert "error" in websocket.receive_json()
+        websocket.send_json({"jugada": "lagarto"})
+        assert "error" in websocket.receive_json()
+        rondas = []
+        for jugada in ["piedra", "papel", "tijera", "piedra"]:
+            websocket.send_json({"jugada": jugada})
+            rondas.append(websocket.receive_json())
+
+    assert [ronda["ronda"] for ronda in rondas] == [1, 2, 3, 1]
+    assert [ronda["estado"] for ronda in rondas] == ["en curso", "en curso", "finalizada", "en curso"]
+    assert rondas[2]["ganador"] in ("Ana", "Máquina")
+    assert "partida_id" in rondas[2]
+    # La partida terminada y la abandonada al desconectarse se guardan
+    assert client.get("/estadisticas").json() == {
+        "total_partidas": 4,
+        "partidas_ganadas": 2,
+        "partidas_abandonadas": 2
+    }
+    ana = next(fila for fila in client.get("/ranking?top=10").json() if fila["nombre"] == "Ana")
+    estadisticas = client.get(f"/jugadores/{ana['id']}/estadisticas").json()
+    assert estadisticas["total_partidas"] == 2
+    assert estadisticas["partidas_abandonadas"] == 1
+
+def test_ws_partida_estrategia_no_valida(client):
+    from starlette.websockets import WebSocketDisconnect
+
+    with pytest.raises(WebSocketDisconnect) as error:
+        with client.websocket_connect("/ws/partida?nombre=Ana&estrategia=trampas") as websocket:
+            websocket.receive_json()
+    assert error.value.code == 1008
+
+# Con el escritor diferido activo, las partidas en tiempo real se guardan en lotes
+def test_ws_partida_con_escritura_diferida(client_con_base_de_datos, tmp_path, monkeypatch):
+    from app import main
+    from app.escritura_diferida import EscritorDiferido
+
+    client, jugador_id = client_con_base_de_datos
+    engine = create_engine(f"sqlite:///{tmp_path / 'game.db'}")
+    escritor = EscritorDiferido(sessionmaker(bind=engine))
+    escritor.iniciar()
+    monkeypatch.setattr(main, "escritor_diferido", escritor)
+    try:
+        with client.websocket_connect("/ws/partida?nombre=Ana") as websocket:
+            for _ in range(3):
+                websocket.send_json({"jugada": "papel"})
+                ronda = websocket.receive_json()
+        escritor.vaciar()
+    finally:
+        escritor.detener()
+        engine.dispose()
+
+    assert ronda["partida_id"] == 3
+    assert escritor.metricas()["escritas"] == 1
+    assert client.get("/estadisticas").json()["total_partidas"] == 3
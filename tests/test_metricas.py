@@ -0,0 +1,72 @@
+# tests/test_metricas.py
+
+import pytest
+from app import metricas
+from app.metricas import RegistroMetricas, instrumentar_repositorio, metodos_repositorio
+from app.repositories import PartidaRepository
+
+@pytest.fixture(autouse=True)
+def metricas_activas(monkeypatch):
+    monkeypatch.setattr(metricas, "METRICAS_ACTIVAS", True)
+
+def _muestras(texto):
+    return dict(linea.rsplit(" ", 1) for linea in texto.splitlines() if not linea.startswith("#"))
+
+def test_contador_por_etiquetas():
+    registro = RegistroMetricas()
+    contador = registro.contador("ppt_prueba_total", "Contador de prueba.", ("tipo",))
+
+    contador.inc("a")
+    contador.inc("a", valor=2)
+    contador.inc('b"\n')
+    texto = registro.exponer()
+
+    assert "# HELP ppt_prueba_total Contador de prueba.\n# TYPE ppt_prueba_total counter\n" in texto
+    assert _muestras(texto) == {'ppt_prueba_total{tipo="a"}': "3.0", 'ppt_prueba_total{tipo="b\\"\\n"}': "1.0"}
+
+def test_histograma_acumula_los_buckets():
+    registro = RegistroMetricas()
+    histograma = registro.histograma("ppt_prueba_segundos", "Histograma de prueba.", ("ruta",), buckets=(0.1, 1.0))
+
+    for valor in (0.05, 0.1, 0.5, 3.0):
+        histograma.observar(valor, "/x")
+    with histograma.medir("/y"):
+        pass
+    muestras = _muestras(registro.exponer())
+
+    assert muestras['ppt_prueba_segundos_bucket{ruta="/x",le="0.1"}'] == "2"
+    assert muestras['ppt_prueba_segundos_bucket{ruta="/x",le="1.0"}'] == "3"
+    assert muestras['ppt_prueba_segundos_bucket{ruta="/x",le="+Inf"}'] == "4"
+    assert float(muestras['ppt_prueba_segundos_sum{ruta="/x"}']) == pytest.approx(3.65)
+    assert muestras['ppt_prueba_segundos_count{ruta="/x"}'] == "4"
+    assert muestras['ppt_prueba_segundos_count{ruta="/y"}'] == "1"
+
+def test_registro_rechaza_nombres_repetidos():
+    registro = RegistroMetricas()
+    registro.contador("ppt_prueba_total", "Contador de prueba.")
+
+    with pytest.raises(ValueError):
+        registro.histograma("ppt_prueba_total", "Otra métrica.")
+
+def test_instrumentar_repositorio_mide_los_metodos_publicos():
+    @instrumentar_repositorio
+    class RepositorioPrueba:
+        def consultar(self, x):
+            return x * 2
+
+        def iterar(self):
+            yield 1
+
+        def _privado(self):
+            return 1
+
+    repo = RepositorioPrueba()
+
+    assert repo.consultar(2) == 4
+    assert list(repo.iterar()) == [1]
+    series = {etiquetas: cuentas for etiquetas, (cuentas, _) in metodos_repositorio._series.items()}
+    assert sum(series[("RepositorioPrueba", "consultar")]) == 1
+    assert ("RepositorioPrueba", "iterar") not in series
+    assert ("RepositorioPrueba", "_privado") not in series
+    # Los métodos envueltos conservan su nombre
+    assert PartidaRepository.obtener_info_global.__name__ == "obtener_info_global"
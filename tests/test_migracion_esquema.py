@@ -0,0 +1,113 @@
+# tests/test_migracion_esquema.py
+
+import json
+import os
+import subprocess
+import sys
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from app.database import init_db, _comprobar_tipos
+from app.migracion_esquema import migrar_esquema, esquema_actual
+from app.models import ESQUEMA_COMPACTO, EnumCompacto, valor_sql
+from app.schemas import EstadoPartidaEnum, JugadaEnum, ResultadoJugadaEnum
+from benchmarks.comun import poblar_partidas
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Consultas del repositorio cuyo resultado no debe depender del esquema
+CONSULTAS = """
+import json, sys
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.repositories import PartidaRepository
+with Session(create_engine(sys.argv[1])) as db:
+    repo = PartidaRepository(db)
+    contadores = repo.reconstruir_contadores()
+    db.commit()
+    fuerte, debil = repo.obtener_mano_fuerte(), repo.obtener_mano_debil()
+    print(json.dumps({
+        "contadores": contadores,
+        "fuerte": [fuerte[0].value, fuerte[1]],
+        "debil": [debil[0].value, debil[1]],
+        "jugadas": [[fila.tipo.value, fila.resultado.value] for fila in db.execute(repo.consulta_jugadas(hasta_id=6))],
+        "partidas": [fila.estado.value for fila in db.execute(repo.consulta_partidas(hasta_id=10))],
+    }, sort_keys=True))
+"""
+
+def consultar(url, compacto):
+    entorno = {**os.environ, "ESQUEMA_COMPACTO": "1" if compacto else "0"}
+    salida = subprocess.run(
+        [sys.executable, "-c", CONSULTAS, url], cwd=RAIZ, env=entorno, capture_output=True, text=True, check=True
+    )
+    return json.loads(salida.stdout)
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'game.db'}")
+    init_db(engine)
+    poblar_partidas(engine, 100)
+    yield engine
+    engine.dispose()
+
+def test_enum_compacto_convierte_valores():
+    tipo = EnumCompacto(JugadaEnum)
+
+    assert tipo.process_bind_param(JugadaEnum.TIJERA, None) == 2
+    assert tipo.process_bind_param('papel', None) == 1
+    assert tipo.process_result_value(0, None) is JugadaEnum.PIEDRA
+    assert tipo.process_bind_param(None, None) is None
+    assert valor_sql(ResultadoJugadaEnum.PERDIDA, compacto=True) == "2"
+    assert valor_sql(EstadoPartidaEnum.FINALIZADA, compacto=False) == "'FINALIZADA'"
+
+def test_migrar_esquema_ida_y_vuelta(engine):
+    url = str(engine.url)
+    # La base de datos se crea con el esquema configurado; la prueba parte del de texto
+    migrar_esquema(engine, compacto=False)
+    antes = consultar(url, compacto=False)
+
+    assert migrar_esquema(engine, compacto=True) == ["partidas", "jugadas"]
+    assert esquema_actual(engine) == {"partidas": "compacto", "jugadas": "compacto"}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT DISTINCT typeof(tipo) FROM jugadas")).scalars().all() == ["integer"]
+        assert conn.execute(text("SELECT COUNT(*) FROM jugadas")).scalar() == 300
+    # Los índices se recrean sobre la tabla nueva
+    assert "ix_jugadas_resultado_tipo" in {indice["name"] for indice in inspect(engine).get_indexes("jugadas")}
+    assert consultar(url, compacto=True) == antes
+    # Migrar al esquema que ya tiene no hace nada
+    assert migrar_esquema(engine, compacto=True) == []
+
+    assert migrar_esquema(engine, compacto=False) == ["partidas", "jugadas"]
+    assert esquema_actual(engine) == {"partidas": "texto", "jugadas": "texto"}
+    assert consultar(url, compacto=False) == antes
+
+def test_comprobar_tipos_detecta_esquema_distinto(engine):
+    _comprobar_tipos(engine)
+    migrar_esquema(engine, compacto=not ESQUEMA_COMPACTO, vacuum=False)
+
+    with pytest.raises(RuntimeError, match="migrar_esquema"):
+        _comprobar_tipos(engine)
+
+def test_init_db_rechaza_esquema_distinto(engine):
+    migrar_esquema(engine, compacto=not ESQUEMA_COMPACTO, vacuum=False)
+    esquema = esquema_actual(engine)
+
+    with pytest.raises(RuntimeError, match="migrar_esquema"):
+        init_db(engine)
+    # La base de datos no se modifica
+    assert esquema_actual(engine) == esquema
+
+def test_migrar_esquema_de_una_base_anterior(base_de_datos_inicial):
+    engine = create_engine(base_de_datos_inicial)
+
+    assert migrar_esquema(engine, compacto=True, vacuum=False) == ["partidas", "jugadas"]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT estado FROM partidas ORDER BY id")).scalars().all() == [1, 1, 1, 0]
+        assert conn.execute(text("SELECT tipo, resultado FROM jugadas ORDER BY id")).all() == [(0, 1), (0, 1), (1, 0), (2, 2), (1, 2)]
+        # Las columnas que la base de datos aún no tenía quedan vacías
+        assert conn.execute(text("SELECT COUNT(*) FROM partidas WHERE jugador1_id IS NULL")).scalar() == 4
+    # Con el esquema configurado, la aplicación arranca sobre la base de datos migrada
+    migrar_esquema(engine, compacto=ESQUEMA_COMPACTO, vacuum=False)
+    init_db(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT valor FROM estadisticas_agregadas WHERE clave = 'estado:finalizada'")).scalar() == 3
+    engine.dispose()
@@ -0,0 +1,108 @@
+# tests/test_query_plans.py
+
+import re
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database import init_db
+from app.repositories import PartidaRepository, JugadorRepository
+from app.schemas import EstadoPartidaEnum, JugadaEnum, GranularidadEnum
+from app.services import JuegoService
+
+# Un recorrido completo de una tabla sin índice aparece como "SCAN <tabla>" a secas
+SCAN_COMPLETO = re.compile(r"^SCAN (\w+)$")
+
+# Agregados sobre toda la tabla que sólo se usan al reconstruir los contadores
+RECORRIDOS_PERMITIDOS = {
+    "obtener_conteos_partidas": {"partidas"},
+    "reconstruir_contadores": {"partidas", "estadisticas_agregadas"},
+    "iterar_jugadas": {"jugadas"},  # exportación completa, en orden de id
+    "reconstruir_ranking": {"jugadores"},  # carga de la clasificación al arrancar
+}
+
+@pytest.fixture
+def entorno():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    init_db(engine)
+    db = sessionmaker(bind=engine)()
+    consultas = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def capturar(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE")):
+            consultas.append((statement, parameters[0] if executemany else parameters))
+
+    partida_repo = PartidaRepository(db)
+    jugador_repo = JugadorRepository(db)
+    servicio = JuegoService(partida_repo, jugador_repo)
+    jugador = jugador_repo.get_or_create("Jugador1", "humano")
+    maquina = jugador_repo.get_or_create("Máquina", "maquina")
+    partida = servicio.iniciar_partida(jugador, maquina)
+    servicio.registrar_jugada(partida, jugador, JugadaEnum.PIEDRA, JugadaEnum.TIJERA)
+    servicio.finalizar_partida(partida, jugador)
+    consultas.clear()
+    yield engine, consultas, partida_repo, jugador_repo, jugador
+    db.close()
+    engine.dispose()
+
+def planes(engine, consultas):
+    with engine.connect() as conn:
+        for statement, parameters in consultas:
+            filas = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            yield statement, [fila[-1] for fila in filas]
+
+# Cada consulta de los repositorios, con los argumentos necesarios
+CONSULTAS = {
+    "obtener_info_global": lambda p, j, jugador: p.obtener_info_global(),
+    "obtener_estadisticas_partidas": lambda p, j, jugador: p.obtener_estadisticas_partidas(),
+    "obtener_conteos_partidas": lambda p, j, jugador: p.obtener_conteos_partidas(),
+    "obtener_conteos_agregados": lambda p, j, jugador: p.obtener_conteos_agregados(),
+    "obtener_mano_fuerte": lambda p, j, jugador: p.obtener_mano_fuerte(),
+    "obtener_mano_debil": lambda p, j, jugador: p.obtener_mano_debil(),
+    "obtener_contadores": lambda p, j, jugador: p.obtener_contadores(["estado:finalizada"]),
+    "reconstruir_contadores": lambda p, j, jugador: p.reconstruir_contadores(),
+    "guardar_lote": lambda p, j, jugador: p.guardar_lote([
+        {"estado": EstadoPartidaEnum.FINALIZADA, "ganador_id": jugador.id, "jugadas": []}
+    ]),
+    "iterar_jugadas": lambda p, j, jugador: list(p.iterar(p.consulta_jugadas())),
+    "iterar_jugadas_filtradas": lambda p, j, jugador: list(p.iterar(p.consulta_jugadas(1, 100, jugador.id))),
+    "iterar_partidas_filtradas": lambda p, j, jugador: list(p.iterar(p.consulta_partidas(1, 100, jugador.id))),
+    "obtener_estadisticas_periodo": lambda p, j, jugador: p.obtener_estadisticas_periodo(
+        datetime(2024, 1, 1), datetime(2024, 1, 2), GranularidadEnum.MINUTO
+    ),
+    "obtener_ranking": lambda p, j, jugador: j.obtener_ranking(),
+    "obtener_estadisticas_jugador": lambda p, j, jugador: j.obtener_estadisticas(jugador.id),
+    "obtener_ranking_pagina": lambda p, j, jugador: j.obtener_ranking(10, 5),
+    "obtener_posicion": lambda p, j, jugador: j.obtener_posicion(jugador.id),
+    "reconstruir_ranking": lambda p, j, jugador: j.reconstruir_ranking(),
+    "get_or_create": lambda p, j, jugador: j.get_or_create("Nuevo", "humano"),
+    "obtener_id": lambda p, j, jugador: j.obtener_id("Nuevo", "humano"),
+    "obtener_o_crear_lote": lambda p, j, jugador: j.obtener_o_crear_lote([("Jugador1", "humano"), ("Nuevo", "maquina")]),
+}
+
+@pytest.mark.parametrize("nombre", sorted(CONSULTAS))
+def test_consultas_sin_recorrido_completo(entorno, nombre):
+    engine, consultas, partida_repo, jugador_repo, jugador = entorno
+
+    CONSULTAS[nombre](partida_repo, jugador_repo, jugador)
+
+    assert consultas, f"{nombre} no ejecutó ninguna consulta"
+    for statement, detalles in planes(engine, consultas):
+        for detalle in detalles:
+            scan = SCAN_COMPLETO.match(detalle)
+            assert not scan or scan.group(1) in RECORRIDOS_PERMITIDOS.get(nombre, ()), f"{nombre}: {detalle}\n{statement}"
+            assert "TEMP B-TREE FOR ORDER BY" not in detalle, f"{nombre}: {detalle}\n{statement}"
+
+def test_indices_creados_en_bases_existentes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'game.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE jugadores (id INTEGER PRIMARY KEY, nombre VARCHAR, tipo VARCHAR, puntos INTEGER)"))
+
+    init_db(engine)
+
+    with engine.connect() as conn:
+        indices = {fila[1] for fila in conn.exec_driver_sql("PRAGMA index_list('jugadores')")}
+    assert {"ux_jugadores_nombre", "ix_jugadores_puntos"} <= indices
+    engine.dispose()
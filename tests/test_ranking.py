@@ -0,0 +1,32 @@
+# tests/test_ranking.py
+
+from app.ranking import Clasificacion
+
+def test_pagina_ordenada_por_puntos_e_id():
+    clasificacion = Clasificacion()
+    clasificacion.reconstruir("sqlite://", [1, 2, 3, 4], [5, 9, 5, 0])
+
+    assert clasificacion.activa("sqlite://")
+    assert not clasificacion.activa("otra.db")
+    assert clasificacion.pagina(3) == [(2, 9), (1, 5), (3, 5)]
+    assert clasificacion.pagina(10, offset=2) == [(3, 5), (4, 0)]
+
+def test_posicion_con_empates():
+    clasificacion = Clasificacion()
+    clasificacion.reconstruir("sqlite://", [1, 2, 3, 4], [5, 9, 5, 0])
+
+    assert clasificacion.posicion(2) == (1, 9)
+    assert clasificacion.posicion(1) == (2, 5)
+    assert clasificacion.posicion(3) == (2, 5)
+    assert clasificacion.posicion(4) == (4, 0)
+    assert clasificacion.posicion(99) is None
+
+def test_sumar_mueve_y_anade_jugadores():
+    clasificacion = Clasificacion()
+    clasificacion.reconstruir("sqlite://", [1, 2], [1, 2])
+
+    clasificacion.sumar({1: 2, 5000: 0, 7: 4})
+
+    assert clasificacion.pagina(10) == [(7, 4), (1, 3), (2, 2), (5000, 0)]
+    assert clasificacion.posicion(5000) == (4, 0)
+    assert len(clasificacion) == 4
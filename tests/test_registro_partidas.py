@@ -0,0 +1,103 @@
+# tests/test_registro_partidas.py
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from app.database import init_db
+from app.models import Jugador, Partida, Jugada
+from app.registro_partidas import (
+    DTYPE_REGISTRO, EscritorRegistro, leer_registro, leer_jugadores, iterar_bloques, estadisticas_registro,
+    importar_registro
+)
+from app.repositories import PartidaRepository
+from app.schemas import JugadaEnum
+from app.services import SimuladorVectorizado
+from app.simulacion import simular_a_registro
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'game.db'}")
+    init_db(engine)
+    sesion = sessionmaker(bind=engine)()
+    yield sesion
+    sesion.close()
+    engine.dispose()
+
+def _registros(filas):
+    return np.array(filas, dtype=DTYPE_REGISTRO)
+
+def test_escritor_y_lector_registro(tmp_path):
+    ruta = str(tmp_path / "partidas.bin")
+    bloque = SimuladorVectorizado(semilla=1).simular_bloque(5)
+
+    with EscritorRegistro(ruta) as escritor:
+        escritor.registrar_jugador(1, "Ana", "humano")
+        assert escritor.escribir_bloque(bloque, 1, 2) == 5
+    registros = leer_registro(ruta)
+
+    assert isinstance(registros, np.memmap)
+    assert len(registros) == 15
+    assert registros["partida"].tolist() == [p for p in range(1, 6) for _ in range(3)]
+    assert registros["tipo"].tolist() == bloque["jugadas_jugador1"].ravel().tolist()
+    assert registros["resultado"].tolist() == bloque["resultados"].ravel().tolist()
+    assert leer_jugadores(ruta) == {1: {"nombre": "Ana", "tipo": "humano"}}
+
+def test_escritor_continua_la_numeracion_y_descarta_registros_incompletos(tmp_path):
+    ruta = str(tmp_path / "partidas.bin")
+    simular_a_registro(ruta, 4, 3, semilla=1)
+    with open(ruta, "ab") as fichero:
+        fichero.write(b"\x01\x02\x03")
+
+    simular_a_registro(ruta, 2, 3, semilla=2)
+
+    partidas = leer_registro(ruta)["partida"]
+    assert len(partidas) == 18
+    assert partidas[-1] == 6
+
+def test_leer_registro_rechaza_otros_ficheros(tmp_path):
+    ruta = tmp_path / "otro.bin"
+    ruta.write_bytes(b"no es un registro de partidas")
+
+    with pytest.raises(ValueError):
+        leer_registro(str(ruta))
+
+def test_iterar_bloques_no_parte_partidas():
+    registros = _registros([(p, 1, 2, 0, 0) for p in (1, 1, 1, 2, 2, 2, 3, 4, 4)])
+
+    bloques = [bloque["partida"].tolist() for bloque in iterar_bloques(registros, tamano_bloque=4)]
+
+    assert bloques == [[1, 1, 1], [2, 2, 2, 3], [4, 4]]
+    # Un bloque menor que una partida se amplía hasta su final
+    assert [len(bloque) for bloque in iterar_bloques(registros, tamano_bloque=2)] == [3, 3, 1, 2]
+
+def test_estadisticas_registro():
+    # Partida 1: gana el jugador 1; partida 2: empate, gana el rival
+    registros = _registros([
+        (1, 1, 2, 0, 1), (1, 1, 2, 0, 1), (1, 1, 2, 2, 2),
+        (2, 1, 2, 1, 0), (2, 1, 2, 1, 1), (2, 1, 2, 2, 2),
+    ])
+
+    estadisticas = estadisticas_registro(registros, tamano_bloque=2)
+
+    assert estadisticas["total_partidas"] == 2
+    assert estadisticas["puntos"] == {1: 1, 2: 1}
+    assert estadisticas["jugadas_por_resultado"].tolist() == [[0, 2, 0], [1, 1, 0], [0, 0, 2]]
+    assert estadisticas["mano_fuerte"] == (JugadaEnum.PIEDRA, pytest.approx(200 / 3))
+    assert estadisticas["mano_debil"] == (JugadaEnum.TIJERA, 100)
+
+def test_importar_registro_coincide_con_sus_estadisticas(tmp_path, db):
+    ruta = str(tmp_path / "partidas.bin")
+    simular_a_registro(ruta, 50, 20, semilla=3)
+    estadisticas = estadisticas_registro(leer_registro(ruta))
+
+    assert importar_registro(db, ruta, batch_size=20) == 50
+
+    repo = PartidaRepository(db)
+    assert db.query(func.count(Partida.id)).scalar() == 50
+    assert db.query(func.count(Jugada.id)).scalar() == 150
+    assert repo.obtener_conteos_partidas()["partidas_ganadas"] == 50
+    assert repo.obtener_mano_fuerte() == estadisticas["mano_fuerte"]
+    assert repo.obtener_mano_debil() == estadisticas["mano_debil"]
+    puntos = dict(db.query(Jugador.nombre, Jugador.puntos).all())
+    assert puntos == {"Máquina 1": estadisticas["puntos"][1], "Máquina 2": estadisticas["puntos"][2]}
@@ -0,0 +1,367 @@
+# tests/test_repositories.py
+
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import create_engine, event, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.cache import cache_consultas, mapa_jugadores
+from app.ranking import clasificacion
+from app.database import init_db
+from app.models import Jugador, Partida, EstadisticaPeriodo
+from app.repositories import PartidaRepository, JugadorRepository, CLAVE_PARTIDAS_GANADAS
+from app.schemas import EstadoPartidaEnum, JugadaEnum, GranularidadEnum
+from app.services import JuegoService
+
+# Sesión sobre una base de datos SQLite en memoria
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    init_db(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+def test_obtener_conteos_partidas_vacio(db):
+    assert PartidaRepository(db).obtener_conteos_partidas() == {
+        "total_partidas": 0,
+        "partidas_ganadas": 0,
+        "partidas_abandonadas": 0
+    }
+
+def test_obtener_conteos_partidas(db):
+    jugador = Jugador(nombre="Jugador1", tipo="humano", puntos=0)
+    db.add(jugador)
+    db.commit()
+    db.add_all([
+        Partida(estado=EstadoPartidaEnum.FINALIZADA, ganador_id=jugador.id),
+        Partida(estado=EstadoPartidaEnum.FINALIZADA, ganador_id=jugador.id),
+        Partida(estado=EstadoPartidaEnum.ABANDONADA),
+        Partida(estado=EstadoPartidaEnum.EN_CURSO),
+    ])
+    db.commit()
+    repo = PartidaRepository(db)
+
+    assert repo.obtener_conteos_partidas() == {
+        "total_partidas": 4,
+        "partidas_ganadas": 2,
+        "partidas_abandonadas": 1
+    }
+    repo.reconstruir_contadores()
+    assert repo.obtener_info_global() == {
+        "total_victorias": 2,
+        "total_derrotas": 1,
+        "total_partidas": 4,
+        "winrate": 50.0
+    }
+
+def test_guardar_lote_actualiza_puntos(db):
+    jugador_repo = JugadorRepository(db)
+    jugador1 = jugador_repo.get_or_create("Máquina 1", "maquina")
+    jugador2 = jugador_repo.get_or_create("Máquina 2", "maquina")
+    jugadas = [{"jugador_id": jugador1.id, "tipo": "piedra", "resultado": "ganada"}]
+
+    ids = PartidaRepository(db).guardar_lote([
+        {"estado": EstadoPartidaEnum.FINALIZADA, "ganador_id": jugador1.id, "jugadas": jugadas},
+        {"estado": EstadoPartidaEnum.FINALIZADA, "ganador_id": jugador2.id, "jugadas": jugadas},
+        {"estado": EstadoPartidaEnum.FINALIZADA, "ganador_id": jugador1.id, "jugadas": jugadas},
+    ])
+
+    assert len(ids) == 3
+    assert (jugador1.puntos, jugador2.puntos) == (2, 1)
+
+def test_contadores_incrementales_coinciden_con_reconstruccion(db):
+    partida_repo = PartidaRepository(db)
+    jugador_repo = JugadorRepository(db)
+    servicio = JuegoService(partida_repo, jugador_repo)
+    jugador = jugador_repo.get_or_create("Jugador1", "humano")
+    maquina = jugador_repo.get_or_create("Máquina", "maquina")
+
+    partida = servicio.iniciar_partida(jugador, maquina)
+    servicio.registrar_jugada(partida, jugador, JugadaEnum.PIEDRA, JugadaEnum.TIJERA)
+    servicio.registrar_jugada(partida, jugador, JugadaEnum.PAPEL, JugadaEnum.TIJERA)
+    servicio.finalizar_partida(partida, maquina)
+    abandonada = servicio.iniciar_partida(jugador, maquina)
+    servicio.marcar_abandonada(abandonada)
+    servicio.iniciar_partida(jugador, maquina)
+    partida_repo.guardar_lote([{"estado": EstadoPartidaEnum.FINALIZADA, "ganador_id": jugador.id, "jugadas": [
+        {"jugador_id": jugador.id, "tipo": JugadaEnum.PIEDRA, "resultado": "ganada"}
+    ]}])
+
+    estadisticas = partida_repo.obtener_estadisticas_partidas()
+    mano_fuerte = partida_repo.obtener_mano_fuerte()
+    mano_debil = partida_repo.obtener_mano_debil()
+    partida_repo.reconstruir_contadores()
+
+    assert estadisticas == partida_repo.obtener_conteos_partidas()
+    assert estadisticas == {"total_partidas": 4, "partidas_ganadas": 2, "partidas_abandonadas": 1}
+    assert mano_fuerte == partida_repo.obtener_mano_fuerte() == (JugadaEnum.PIEDRA, 100.0)
+    assert mano_debil == partida_repo.obtener_mano_debil() == (JugadaEnum.PAPEL, 100.0)
+
+def test_lecturas_cacheadas_se_invalidan_al_escribir(db):
+    partida_repo = PartidaRepository(db)
+    jugador_repo = JugadorRepository(db)
+    servicio = JuegoService(partida_repo, jugador_repo)
+    jugador = jugador_repo.get_or_create("Jugador1", "humano")
+    maquina = jugador_repo.get_or_create("Máquina", "maquina")
+
+    assert partida_repo.obtener_estadisticas_partidas()["total_partidas"] == 0
+    servicio.iniciar_partida(jugador, maquina)
+
+    assert partida_repo.obtener_estadisticas_partidas()["total_partidas"] == 1
+
+def test_obtener_id_usa_el_mapa_de_jugadores(db):
+    jugador_repo = JugadorRepository(db)
+    existente = jugador_repo.get_or_create("Jugador1", "humano").id
+    mapa_jugadores.limpiar()
+    db.expunge_all()
+    consultas = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: consultas.append(args[2]))
+
+    # Un jugador que ya existe se consulta una vez, sin upsert ni commit
+    assert jugador_repo.obtener_id("Jugador1", "humano") == existente
+    assert jugador_repo.obtener_id("Jugador1", "humano") == existente
+    assert len(consultas) == 1 and consultas[0].startswith("SELECT")
+    # get_or_create carga la fila por id una vez por sesión
+    assert jugador_repo.get_or_create("Jugador1", "humano").id == existente
+    assert jugador_repo.get_or_create("Jugador1", "humano").id == existente
+
+    assert len(consultas) == 2
+    assert mapa_jugadores.aciertos == 3
+
+def test_obtener_id_no_confirma_los_jugadores_nuevos(db):
+    jugador_repo = JugadorRepository(db)
+    base_de_datos = jugador_repo._base_de_datos()
+    jugador_repo.reconstruir_ranking()
+
+    nuevo = jugador_repo.obtener_id("Nuevo", "humano")
+    assert jugador_repo.obtener_id("Nuevo", "humano") == nuevo
+    # Hasta el commit no entra en el mapa ni en la clasificación
+    assert mapa_jugadores.obtener(base_de_datos, "Nuevo") is None
+    assert clasificacion.posicion(nuevo) is None
+    db.commit()
+    assert mapa_jugadores.obtener(base_de_datos, "Nuevo") == nuevo
+    assert clasificacion.posicion(nuevo) == (1, 0)
+
+    descartado = jugador_repo.obtener_id("Descartado", "humano")
+    db.rollback()
+    db.commit()
+    assert mapa_jugadores.obtener(base_de_datos, "Descartado") is None
+    assert clasificacion.posicion(descartado) is None
+    assert db.query(Jugador).filter(Jugador.nombre == "Descartado").count() == 0
+
+def test_obtener_id_con_el_jugador_creado_en_otra_sesion(db):
+    otra_sesion = sessionmaker(bind=db.get_bind())()
+    jugador_id = JugadorRepository(otra_sesion).obtener_id("Jugador1", "humano")
+    otra_sesion.close()
+    mapa_jugadores.limpiar()
+
+    assert JugadorRepository(db).obtener_id("Jugador1", "maquina") == jugador_id
+    assert db.query(Jugador).count() == 1
+
+def test_obtener_o_crear_lote_solo_guarda_en_el_mapa_jugadores_confirmados(db):
+    jugador_repo = JugadorRepository(db)
+    existente = jugador_repo.obtener_id("Jugador1", "humano")
+    mapa_jugadores.limpiar()
+
+    ids = jugador_repo.obtener_o_crear_lote([("Jugador1", "humano"), ("Nuevo", "maquina")])
+    db.rollback()
+
+    assert ids["Jugador1"] == existente
+    assert mapa_jugadores.obtener(jugador_repo._base_de_datos(), "Jugador1") == existente
+    assert mapa_jugadores.obtener(jugador_repo._base_de_datos(), "Nuevo") is None
+    assert db.query(Jugador).filter(Jugador.nombre == "Nuevo").count() == 0
+
+def test_terminar_una_partida_dos_veces_no_cambia_los_contadores(db):
+    partida_repo = PartidaRepository(db)
+    jugador_repo = JugadorRepository(db)
+    servicio = JuegoService(partida_repo, jugador_repo)
+    jugador = jugador_repo.get_or_create("Jugador1", "humano")
+    maquina = jugador_repo.get_or_create("Máquina", "maquina")
+    finalizada = servicio.iniciar_partida(jugador, maquina)
+    abandonada = servicio.iniciar_partida(jugador, maquina)
+
+    for _ in range(2):
+        servicio.finalizar_partida(finalizada, jugador)
+        servicio.marcar_abandonada(abandonada)
+
+    claves = ["estado:en curso", "estado:finalizada", "estado:abandonada"]
+    esperados = {"estado:en curso": 0, "estado:finalizada": 1, "estado:abandonada": 1}
+    assert partida_repo.obtener_contadores(claves) == esperados
+    estadisticas = jugador_repo.obtener_estadisticas(maquina.id)
+    assert (estadisticas["total_partidas"], estadisticas["partidas_abandonadas"]) == (2, 1)
+    assert partida_repo.reconstruir_contadores() == {**partida_repo.obtener_contadores(claves[1:]), "partidas:ganadas": 1}
+
+def test_cacheado_admite_argumentos_por_nombre(db):
+    jugador_repo = JugadorRepository(db)
+    jugador_repo.get_or_create("Jugador1", "humano")
+
+    ranking = jugador_repo.obtener_ranking(top=3)
+    aciertos = cache_consultas.aciertos
+    # Las llamadas equivalentes comparten la entrada de la caché
+    assert jugador_repo.obtener_ranking(3) == ranking
+    assert jugador_repo.obtener_ranking(3, 0) == ranking
+    assert jugador_repo.obtener_ranking(offset=0, top=3) == ranking
+    assert cache_consultas.aciertos == aciertos + 3
+    assert jugador_repo.obtener_ranking(top=3, offset=1) == []
+
+def test_ranking_en_memoria_coincide_con_la_base_de_datos(db):
+    partida_repo = PartidaRepository(db)
+    jugador_repo = JugadorRepository(db)
+    servicio = JuegoService(partida_repo, jugador_repo)
+    jugadores = [jugador_repo.get_or_create(f"Jugador{i}", "humano") for i in range(5)]
+    jugador_repo.reconstruir_ranking()
+
+    servicio.finalizar_partida(servicio.iniciar_partida(jugadores[3], jugadores[0]), jugadores[3])
+    servicio.registrar_partidas_simuladas([
+        {"estado": EstadoPartidaEnum.FINALIZADA, "ganador_id": jugadores[1].id, "jugadas": []},
+        {"estado": EstadoPartidaEnum.FINALIZADA, "ganador_id": jugadores[1].id, "jugadas": []},
+    ])
+    nuevo = jugador_repo.obtener_id("Nuevo", "maquina")
+    db.commit()
+    en_memoria = [jugador_repo.obtener_ranking(top, offset) for top, offset in ((3, 0), (10, 2))]
+    posiciones = [jugador_repo.obtener_posicion(jugador.id) for jugador in jugadores]
+    clasificacion.limpiar()
+    cache_consultas.limpiar()
+
+    assert en_memoria == [jugador_repo.obtener_ranking(top, offset) for top, offset in ((3, 0), (10, 2))]
+    assert posiciones == [jugador_repo.obtener_posicion(jugador.id) for jugador in jugadores]
+    assert [jugador["id"] for jugador in en_memoria[0]] == [jugadores[1].id, jugadores[3].id, jugadores[0].id]
+    assert en_memoria[1][-1]["id"] == nuevo
+    assert posiciones[2] == {"id": jugadores[2].id, "nombre": "Jugador2", "tipo": "humano", "puntos": 0, "posicion": 3}
+
+def test_ranking_en_memoria_detecta_escrituras_de_otro_proceso(db, monkeypatch):
+    partida_repo = PartidaRepository(db)
+    jugador_repo = JugadorRepository(db)
+    servicio = JuegoService(partida_repo, jugador_repo)
+    jugadores = [jugador_repo.get_or_create(f"Jugador{i}", "humano") for i in range(3)]
+    jugador_repo.reconstruir_ranking()
+    reconstruir = clasificacion.reconstruir
+    reconstrucciones = []
+    monkeypatch.setattr(clasificacion, "reconstruir", lambda *args: reconstrucciones.append(1) or reconstruir(*args))
+    monkeypatch.setattr(cache_consultas, "ttl", 0)
+
+    # Las escrituras del propio proceso avanzan la versión de la clasificación
+    servicio.finalizar_partida(servicio.iniciar_partida(jugadores[0], jugadores[1]), jugadores[0])
+    jugador_repo.obtener_id("Nuevo", "maquina")
+    db.commit()
+    assert jugador_repo.obtener_ranking(1)[0]["id"] == jugadores[0].id
+    assert reconstrucciones == []
+
+    # Otro proceso suma dos puntos al tercer jugador
+    db.execute(update(Jugador).where(Jugador.id == jugadores[2].id).values(puntos=Jugador.puntos + 2))
+    partida_repo.incrementar_contadores({CLAVE_PARTIDAS_GANADAS: 2})
+    db.commit()
+    monkeypatch.setattr(cache_consultas, "ttl", 60)
+    assert jugador_repo.obtener_ranking(1)[0]["id"] == jugadores[0].id  # aún dentro del TTL
+    monkeypatch.setattr(cache_consultas, "ttl", 0)
+
+    assert jugador_repo.obtener_ranking(1)[0] == {"id": jugadores[2].id, "nombre": "Jugador2", "tipo": "humano", "puntos": 2}
+    assert jugador_repo.obtener_posicion(jugadores[0].id)["posicion"] == 2
+    assert reconstrucciones == [1]
+
+def test_estadisticas_periodo_coinciden_con_contadores_y_reconstruccion(db):
+    partida_repo = PartidaRepository(db)
+    jugador_repo = JugadorRepository(db)
+    servicio = JuegoService(partida_repo, jugador_repo)
+    jugador = jugador_repo.get_or_create("Jugador1", "humano")
+    maquina = jugador_repo.get_or_create("Máquina", "maquina")
+
+    servicio.finalizar_partida(servicio.iniciar_partida(jugador, maquina), jugador)
+    servicio.marcar_abandonada(servicio.iniciar_partida(jugador, maquina))
+    servicio.iniciar_partida(jugador, maquina)
+    partida_repo.guardar_lote([
+        {"estado": EstadoPartidaEnum.FINALIZADA, "ganador_id": maquina.id, "jugadas": [], "finalizada_en": datetime(2024, 1, 1, 10, 30)},
+        {"estado": EstadoPartidaEnum.ABANDONADA, "ganador_id": None, "jugadas": [],
+         "finalizada_en": datetime(2024, 1, 1, 13, 0, tzinfo=timezone(timedelta(hours=2)))},
+    ])
+
+    por_granularidad = {g: partida_repo.obtener_estadisticas_periodo(None, None, g) for g in GranularidadEnum}
+    partida_repo.reconstruir_contadores()
+    cache_consultas.limpiar()
+
+    for granularidad, estadisticas in por_granularidad.items():
+        assert estadisticas == partida_repo.obtener_estadisticas_periodo(None, None, granularidad)
+        assert estadisticas["total_partidas"] == 4
+        assert estadisticas["partidas_ganadas"] == 2
+        assert estadisticas["partidas_abandonadas"] == 2
+    assert por_granularidad[GranularidadEnum.HORA]["periodos"][:2] == [
+        {"inicio": datetime(2024, 1, 1, 10, tzinfo=timezone.utc), "total_partidas": 1, "partidas_ganadas": 1, "partidas_abandonadas": 0},
+        {"inicio": datetime(2024, 1, 1, 11, tzinfo=timezone.utc), "total_partidas": 1, "partidas_ganadas": 0, "partidas_abandonadas": 1},
+    ]
+    assert partida_repo.obtener_estadisticas_periodo(
+        datetime(2024, 1, 1, 10, 45), datetime(2024, 1, 1, 11), GranularidadEnum.HORA
+    )["total_partidas"] == 1
+    assert partida_repo.obtener_estadisticas_periodo(
+        datetime(2024, 1, 1, 10, 45), datetime(2024, 1, 1, 11), GranularidadEnum.MINUTO
+    )["total_partidas"] == 0
+
+def test_reconstruir_periodos_dos_veces_rehace_las_filas(db):
+    partida_repo = PartidaRepository(db)
+    jugador_repo = JugadorRepository(db)
+    servicio = JuegoService(partida_repo, jugador_repo)
+    jugador = jugador_repo.get_or_create("Jugador1", "humano")
+    maquina = jugador_repo.get_or_create("Máquina", "maquina")
+    servicio.finalizar_partida(servicio.iniciar_partida(jugador, maquina), jugador)
+    columnas = (EstadisticaPeriodo.granularidad, EstadisticaPeriodo.inicio, EstadisticaPeriodo.clave, EstadisticaPeriodo.valor)
+
+    partida_repo._reconstruir_periodos()
+    db.commit()
+    filas = db.query(*columnas).order_by(*columnas).all()
+    # Sin invalidar la caché entre medias, la segunda reconstrucción también borra y rehace las filas
+    db.add(EstadisticaPeriodo(granularidad="hora", inicio=0, clave="basura", valor=99))
+    db.commit()
+    partida_repo._reconstruir_periodos()
+    db.commit()
+
+    assert filas
+    assert db.query(*columnas).order_by(*columnas).all() == filas
+
+def test_obtener_estadisticas_partidas_esta_cacheado(db):
+    partida_repo = PartidaRepository(db)
+
+    partida_repo.obtener_estadisticas_partidas()
+    aciertos = cache_consultas.aciertos
+    partida_repo.obtener_estadisticas_partidas()
+
+    assert cache_consultas.aciertos == aciertos + 1
+
+def test_estadisticas_jugador_incrementales_coinciden_con_reconstruccion(db):
+    partida_repo = PartidaRepository(db)
+    jugador_repo = JugadorRepository(db)
+    servicio = JuegoService(partida_repo, jugador_repo)
+    jugador = jugador_repo.get_or_create("Jugador1", "humano")
+    maquina = jugador_repo.get_or_create("Máquina", "maquina")
+
+    partida = servicio.iniciar_partida(jugador, maquina)
+    servicio.registrar_jugada(partida, jugador, JugadaEnum.PIEDRA, JugadaEnum.TIJERA)
+    servicio.registrar_jugada(partida, jugador, JugadaEnum.PAPEL, JugadaEnum.TIJERA)
+    servicio.finalizar_partida(partida, maquina)
+    servicio.marcar_abandonada(servicio.iniciar_partida(jugador, maquina))
+    servicio.registrar_partidas_simuladas([servicio.resolver_partida(
+        jugador, maquina, [JugadaEnum.PIEDRA, JugadaEnum.PIEDRA], [JugadaEnum.TIJERA, JugadaEnum.PAPEL]
+    )])
+
+    estadisticas = jugador_repo.obtener_estadisticas(jugador.id)
+    estadisticas_maquina = jugador_repo.obtener_estadisticas(maquina.id)
+    partida_repo.reconstruir_contadores()
+
+    assert estadisticas == jugador_repo.obtener_estadisticas(jugador.id)
+    assert estadisticas_maquina == jugador_repo.obtener_estadisticas(maquina.id)
+    assert estadisticas == {
+        "id": jugador.id,
+        "nombre": "Jugador1",
+        "total_partidas": 3,
+        "total_victorias": 0,
+        "total_derrotas": 2,
+        "partidas_abandonadas": 1,
+        "winrate": 0,
+        "distribucion_manos": {"piedra": 3, "papel": 1, "tijera": 0},
+        "mano_fuerte": {"mano": "piedra", "porcentaje_victorias": 100.0},
+        "mano_debil": {"mano": "piedra", "porcentaje_derrotas": 50.0}
+    }
+    assert estadisticas_maquina["total_victorias"] == 2
+    assert estadisticas_maquina["winrate"] == pytest.approx(200 / 3)
+    assert estadisticas_maquina["mano_fuerte"] is None
+    assert jugador_repo.obtener_estadisticas(999) is None
@@ -2,8 +2,12 @@
 
 import pytest
 from unittest.mock import MagicMock
-from app.services import JuegoService
+from app.services import (
+    JuegoService, SimuladorVectorizado, TABLA_RESULTADOS, JUGADAS, RESULTADOS, GANA_A, CODIGOS_JUGADAS,
+    EstrategiaMarkov, EstrategiaMixta, ESTRATEGIAS, crear_estrategia
+)
 from app.models import Jugador, Partida, JugadaEnum
+from app.schemas import LotePartidas
 
 @pytest.fixture
 def setup_service():
@@ -50,5 +54,169 @@ def test_finalizar_partida(setup_service):
     servicio.finalizar_partida(partida, jugador)
 
     partida_repo.save.assert_called_once()
+    partida_repo.incrementar_contadores.assert_called_once_with({
+        "estado:en curso": -1,
+        "estado:finalizada": 1,
+        "partidas:ganadas": 1
+    }, partida.finalizada_en)
     assert partida.estado == 'finalizada'
     assert jugador.puntos == 1
+
+def test_marcar_abandonada(setup_service):
+    servicio, partida_repo, _ = setup_service
+    partida = Partida(id=1, estado='en curso')
+
+    servicio.marcar_abandonada(partida)
+
+    partida_repo.save.assert_called_once()
+    partida_repo.incrementar_contadores.assert_called_once_with({
+        "estado:en curso": -1,
+        "estado:abandonada": 1
+    }, partida.finalizada_en)
+    assert partida.estado == 'abandonada'
+
+def test_resolver_partida(setup_service):
+    servicio, partida_repo, _ = setup_service
+    jugador1 = Jugador(id=1, nombre="Máquina 1", tipo="maquina")
+    jugador2 = Jugador(id=2, nombre="Máquina 2", tipo="maquina")
+
+    partida = servicio.resolver_partida(
+        jugador1, jugador2,
+        [JugadaEnum.PIEDRA, JugadaEnum.PAPEL, JugadaEnum.TIJERA],
+        [JugadaEnum.TIJERA, JugadaEnum.PAPEL, JugadaEnum.PIEDRA]
+    )
+
+    partida_repo.save.assert_not_called()
+    assert partida["ganador_id"] == 2
+    assert partida["estado"] == 'finalizada'
+    assert [j["resultado"] for j in partida["jugadas"]] == ['ganada', 'empate', 'perdida']
+
+def test_registrar_partidas_simuladas(setup_service):
+    servicio, partida_repo, _ = setup_service
+    partida_repo.guardar_lote.return_value = [1, 2]
+
+    ids = servicio.registrar_partidas_simuladas([{}, {}])
+
+    partida_repo.guardar_lote.assert_called_once_with([{}, {}])
+    assert ids == [1, 2]
+
+def test_tabla_resultados_coincide_con_determinar_resultado(setup_service):
+    servicio, _, _ = setup_service
+    for i, jugada_jugador in enumerate(JUGADAS):
+        for j, jugada_maquina in enumerate(JUGADAS):
+            resultado = servicio.determinar_resultado(jugada_jugador, jugada_maquina)
+            assert RESULTADOS[TABLA_RESULTADOS[i, j]] == resultado
+
+def test_simulador_vectorizado():
+    simulador = SimuladorVectorizado(semilla=42, partidas_por_bloque=1000)
+
+    resumen = simulador.simular(2500, devolver_filas=True)
+
+    assert resumen["partidas"] == 2500
+    assert resumen["victorias_jugador1"] + resumen["victorias_jugador2"] == 2500
+    assert resumen["jugadas_por_resultado"].sum() == 2500 * 3
+    assert [len(bloque["gana_jugador1"]) for bloque in resumen["filas"]] == [1000, 1000, 500]
+
+def test_simulador_a_partidas_aplica_mejor_de_3(setup_service):
+    servicio, _, _ = setup_service
+    jugador1 = Jugador(id=1, nombre="Máquina 1", tipo="maquina")
+    jugador2 = Jugador(id=2, nombre="Máquina 2", tipo="maquina")
+    bloque = SimuladorVectorizado(semilla=7).simular_bloque(200)
+
+    partidas = SimuladorVectorizado.a_partidas(bloque, jugador1, jugador2)
+
+    for partida, tipos1, tipos2 in zip(partidas, bloque["jugadas_jugador1"], bloque["jugadas_jugador2"]):
+        esperada = servicio.resolver_partida(
+            jugador1, jugador2, [JUGADAS[t] for t in tipos1], [JUGADAS[t] for t in tipos2]
+        )
+        assert partida == esperada
+
+def test_registrar_partidas_lote(setup_service):
+    servicio, partida_repo, jugador_repo = setup_service
+    jugador_repo.obtener_o_crear_lote.return_value = {"Ana": 7, "Luis": 9}
+    partida_repo.guardar_lote.return_value = [1, 2]
+    partidas = LotePartidas(partidas=[
+        {"jugador1": {"nombre": "Ana", "tipo": "humano"}, "jugador2": {"nombre": "Luis", "tipo": "humano"}, "ganador": "Luis",
+         "jugadas": [{"jugada_jugador1": "piedra", "jugada_jugador2": "papel"}]},
+        {"jugador1": {"nombre": "Luis", "tipo": "humano"}, "jugador2": {"nombre": "Ana", "tipo": "humano"}, "estado": "abandonada",
+         "jugadas": [{"jugada_jugador1": "tijera", "jugada_jugador2": "papel"}]}
+    ]).partidas
+
+    ids = servicio.registrar_partidas_lote(partidas)
+
+    lote = partida_repo.guardar_lote.call_args.args[0]
+    assert ids == [1, 2]
+    assert [(p["estado"], p["ganador_id"]) for p in lote] == [('finalizada', 9), ('abandonada', None)]
+    assert lote[0]["jugadas"] == [{"jugador_id": 7, "tipo": 'piedra', "resultado": 'perdida'}]
+    assert lote[1]["jugadas"][0]["jugador_id"] == 9
+
+def test_registrar_partidas_lote_ganador_incoherente(setup_service):
+    servicio, partida_repo, jugador_repo = setup_service
+    partidas = LotePartidas(partidas=[
+        {"jugador1": {"nombre": "Ana", "tipo": "humano"}, "jugador2": {"nombre": "Luis", "tipo": "humano"}, "ganador": "Ana",
+         "jugadas": [{"jugada_jugador1": "piedra", "jugada_jugador2": "papel"}]}
+    ]).partidas
+
+    with pytest.raises(ValueError):
+        servicio.registrar_partidas_lote(partidas)
+
+    # No se crea ningún jugador ni se guarda nada si el lote no es válido
+    jugador_repo.obtener_o_crear_lote.assert_not_called()
+    partida_repo.guardar_lote.assert_not_called()
+
+
+def _fraccion_ganadas(estrategia, jugadas_rival):
+    ganadas = 0
+    for jugada_rival in jugadas_rival:
+        jugada = estrategia.elegir()
+        estrategia.observar(jugada_rival)
+        ganadas += TABLA_RESULTADOS[CODIGOS_JUGADAS[jugada], CODIGOS_JUGADAS[jugada_rival]] == 1
+    return ganadas / len(jugadas_rival)
+
+def test_gana_a_coincide_con_tabla_resultados():
+    for rival, jugada in enumerate(GANA_A):
+        assert TABLA_RESULTADOS[jugada, rival] == 1
+
+def test_crear_estrategia():
+    for nombre, clase in ESTRATEGIAS.items():
+        estrategia = crear_estrategia(nombre, 1)
+        assert isinstance(estrategia, clase)
+        assert estrategia.elegir() in JUGADAS
+    with pytest.raises(KeyError):
+        crear_estrategia("desconocida")
+
+def test_estrategia_aleatoria_es_reproducible():
+    estrategia_a = crear_estrategia("aleatoria", 7)
+    estrategia_b = crear_estrategia("aleatoria", 7)
+    assert [estrategia_a.elegir() for _ in range(20)] == [estrategia_b.elegir() for _ in range(20)]
+
+def test_estrategia_frecuencias_gana_a_rival_sesgado():
+    # El rival saca piedra la mitad de las veces
+    rival = [JugadaEnum.PIEDRA, JugadaEnum.PAPEL, JugadaEnum.PIEDRA, JugadaEnum.TIJERA] * 500
+
+    assert _fraccion_ganadas(crear_estrategia("frecuencias", 1), rival) > 0.45
+
+def test_estrategia_markov_aprende_ciclo():
+    rival = [JugadaEnum.PIEDRA, JugadaEnum.PAPEL, JugadaEnum.TIJERA] * 500
+
+    assert _fraccion_ganadas(EstrategiaMarkov(orden=1, semilla=1), rival) > 0.95
+    # Las frecuencias no detectan un ciclo uniforme
+    assert _fraccion_ganadas(crear_estrategia("frecuencias", 1), rival) < 0.5
+
+def test_estrategia_markov_contexto_rodante():
+    estrategia = EstrategiaMarkov(orden=2, semilla=1)
+    for jugada in [JugadaEnum.PIEDRA, JugadaEnum.PAPEL, JugadaEnum.TIJERA, JugadaEnum.PAPEL]:
+        estrategia.observar(jugada)
+
+    # Contexto: (tijera, papel) en base 3; tras (piedra, papel) vino tijera
+    assert estrategia._contexto == CODIGOS_JUGADAS[JugadaEnum.TIJERA] * 3 + CODIGOS_JUGADAS[JugadaEnum.PAPEL]
+    assert estrategia._conteos[(0 * 3 + 1) * 3 + 2] == 1
+    assert sum(estrategia._conteos) == 2
+
+def test_estrategia_mixta_elige_la_mejor():
+    rival = [JugadaEnum.PIEDRA, JugadaEnum.PAPEL, JugadaEnum.TIJERA] * 500
+    estrategia = EstrategiaMixta(exploracion=0.0, semilla=1)
+
+    assert _fraccion_ganadas(estrategia, rival) > 0.9
+    # Frecuencias (la primera) pierde frente al ciclo; las de Markov ganan
+    assert estrategia._puntuaciones[0] < estrategia._puntuaciones[1]
@@ -0,0 +1,37 @@
+# tests/test_simulacion.py
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from app.database import init_db
+from app.models import Jugador, Partida, Jugada
+from app.repositories import PartidaRepository, JugadorRepository
+from app.simulacion import simular_en_shard, fusionar_shard, simular_partidas_en_lotes
+
+def test_fusionar_shards_remapea_ids(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'game.db'}")
+    init_db(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Jugador(nombre="Ana", tipo="humano", puntos=0))
+    db.commit()
+    simular_partidas_en_lotes(db, 10, batch_size=4, semilla=1)
+
+    for i in range(2):
+        ruta = simular_en_shard(str(tmp_path / f"shard_{i}.db"), 25, batch_size=10, semilla=i)
+        assert fusionar_shard(engine, ruta) == 25
+
+    assert db.query(func.count(Partida.id)).scalar() == 60
+    assert db.query(func.count(func.distinct(Jugada.partida_id))).scalar() == 60
+    assert db.query(func.count(Jugador.id)).scalar() == 3
+    assert db.query(func.sum(Jugador.puntos)).scalar() == 60
+    for jugador in db.query(Jugador).all():
+        ganadas = db.query(func.count(Partida.id)).filter(Partida.ganador_id == jugador.id).scalar()
+        assert jugador.puntos == ganadas
+    repo = PartidaRepository(db)
+    assert repo.obtener_conteos_agregados() == repo.obtener_conteos_partidas()
+    jugador_repo = JugadorRepository(db)
+    ids = [jugador.id for jugador in db.query(Jugador).all()]
+    por_jugador = [jugador_repo.obtener_estadisticas(jugador_id) for jugador_id in ids]
+    repo.reconstruir_contadores()
+    assert por_jugador == [jugador_repo.obtener_estadisticas(jugador_id) for jugador_id in ids]
+    assert sum(estadisticas["total_victorias"] for estadisticas in por_jugador) == 60
+    db.close()
@@ -0,0 +1,100 @@
+# tests/test_tiempo_real.py
+
+import asyncio
+import pytest
+from fastapi import WebSocketDisconnect
+from app.schemas import EstadoPartidaEnum, JugadaEnum
+from app.services import JuegoService, Estrategia
+from app.tiempo_real import PartidaEnCurso, NOMBRE_MAQUINA, atender_jugador
+
+class EstrategiaFija(Estrategia):
+    def __init__(self, jugadas):
+        super().__init__()
+        self.jugadas = list(jugadas)
+        self.observadas = []
+
+    def elegir(self):
+        return self.jugadas.pop(0)
+
+    def observar(self, jugada_rival):
+        self.observadas.append(jugada_rival)
+
+def test_partida_en_curso_finaliza_al_mejor_de_3():
+    estrategia = EstrategiaFija([JugadaEnum.TIJERA, JugadaEnum.PIEDRA, JugadaEnum.PIEDRA])
+    partida = PartidaEnCurso("Ana", estrategia, JuegoService(None, None))
+
+    rondas = [partida.jugar(jugada) for jugada in (JugadaEnum.PIEDRA, JugadaEnum.TIJERA, JugadaEnum.PAPEL)]
+
+    assert [ronda["resultado"] for ronda in rondas] == ['ganada', 'perdida', 'ganada']
+    assert rondas[-1]["marcador"] == {"jugador": 2, "maquina": 1}
+    assert partida.estado == EstadoPartidaEnum.FINALIZADA and partida.ganador == "Ana"
+    assert estrategia.observadas == [JugadaEnum.PIEDRA, JugadaEnum.TIJERA, JugadaEnum.PAPEL]
+    with pytest.raises(ValueError):
+        partida.jugar(JugadaEnum.PIEDRA)
+    lote = partida.a_partida_lote()
+    assert (lote.jugador1.nombre, lote.jugador2.nombre, lote.ganador) == ("Ana", NOMBRE_MAQUINA, "Ana")
+    assert [jugada.jugada_jugador2 for jugada in lote.jugadas] == [JugadaEnum.TIJERA, JugadaEnum.PIEDRA, JugadaEnum.PIEDRA]
+
+def test_partida_en_curso_empate_gana_la_maquina():
+    partida = PartidaEnCurso("Ana", EstrategiaFija([JugadaEnum.PIEDRA] * 3), JuegoService(None, None))
+    for _ in range(3):
+        partida.jugar(JugadaEnum.PIEDRA)
+
+    assert partida.ganador == NOMBRE_MAQUINA
+
+def test_partida_en_curso_abandonada():
+    partida = PartidaEnCurso("Ana", EstrategiaFija([JugadaEnum.PIEDRA]), JuegoService(None, None))
+    partida.jugar(JugadaEnum.PAPEL)
+    partida.abandonar()
+
+    lote = partida.a_partida_lote()
+    assert lote.estado == EstadoPartidaEnum.ABANDONADA
+    assert lote.ganador is None and len(lote.jugadas) == 1
+
+class WebSocketFalso:
+    def __init__(self, mensajes):
+        self.mensajes = list(mensajes)
+        self.enviados = []
+
+    async def receive_text(self):
+        if not self.mensajes:
+            raise WebSocketDisconnect()
+        mensaje = self.mensajes.pop(0)
+        if isinstance(mensaje, Exception):
+            raise mensaje
+        return mensaje
+
+    async def send_json(self, datos):
+        self.enviados.append(datos)
+
+def test_atender_jugador_sigue_si_falla_el_guardado():
+    websocket = WebSocketFalso(['{"jugada": "piedra"}'] * 4)
+    guardadas = []
+
+    async def guardar(partida):
+        if not guardadas:
+            guardadas.append(None)
+            raise RuntimeError("base de datos bloqueada")
+        guardadas.append(partida.estado)
+        return len(guardadas)
+
+    asyncio.run(atender_jugador(websocket, "Ana", "aleatoria", guardar))
+
+    assert websocket.enviados[2]["error"] == "No se ha podido guardar la partida."
+    assert websocket.enviados[2]["partida_id"] is None
+    # La conexión sigue: la cuarta jugada empieza otra partida, que se guarda como abandonada
+    assert websocket.enviados[3]["ronda"] == 1
+    assert guardadas == [None, EstadoPartidaEnum.ABANDONADA]
+
+def test_atender_jugador_guarda_la_partida_abandonada_si_falla_la_conexion():
+    # receive_text lanza KeyError si el cliente envía un mensaje binario
+    websocket = WebSocketFalso(['{"jugada": "papel"}', KeyError("text")])
+    guardadas = []
+
+    async def guardar(partida):
+        guardadas.append(partida.estado)
+
+    with pytest.raises(KeyError):
+        asyncio.run(atender_jugador(websocket, "Ana", "aleatoria", guardar))
+
+    assert guardadas == [EstadoPartidaEnum.ABANDONADA]
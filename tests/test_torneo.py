@@ -0,0 +1,80 @@
+# tests/test_torneo.py
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from app.database import init_db
+from app.models import Jugador, Partida
+from app.services import EstrategiaMarkov, EstrategiaMixta
+from app.torneo import (
+    crear_estrategia_torneo, normalizar_estrategia_torneo, puntuaciones_partidas, calcular_elo,
+    jugar_enfrentamiento, jugar_torneo
+)
+
+def test_crear_estrategia_torneo():
+    estrategia = crear_estrategia_torneo("markov:3")
+    assert isinstance(estrategia, EstrategiaMarkov) and estrategia.orden == 3
+    assert isinstance(crear_estrategia_torneo("mixta"), EstrategiaMixta)
+    assert crear_estrategia_torneo("markov:8").orden == 8
+    for especificacion in ["desconocida", "markov:x", "mixta:2", "markov:0", "markov:9", "markov:100000"]:
+        with pytest.raises(ValueError):
+            crear_estrategia_torneo(especificacion)
+
+def test_puntuaciones_partidas():
+    # piedra=0, papel=1, tijera=2
+    jugadas_a = np.array([[1, 1, 0], [0, 0, 0], [0, 1, 2]], dtype=np.int8)
+    jugadas_b = np.array([[0, 0, 0], [1, 1, 0], [0, 1, 2]], dtype=np.int8)
+
+    assert puntuaciones_partidas(jugadas_a, jugadas_b).tolist() == [1, 0, 0.5]
+
+def test_calcular_elo_conserva_la_suma():
+    puntuaciones = np.array([[1.0] * 50, [0.5] * 50, [0.0] * 50])
+    elo = calcular_elo(np.array([0, 0, 1]), np.array([1, 2, 2]), puntuaciones, 3)
+
+    assert elo.sum() == pytest.approx(1500 * 3)
+    # 1 pierde contra 0 y contra 2
+    assert elo[1] == elo.min()
+
+def test_jugar_enfrentamiento_es_reproducible():
+    resultado = jugar_enfrentamiento("markov:1", "aleatoria", 50, 3)
+
+    assert resultado["jugadas_a"].shape == (50, 3)
+    assert np.array_equal(resultado["jugadas_b"], jugar_enfrentamiento("markov:1", "aleatoria", 50, 3)["jugadas_b"])
+
+def test_jugar_torneo(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'game.db'}")
+    init_db(engine)
+    db = sessionmaker(bind=engine)()
+    estrategias = ["aleatoria", "frecuencias", "markov:2"]
+
+    clasificacion = jugar_torneo(estrategias, 30, workers=1, semilla=5, db=db, batch_size=7)
+
+    assert sorted(fila["estrategia"] for fila in clasificacion) == sorted(estrategias)
+    assert [fila["elo"] for fila in clasificacion] == sorted((fila["elo"] for fila in clasificacion), reverse=True)
+    for fila in clasificacion:
+        assert fila["victorias"] + fila["empates"] + fila["derrotas"] == 60
+    assert clasificacion == jugar_torneo(estrategias, 30, workers=1, semilla=5)
+    # Se guardan las 90 partidas; las empatadas, sin ganador, como en el Elo
+    empatadas = sum(fila["empates"] for fila in clasificacion) // 2
+    assert empatadas > 0
+    assert db.query(func.count(Partida.id)).scalar() == 90
+    assert db.query(func.count(Partida.id)).filter(Partida.ganador_id.is_(None)).scalar() == empatadas
+    assert db.query(func.count(Jugador.id)).scalar() == 3
+    # Los puntos de cada jugador son sus victorias en la clasificación del torneo
+    puntos = {jugador.nombre: jugador.puntos for jugador in db.query(Jugador)}
+    assert puntos == {f"Estrategia {fila['estrategia']}": fila["victorias"] for fila in clasificacion}
+
+def test_normalizar_estrategia_torneo():
+    assert normalizar_estrategia_torneo("markov") == "markov:2"
+    assert normalizar_estrategia_torneo("markov:02") == "markov:2"
+    assert normalizar_estrategia_torneo("mixta") == "mixta"
+    with pytest.raises(ValueError):
+        normalizar_estrategia_torneo("desconocida")
+
+def test_jugar_torneo_estrategias_repetidas():
+    with pytest.raises(ValueError):
+        jugar_torneo(["markov", "markov"], 10, workers=1)
+    # 'markov' y 'markov:2' son la misma estrategia
+    with pytest.raises(ValueError):
+        jugar_torneo(["markov", "markov:2"], 10, workers=1)